@@ -0,0 +1,92 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Compare the serialisation of a layer to JSON through geopandas and the standard
+library with the Arrow serialiser and `coordo.encoder`.
+
+    python benchmarks/bench_json.py                          # synthetic layer
+    python benchmarks/bench_json.py config.json layer_id     # layer of a map
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import shapely
+
+from coordo.datapackage.arrow import to_feature_collection
+from coordo.datapackage.scan import to_geodataframe
+from coordo.encoder import dumps, orjson
+
+ROWS = 200_000
+REPEAT = 3
+
+
+def synthetic_table(rows: int) -> pa.Table:
+    rng = np.random.default_rng(0)
+    points = shapely.points(rng.uniform(-5, 5, rows), rng.uniform(40, 50, rows))
+    field = pa.field(
+        "geom", pa.binary(), metadata={"ARROW:extension:name": "geoarrow.wkb"}
+    )
+    return pa.table(
+        {
+            "id": pa.array(np.arange(rows)),
+            "height": pa.array(rng.uniform(0, 40, rows)),
+            "species": pa.array(rng.choice(["oak", "beech", "pine"], rows)),
+            "uses": pa.array([["wood", "shade"]] * rows),
+            "geom": pa.array(shapely.to_wkb(points), pa.binary()),
+        },
+        schema=pa.schema(
+            [
+                ("id", pa.int64()),
+                ("height", pa.float64()),
+                ("species", pa.string()),
+                ("uses", pa.list_(pa.string())),
+                field,
+            ]
+        ),
+    )
+
+
+def layer_table(config: str, layer_id: str) -> pa.Table:
+    from coordo.datapackage import DataPackage
+    from coordo.map import Map
+
+    map = Map.from_file(config)
+    layer = map._get_layer(layer_id)
+    package = DataPackage.from_path(Path(config).parent / layer.path)
+    return layer.scan(package).to_arrow()
+
+
+def previous(table: pa.Table) -> bytes:
+    df = to_geodataframe(table)
+    for field in table.schema:
+        if pa.types.is_list(field.type):
+            df[field.name] = df[field.name].apply(
+                lambda x: x.tolist() if x is not None else None
+            )
+    return json.dumps(df.to_geo_dict(show_bbox=True), default=str).encode()
+
+
+def current(table: pa.Table) -> bytes:
+    return dumps(to_feature_collection(table))
+
+
+def bench(name: str, fn, table: pa.Table) -> None:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        body = fn(table)
+        timings.append(time.perf_counter() - start)
+    print(f"{name:<10} {min(timings):8.3f}s {len(body) / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    table = layer_table(*sys.argv[1:3]) if len(sys.argv) > 2 else synthetic_table(ROWS)
+    print(f"{table.num_rows} rows, encoder: {'orjson' if orjson else 'json'}")
+    bench("previous", previous, table)
+    bench("arrow", current, table)
@@ -0,0 +1,169 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from .encoder import dumps
+from .map import MAX_WORKERS, Map
+from .map.datapackage import DataPackageLayer
+from .map.density import DensityLayer, world_pixels
+from .map.grid import MAX_LATITUDE, TILE_SIZE, GridLayer
+from .server import MIN_COMPRESS_SIZE, compressors, index_html, static_dir
+
+# Precompressed variants written next to each file. Files are compressed once
+# at build time, so the highest levels are used
+ENCODINGS = compressors({"zstd": 19, "br": 11, "gzip": 9})
+# Extension of the variant of each content coding
+EXTENSIONS = {"zstd": ".zst", "br": ".br", "gzip": ".gz"}
+
+# Directory of the layer data, relative to the style
+DATA_DIR = "data"
+
+# Density tiles rendered per layer, MapLibre upscales the last zoom level rendered
+MAX_TILES = 10_000
+
+WORLD = [-180, -MAX_LATITUDE, 180, MAX_LATITUDE]
+
+
+def write(outdir: Path, path: str, body: bytes) -> list[str]:
+    """Write a file and its precompressed variants, returning their paths"""
+    target = outdir / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(body)
+    written = [path]
+    # PNG tiles are already compressed
+    if len(body) >= MIN_COMPRESS_SIZE and not path.endswith(".png"):
+        for coding, encode in ENCODINGS.items():
+            (outdir / f"{path}{EXTENSIONS[coding]}").write_bytes(encode(body))
+            written.append(f"{path}{EXTENSIONS[coding]}")
+    return written
+
+
+def tile_range(bbox: list[float], zoom: int) -> tuple[range, range]:
+    """Columns and rows of the tiles of `zoom` covering a bounding box"""
+    x, y = world_pixels(np.array([bbox[0], bbox[2]]), np.array([bbox[3], bbox[1]]))
+    last = 2**zoom - 1
+    left, right = (min(max(int(v * 2**zoom // TILE_SIZE), 0), last) for v in x)
+    top, bottom = (min(max(int(v * 2**zoom // TILE_SIZE), 0), last) for v in y)
+    return range(left, right + 1), range(top, bottom + 1)
+
+
+def density_tiles(layer: DensityLayer, bbox: list[float]) -> list[tuple[int, int, int]]:
+    """
+    Tiles of a density layer covering `bbox`, down to the last zoom level
+    where they all fit in `MAX_TILES`. The first zoom level is always rendered.
+    """
+    tiles = []
+    for zoom in range(layer.minZoom, layer.maxZoom + 1):
+        columns, rows = tile_range(bbox, zoom)
+        if tiles and len(tiles) + len(columns) * len(rows) > MAX_TILES:
+            break
+        tiles += [(zoom, x, y) for x in columns for y in rows]
+    return tiles
+
+
+def layer_files(
+    map: Map, layer, tiles: list[tuple[int, int, int]]
+) -> Iterator[tuple[str, bytes]]:
+    """Paths and contents of the data files of a layer"""
+    if isinstance(layer, GridLayer):
+        for zoom in range(layer.minZoom, layer.maxZoom + 1):
+            yield (
+                f"{DATA_DIR}/{layer.id}/{zoom}.geojson",
+                dumps(map.get_layer_data(layer.id, zoom=zoom)),
+            )
+    elif isinstance(layer, DensityLayer):
+        for z, x, y in tiles:
+            yield (
+                f"{DATA_DIR}/{layer.id}/tiles/{z}/{x}/{y}.png",
+                map.get_tile(layer.id, z, x, y),
+            )
+    elif isinstance(layer, DataPackageLayer):
+        yield (
+            f"{DATA_DIR}/{layer.id}.geojson",
+            dumps(map.get_layer_data(layer.id, paginate=False)),
+        )
+
+
+def build(
+    config_file: str | Path, outdir: str | Path, workers: int = MAX_WORKERS
+) -> list[str]:
+    """
+    Export a map as static files: its style, the data of its layers evaluated in
+    parallel with their precompressed variants, and a page displaying it. The
+    directory can be served by any static file server, filters, facets and
+    feature details being only available from `coordo serve`.
+    Returns the paths written, relative to `outdir`.
+    """
+    map = Map.from_file(config_file)
+    # Features are exported with all their properties since they can't be requested
+    map.layers = [
+        layer.model_copy(update={"slim": False})
+        if isinstance(layer, DataPackageLayer)
+        else layer
+        for layer in map.layers
+    ]
+    outdir = Path(outdir)
+    style = map.get_maplibre_style(data_url=f"{DATA_DIR}/")
+    style_layers = {layer["id"]: layer for layer in style["layers"]}
+
+    # Point the sources of the layers at their files
+    layers = [layer for layer in map.layers if layer.id in style_layers]
+    tiles: dict[str, list[tuple[int, int, int]]] = {}
+    for layer in layers:
+        source, metadata = (
+            style["sources"][layer.id],
+            style_layers[layer.id]["metadata"],
+        )
+        if isinstance(layer, GridLayer):
+            source["data"] = f"{DATA_DIR}/{layer.id}/{layer.minZoom}.geojson"
+            metadata["grid"]["url"] = f"{DATA_DIR}/{layer.id}/{{z}}.geojson"
+        elif isinstance(layer, DensityLayer):
+            tiles[layer.id] = density_tiles(layer, source.get("bounds", WORLD))
+            source["maxzoom"] = tiles[layer.id][-1][0]
+        elif isinstance(layer, DataPackageLayer):
+            source["data"] = f"{DATA_DIR}/{layer.id}.geojson"
+            for reference in metadata.get("references", []):
+                reference.pop("url", None)
+            metadata.pop("time", None)
+
+    def export(layer) -> list[str]:
+        written = []
+        for path, body in layer_files(map, layer, tiles.get(layer.id, [])):
+            written += write(outdir, path, body)
+        return written
+
+    written = []
+    with ThreadPoolExecutor(max(1, min(workers, len(layers)))) as pool:
+        for layer, future in zip(
+            layers, [pool.submit(export, layer) for layer in layers]
+        ):
+            try:
+                written += future.result()
+            except Exception as e:  # noqa: BLE001
+                # As when served, a failing layer doesn't prevent the map from being displayed
+                print(f"[WARN] Error occurred while exporting layer {layer.id!r}: {e}")
+                style["layers"].remove(style_layers[layer.id])
+                style["sources"].pop(layer.id, None)
+
+    written += write(outdir, "style.json", dumps(style))
+    if static_dir.exists():
+        for path in sorted(static_dir.rglob("*")):
+            if path.is_file():
+                written += write(
+                    outdir, f"static/{path.relative_to(static_dir)}", path.read_bytes()
+                )
+    else:
+        print(
+            "[WARN] coordo-ts is not built, the page has no script to display the map"
+        )
+    written += write(
+        outdir,
+        "index.html",
+        index_html("static/coordo.css", "static/coordo.iife.js", "style.json").encode(),
+    )
+    return written
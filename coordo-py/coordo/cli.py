@@ -6,15 +6,19 @@ from pathlib import Path
 
 import typer
 
-from coordo.loaders import ResourceAction, KoboToolboxLoader, FileLoader, Separator
 from coordo.datapackage import DataPackage
+from coordo.datapackage.validation import count_violations, format_report
+from coordo.loaders import (
+    DirectoryLoader,
+    FileLoader,
+    KoboToolboxLoader,
+    ResourceAction,
+    Separator,
+)
 from coordo.sql.builder import build_query
 
-from .map import Map
-
 app = typer.Typer()
 options = {}
-static_dir = Path(__file__).parent / "static"
 
 
 @app.callback()
@@ -34,44 +38,24 @@ def explore(package_path: Path):
 
 @app.command()
 def serve(config_file: str):
-    from flask import Flask, request, send_from_directory
-
-    app = Flask(__name__)
-
-    @app.route("/")
-    def home():
-        return """
-        <!DOCTYPE html>
-        <html>
-          <head>
-            <title>Coordo</title>
-            <link href="/static/coordo.css" rel="stylesheet" />
-            <script src="/static/coordo.iife.js"></script>
-          </head>
-          <body style="margin: 0">
-            <div id="map" style="height: 100dvh"></div>
-          </body>
-          <script>
-            map = coordo.createMap("#map", "/map/style.json");
-          </script>
-        </html>
-        """
-
-    @app.route("/map/<path:subpath>", methods=["GET", "POST"])
-    def maps(subpath: str):
-        return Map.from_file(
-            config_file,
-        ).handle_request(
-            request.method,
-            subpath,
-            request.get_json(silent=True),
-        )
-
-    @app.route("/static/<path:filename>")
-    def static_files(filename):
-        return send_from_directory(static_dir, filename)
-
-    app.run(debug=True)
+    from .server import create_app
+
+    create_app(config_file).run(debug=True)
+
+
+@app.command()
+def build(
+    config_file: Path,
+    outdir: Path = typer.Argument(
+        help="Directory to write the map to, served by any static file server"
+    ),
+    workers: int = typer.Option(8, help="Number of layers exported at the same time"),
+):
+    """Export a map as a style, prerendered layer data and a page displaying it"""
+    from .build import build as build_map
+
+    written = build_map(config_file, outdir, workers)
+    print(f"{len(written)} files written to {outdir}")
 
 
 load = typer.Typer()
@@ -83,8 +67,11 @@ def kobotoolbox(
     xlsdata: Path,
     package: Path = typer.Option(help="Path to the package directory"),
     action: ResourceAction = typer.Option(help="Action to perform on resource"),
+    validate: bool = typer.Option(
+        False, help="Check the loaded data against its schema"
+    ),
 ):
-    KoboToolboxLoader(package, xlsform, xlsdata, action).etl()
+    KoboToolboxLoader(package, xlsform, xlsdata, action).etl(validate)
 
 
 @load.command()
@@ -93,9 +80,43 @@ def file(
     package: Path = typer.Option(".", help="Path to the package directory"),
     action: ResourceAction = typer.Option(help="Action to perform on resource"),
     sep: Separator = typer.Option(Separator.COMMA, help="Separator for the file"),
-    decimal_sep: Separator = typer.Option(Separator.DOT, help="Decimal separator for the file"),
+    decimal_sep: Separator = typer.Option(
+        Separator.DOT, help="Decimal separator for the file"
+    ),
+    transcode: bool = typer.Option(
+        True, help="Convert CSV, GeoJSON and zipped files to GeoParquet"
+    ),
+    validate: bool = typer.Option(
+        False, help="Check the loaded data against its schema"
+    ),
+):
+    FileLoader(package, path, action, sep, decimal_sep, transcode).etl(validate)
+
+
+@load.command("dir")
+def directory(
+    pattern: str = typer.Argument(
+        help="Glob pattern of the files to load, e.g. 'data/**/*.csv'"
+    ),
+    package: Path = typer.Option(".", help="Path to the package directory"),
+    action: ResourceAction = typer.Option(help="Action to perform on resources"),
+    sep: Separator = typer.Option(Separator.COMMA, help="Separator for the files"),
+    decimal_sep: Separator = typer.Option(
+        Separator.DOT, help="Decimal separator for the files"
+    ),
+    transcode: bool = typer.Option(
+        True, help="Convert CSV, GeoJSON and zipped files to GeoParquet"
+    ),
+    workers: int | None = typer.Option(
+        None, help="Number of worker processes, defaults to the number of cores"
+    ),
+    validate: bool = typer.Option(
+        False, help="Check the loaded data against its schema"
+    ),
 ):
-    FileLoader(package, path, action, sep, decimal_sep).etl()
+    DirectoryLoader(package, pattern, action, sep, decimal_sep, transcode, workers).etl(
+        validate
+    )
 
 
 app.add_typer(load, name="load")
@@ -118,7 +139,8 @@ def add_foreignkey(
         foreign_resource=foreign_resource,
     )
     dp.save()
-    
+
+
 @app.command()
 def remove_foreignkey(
     from_: str,
@@ -159,4 +181,54 @@ def query(
     conn.sql(str(query)).show()
 
 
+@dp.command()
+def validate(
+    package: Path,
+    resource: list[str] = typer.Option(
+        None, "--resource", "-r", help="Only validate these resources"
+    ),
+):
+    report = DataPackage.from_path(package).validate(resource or None)
+    print(format_report(report))
+    if count_violations(report):
+        raise typer.Exit(1)
+
+
+@dp.command()
+def export(
+    package: Path,
+    resource: str,
+    output: Path = typer.Argument(help="File to write, its extension gives the format"),
+):
+    DataPackage.from_path(package).scan(resource).write(output)
+
+
+@dp.command()
+def sort(
+    package: Path,
+    resource: str,
+    by: list[str] = typer.Option(
+        None, "--by", "-b", help="Fields to sort on, defaults to the foreign keys"
+    ),
+):
+    dp = DataPackage.from_path(package)
+    dp.sort_resource(resource, by or None)
+    dp.save()
+
+
+@dp.command()
+def stats(
+    package: Path,
+    resource: list[str] = typer.Option(
+        None, "--resource", "-r", help="Only refresh these resources"
+    ),
+):
+    dp = DataPackage.from_path(package)
+    dp.update_stats(resource or None)
+    dp.save()
+    for res in dp.resources:
+        if res.stats and (not resource or res.name in resource):
+            print(f"{res.name}: {res.stats.rows} rows")
+
+
 app.add_typer(dp, name="dp")
@@ -0,0 +1,113 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import shapely
+
+
+def is_geometry(field: pa.Field) -> bool:
+    return (field.metadata or {}).get(b"ARROW:extension:name") == b"geoarrow.wkb"
+
+
+def geometry_columns(table: pa.Table) -> list[str]:
+    return [field.name for field in table.schema if is_geometry(field)]
+
+
+def to_geometries(column: pa.ChunkedArray):
+    """Decode a WKB column into an array of shapely geometries"""
+    return shapely.from_wkb(column.to_numpy())
+
+
+def round_geometries(geometries, precision: int | None):
+    if precision is None:
+        return geometries
+    return shapely.transform(geometries, lambda coords: np.round(coords, precision))
+
+
+def to_geojson_geometries(geometries) -> list:
+    # Geometries are serialised in one pass by GEOS and parsed back in a single call
+    strings = shapely.to_geojson(geometries)
+    strings[shapely.is_missing(geometries)] = "null"
+    return json.loads("[" + ",".join(strings) + "]")
+
+
+def to_json_column(
+    column: pa.ChunkedArray, precision: int | None = None
+) -> pa.ChunkedArray:
+    """Cast the values that have no JSON equivalent, without going through Python objects"""
+    type_ = column.type
+    if pa.types.is_floating(type_) and precision is not None:
+        return pc.round(column, precision)
+    if pa.types.is_timestamp(type_):
+        fmt = "%Y-%m-%dT%H:%M:%S" + ("%z" if type_.tz else "")
+        return pc.strftime(column, format=fmt)
+    if pa.types.is_temporal(type_):
+        return column.cast(pa.string())
+    if pa.types.is_decimal(type_):
+        return to_json_column(column.cast(pa.float64()), precision)
+    return column
+
+
+def to_records(table: pa.Table, precision: int | None = None) -> list[dict]:
+    """
+    Rows of `table` as JSON-serializable dicts. List columns are kept as lists and
+    geometries are converted to GeoJSON. Floats and coordinates are rounded to
+    `precision` decimals if given.
+    """
+    geometries = geometry_columns(table)
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if name in geometries:
+            shapes = round_geometries(to_geometries(column), precision)
+            columns[name] = to_geojson_geometries(shapes)
+        else:
+            columns[name] = to_json_column(column, precision).to_pylist()
+    if not columns:
+        return [{} for _ in range(table.num_rows)]
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def to_feature_collection(
+    table: pa.Table,
+    precision: int | None = None,
+    id_column: str | None = None,
+    start: int = 0,
+) -> dict:
+    """
+    Serialise `table` to a GeoJSON FeatureCollection, the first geometry column
+    being the geometry of the features and the others their properties.
+    Features are identified by `id_column` if given, by their position otherwise,
+    counted from `start` so that the features of different pages don't share ids.
+    """
+    geometries = geometry_columns(table)
+    if not geometries:
+        raise ValueError("No geometry column found.")
+    geometry = round_geometries(to_geometries(table.column(geometries[0])), precision)
+    properties = to_records(table.drop_columns(geometries[0]), precision)
+    bounds = shapely.bounds(geometry)
+    ids = (
+        table.column(id_column).to_pylist()
+        if id_column
+        else [str(start + i) for i in range(table.num_rows)]
+    )
+    features = [
+        {
+            "id": id_,
+            "type": "Feature",
+            "properties": props,
+            "geometry": geom,
+            "bbox": None if geom is None else bbox,
+        }
+        for id_, props, geom, bbox in zip(
+            ids, properties, to_geojson_geometries(geometry), bounds.tolist()
+        )
+    ]
+    collection = {"type": "FeatureCollection", "features": features}
+    if len(geometry):
+        collection["bbox"] = shapely.total_bounds(geometry).tolist()
+    return collection
@@ -0,0 +1,291 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import shapely
+from dplib.models.field.types import IField
+from shapely.geometry import shape
+
+from .resource import Resource
+from .validation import format_report, validate_resource
+
+# Number of rows written to each parquet fragment
+CHUNK_SIZE = 50_000
+
+# Rows per row group of sorted resources. Small groups have tight min/max
+# statistics, so lookups on the sort key only read the groups holding the key
+SORTED_ROW_GROUP_SIZE = 8_192
+
+
+ARROW_TYPES = {
+    "integer": pa.int64(),
+    "number": pa.float64(),
+    "boolean": pa.bool_(),
+    "date": pa.date32(),
+    "datetime": pa.timestamp("us"),
+    "time": pa.time64("us"),
+    # Geometries are handled as WKB until they are written
+    "geojson": pa.binary(),
+}
+
+
+def to_arrow_type(field: IField) -> pa.DataType:
+    if field.type == "list":
+        return pa.list_(ARROW_TYPES.get(field.itemType or "string", pa.string()))
+    return ARROW_TYPES.get(field.type, pa.string())
+
+
+def to_wkb(values: pa.Array | list) -> pa.Array:
+    """Convert WKB, WKT, GeoJSON mappings or shapely geometries to a WKB array"""
+    if isinstance(values, pa.Array):
+        if isinstance(values.type, pa.ExtensionType):
+            values = values.storage
+        if pa.types.is_binary(values.type) or pa.types.is_large_binary(values.type):
+            return values.cast(pa.binary())
+        geometries = shapely.from_wkt(values.to_numpy(zero_copy_only=False))
+    else:
+        geometries = [
+            shape(v)
+            if isinstance(v, dict)
+            else shapely.from_wkt(v)
+            if isinstance(v, str)
+            else shapely.from_wkb(v)
+            if isinstance(v, bytes)
+            else v
+            for v in values
+        ]
+    return pa.array(shapely.to_wkb(geometries), type=pa.binary())
+
+
+def coerce(data: pa.Table | list[dict], resource: Resource) -> pa.Table:
+    """
+    Align rows or an Arrow table on the schema of `resource`, casting values to
+    the types of its fields. Unknown columns and values that can't be cast raise a ValueError.
+    """
+    fields = resource.schema.fields
+    names = [field.name for field in fields]
+    if isinstance(data, pa.Table):
+        unknown = set(data.column_names) - set(names)
+    else:
+        unknown = set().union(*(row.keys() for row in data)) - set(names)
+    if unknown:
+        raise ValueError(
+            f"Resource {resource.name!r} has no field named {', '.join(sorted(unknown))}"
+        )
+
+    columns = []
+    for field in fields:
+        arrow_type = to_arrow_type(field)
+        if isinstance(data, pa.Table):
+            values = (
+                data.column(field.name).combine_chunks()
+                if field.name in data.column_names
+                else pa.nulls(data.num_rows, arrow_type)
+            )
+        else:
+            values = [row.get(field.name) for row in data]
+        try:
+            if field.type == "geojson":
+                values = to_wkb(values)
+            elif isinstance(values, list):
+                values = pa.array(values, type=arrow_type)
+            else:
+                values = values.cast(arrow_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, shapely.errors.GEOSException) as e:
+            raise ValueError(
+                f"Invalid values for field {resource.name}.{field.name}: {e}"
+            ) from e
+        columns.append(values)
+    return pa.Table.from_arrays(columns, names=names)
+
+
+def chunks(
+    it: Iterable[dict | pa.RecordBatch | pa.Table],
+    resource: Resource,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[pa.Table]:
+    """Group rows and Arrow batches into coerced tables of about `chunk_size` rows"""
+    rows: list[dict] = []
+    tables: list[pa.Table] = []
+    size = 0
+
+    def flush() -> pa.Table:
+        if rows:
+            tables.append(coerce(rows, resource))
+            rows.clear()
+        table = pa.concat_tables(tables)
+        tables.clear()
+        return table
+
+    for item in it:
+        if isinstance(item, (pa.RecordBatch, pa.Table)):
+            if rows:
+                tables.append(coerce(rows, resource))
+                rows.clear()
+            tables.append(coerce(pa.table(item), resource))
+            size += item.num_rows
+        else:
+            rows.append(item)
+            size += 1
+        if size >= chunk_size:
+            yield flush()
+            size = 0
+    if size:
+        yield flush()
+
+
+def new_fragment(directory: Path) -> Path:
+    # Fragments are named after their creation time so they are read in insertion order
+    return directory / f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+
+
+def write_fragment(
+    conn: duckdb.DuckDBPyConnection,
+    table: pa.Table,
+    resource: Resource,
+    path: Path,
+) -> None:
+    """Check `table` against the constraints of `resource` and write it as GeoParquet"""
+    conn.register("chunk", table)
+    try:
+        report = validate_resource(conn, resource, source="chunk", foreign_keys=False)
+        if report["fields"] or "primaryKey" in report:
+            raise ValueError(
+                f"Rows don't match the schema of {resource.name!r}:\n"
+                + format_report({resource.name: report})
+            )
+        geometries = [f.name for f in resource.schema.fields if f.type == "geojson"]
+        columns = "*"
+        if geometries:
+            columns += " REPLACE ({})".format(
+                ", ".join(
+                    f'ST_GeomFromWKB("{name}") AS "{name}"' for name in geometries
+                )
+            )
+        conn.execute(
+            f"COPY (SELECT {columns} FROM chunk) TO '{path}' "
+            "(FORMAT parquet, COMPRESSION zstd)"
+        )
+    finally:
+        conn.unregister("chunk")
+
+
+def upsert(
+    conn: duckdb.DuckDBPyConnection,
+    directory: Path,
+    source: str,
+    primary_key: list[str],
+) -> tuple[int, int]:
+    """
+    Merge the rows of `source` into the parquet fragments of `directory`, matching them
+    on `primary_key`. Columns missing from `source` keep their stored values. Only the
+    fragments holding changed rows are rewritten and the new and changed rows are
+    appended as a new fragment. Returns the number of inserted and updated rows.
+    """
+    key = ", ".join(f'"{name}"' for name in primary_key)
+    conn.execute(f"CREATE OR REPLACE TEMP TABLE incoming AS SELECT * FROM {source}")
+    duplicates = conn.sql(
+        f"SELECT {key} FROM incoming GROUP BY ALL HAVING count(*) > 1 LIMIT 5"
+    ).fetchall()
+    if duplicates:
+        raise ValueError(
+            f"Rows to merge have duplicate keys ({', '.join(primary_key)}): "
+            + ", ".join(str(row if len(row) > 1 else row[0]) for row in duplicates)
+        )
+    fragments = sorted(directory.glob("*.parquet"))
+    if not fragments:
+        inserted, updated = conn.table("incoming").shape[0], 0
+        conn.execute("CREATE OR REPLACE TEMP TABLE changed AS FROM incoming")
+    else:
+        files = ", ".join(f"'{fragment}'" for fragment in fragments)
+        existing = f"read_parquet([{files}], union_by_name=true, filename=true)"
+        existing_columns = [
+            col
+            for col in conn.sql(f"SELECT * FROM {existing} LIMIT 0").columns
+            if col != "filename"
+        ]
+        given = conn.table("incoming").columns
+        missing = [col for col in existing_columns if col not in given]
+        if missing:
+            # Updated rows keep the stored values of the columns that aren't given
+            selected = [
+                f'"{col}"'
+                if col in primary_key
+                else f'incoming."{col}"'
+                if col in given
+                else f'stored."{col}"'
+                for col in existing_columns
+            ] + [f'incoming."{col}"' for col in given if col not in existing_columns]
+            stored_columns = ", ".join(f'"{col}"' for col in missing)
+            conn.execute(
+                "CREATE OR REPLACE TEMP TABLE incoming AS "
+                f"SELECT {', '.join(selected)} FROM incoming LEFT JOIN "
+                f"(SELECT {key}, {stored_columns} FROM {existing}) AS stored USING ({key})"
+            )
+        columns = conn.table("incoming").columns
+        # Fields added since the data was stored are compared as NULLs
+        stored = ", ".join(
+            f'"{col}"' if col in existing_columns else f'NULL AS "{col}"'
+            for col in columns
+        )
+        conn.execute(
+            "CREATE OR REPLACE TEMP TABLE changed AS "
+            f"SELECT * FROM incoming EXCEPT SELECT {stored} FROM {existing}"
+        )
+        (updated,) = conn.sql(
+            f"SELECT count(*) FROM changed SEMI JOIN {existing} USING ({key})"
+        ).fetchone()
+        inserted = conn.table("changed").shape[0] - updated
+        affected = conn.sql(
+            f"SELECT DISTINCT filename FROM {existing} SEMI JOIN changed USING ({key})"
+        ).fetchall()
+        for (filename,) in affected:
+            fragment = Path(filename)
+            rewritten = fragment.with_suffix(".tmp")
+            ((kept,),) = conn.execute(
+                f"COPY (SELECT * FROM '{fragment}' ANTI JOIN changed USING ({key})) "
+                f"TO '{rewritten}' (FORMAT parquet, COMPRESSION zstd)"
+            ).fetchall()
+            if kept:
+                rewritten.replace(fragment)
+            else:
+                rewritten.unlink()
+                fragment.unlink()
+    if inserted or updated:
+        conn.execute(
+            f"COPY changed TO '{new_fragment(directory)}' (FORMAT parquet, COMPRESSION zstd)"
+        )
+    return inserted, updated
+
+
+def sort_fragments(
+    conn: duckdb.DuckDBPyConnection,
+    directory: Path,
+    fields: list[str],
+    row_group_size: int = SORTED_ROW_GROUP_SIZE,
+) -> None:
+    """
+    Rewrite the parquet fragments of `directory` as a single fragment sorted on
+    `fields`, so that filters on them are answered from the row groups holding
+    the matching rows only. Fragments appended later are read in full.
+    """
+    fragments = sorted(directory.glob("*.parquet"))
+    if not fragments:
+        return
+    files = ", ".join(f"'{fragment}'" for fragment in fragments)
+    order = ", ".join(f'"{name}"' for name in fields)
+    sorted_path = new_fragment(directory)
+    tmp_path = sorted_path.with_suffix(".tmp")
+    conn.execute(
+        f"COPY (SELECT * FROM read_parquet([{files}], union_by_name=true) ORDER BY {order}) "
+        f"TO '{tmp_path}' (FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE {row_group_size})"
+    )
+    tmp_path.replace(sorted_path)
+    for fragment in fragments:
+        fragment.unlink()
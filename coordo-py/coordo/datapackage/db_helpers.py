@@ -6,9 +6,17 @@ from pathlib import Path
 from dplib.models.field.types import IField
 from duckdb.sqltypes import DuckDBPyType
 
+from coordo.sql.helpers import spatial_conn
+
+# Number of rows looked at when inferring the schema of a file
+SAMPLE_SIZE = 10_000
+
 
 def prepare_path(path: Path):
     from_ = str(path)
+    if path.is_dir():
+        # Resources written in several fragments, see `DataPackage.write_resource`
+        return f"read_parquet('{from_}/*.parquet', union_by_name=true)"
     if path.suffix in (".geojson", ".zip"):
         if path.suffix == ".zip":
             from_ = "/vsizip/" + from_
@@ -18,6 +26,19 @@ def prepare_path(path: Path):
     return from_
 
 
+def parse_wkt(geometries: list[str]) -> str:
+    """
+    Columns to select to read text sources where `geometries` are stored as WKT.
+    Geometries are inferred from a sample, the values that turn out not to be WKT
+    are read as NULLs.
+    """
+    if not geometries:
+        return "*"
+    return "* REPLACE ({})".format(
+        ", ".join(f'TRY(ST_GeomFromText("{name}")) AS "{name}"' for name in geometries)
+    )
+
+
 def to_db_type(field: IField):
     match field.type:
         case "integer":
@@ -36,15 +57,62 @@ def to_db_type(field: IField):
 
 def to_dp_type(type: DuckDBPyType):
     match type.id:
-        case "bigint" | "integer":
+        case "tinyint" | "smallint" | "integer" | "bigint" | "hugeint":
             return {"type": "integer"}
         case "geometry":
             return {"type": "geojson"}
-        case "double":
+        case "double" | "float" | "decimal":
             return {"type": "number"}
+        case "boolean":
+            return {"type": "boolean"}
         case "date":
             return {"type": "date"}
+        case "time":
+            return {"type": "time"}
+        case "timestamp" | "timestamp with time zone":
+            return {"type": "datetime"}
         case "list":
-            return {"type": "list", "itemType": type.children[0]}
+            _, child = type.children[0]
+            item_type = to_dp_type(child)["type"]
+            if item_type in ("list", "geojson"):
+                item_type = "string"
+            return {"type": "list", "itemType": item_type}
         case _:
             return {"type": "string"}
+
+
+def infer_fields(from_: str, sample_size: int = SAMPLE_SIZE) -> list[dict]:
+    """
+    Infer the datapackage fields of the rows returned by `from_` (see `prepare_path`).
+
+    Only a bare spatial connection is opened and at most `sample_size` rows are looked at,
+    so the cost does not depend on the package the file is added to.
+    Text columns whose sampled values all parse as WKT are inferred as geometries.
+    """
+    conn = spatial_conn()
+    try:
+        conn.execute(
+            f"CREATE TEMP TABLE sample AS SELECT * FROM {from_} LIMIT {sample_size}"
+        )
+        rel = conn.table("sample")
+        fields = [
+            {"name": name, **to_dp_type(type)}
+            for name, type in zip(rel.columns, rel.types)
+        ]
+        text_cols = [
+            name for name, type in zip(rel.columns, rel.types) if type.id == "varchar"
+        ]
+        if text_cols:
+            probes = ", ".join(
+                f'count("{col}"), count(try(ST_GeomFromText("{col}")))'
+                for col in text_cols
+            )
+            counts = conn.sql(f"SELECT {probes} FROM sample").fetchone()
+            for i, col in enumerate(text_cols):
+                non_null, geometries = counts[2 * i], counts[2 * i + 1]
+                if non_null and non_null == geometries:
+                    field = next(f for f in fields if f["name"] == col)
+                    field["type"] = "geojson"
+    finally:
+        conn.close()
+    return fields
@@ -0,0 +1,138 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import duckdb
+
+from .stats import to_json_value
+
+# Number of bins of the histograms of numeric fields
+HISTOGRAM_BINS = 20
+
+# Most frequent values returned for each categorical field
+MAX_VALUES = 100
+
+NUMERIC_TYPES = (
+    "tinyint",
+    "smallint",
+    "integer",
+    "bigint",
+    "hugeint",
+    "utinyint",
+    "usmallint",
+    "uinteger",
+    "ubigint",
+    "uhugeint",
+    "float",
+    "double",
+    "decimal",
+)
+TEMPORAL_TYPES = ("date", "time", "timestamp", "timestamp with time zone")
+CATEGORICAL_TYPES = ("varchar", "boolean", "enum")
+
+
+def facet_kind(type_id: str, categorical: bool) -> str | None:
+    """How a column is summarised: by its `values`, or by its `range` and histogram"""
+    if categorical or type_id in CATEGORICAL_TYPES:
+        return "values"
+    if type_id in NUMERIC_TYPES or type_id in TEMPORAL_TYPES:
+        return "range"
+    # Geometries, lists and structs have no facets
+    return None
+
+
+def compute_facets(
+    conn: duckdb.DuckDBPyConnection,
+    query: str,
+    fields: list[str] | None = None,
+    categorical: set[str] | None = None,
+    bins: int = HISTOGRAM_BINS,
+) -> dict:
+    """
+    Count the rows of `query`, the most frequent values of its categorical columns
+    and the range of the others, with a histogram of `bins` equal-width bins for
+    numbers. Everything is computed in a single query grouped by GROUPING SETS.
+    Only `fields` are summarised if given, otherwise all the columns that can be.
+    """
+    categorical = categorical or set()
+    relation = conn.sql(query)
+    types = {name: type.id for name, type in zip(relation.columns, relation.types)}
+    if fields is not None:
+        unknown = [name for name in fields if name not in types]
+        if unknown:
+            raise ValueError(f"No column named {', '.join(unknown)}")
+    kinds = {
+        name: facet_kind(types[name], name in categorical)
+        for name in (fields if fields is not None else relation.columns)
+    }
+    kinds = {name: kind for name, kind in kinds.items() if kind}
+
+    # Numbers are grouped by bin, computed over the range of the whole result
+    selected = []
+    keys = []
+    for i, (name, kind) in enumerate(kinds.items()):
+        col = f'"{name}"'
+        selected.append(col)
+        if kind == "values":
+            keys.append(col)
+        elif types[name] in NUMERIC_TYPES:
+            low, high = f"min({col}) OVER ()", f"max({col}) OVER ()"
+            selected.append(
+                f"CASE WHEN {col} IS NULL THEN NULL WHEN {high} = {low} THEN 0 ELSE least("
+                f"floor(({col} - {low}) * {bins} / ({high} - {low})), {bins - 1}"
+                f')::INTEGER END AS "__bin_{i}"'
+            )
+            keys.append(f'"__bin_{i}"')
+        else:
+            keys.append(None)
+    grouped = [key for key in keys if key]
+    aggregates = ["count(*)"]
+    for name, kind in kinds.items():
+        aggregates.append(f'count("{name}")')
+        if kind == "range":
+            aggregates += [f'min("{name}")', f'max("{name}")']
+    sets = ", ".join(f"({key})" for key in grouped)
+    grouping = f"grouping_id({', '.join(grouped)})" if grouped else "0"
+    everything = (1 << len(grouped)) - 1
+    rows = conn.sql(
+        f"WITH data AS ({query}), binned AS (SELECT {', '.join(selected) or '1'} FROM data) "
+        f"SELECT {grouping} AS grouping, {', '.join(grouped + aggregates)} "
+        f"FROM binned GROUP BY GROUPING SETS ({sets + ', ' if sets else ''}()) "
+        f"QUALIFY grouping = {everything} OR row_number() OVER "
+        f"(PARTITION BY grouping ORDER BY count(*) DESC) <= {MAX_VALUES}"
+    ).fetchall()
+
+    # The grouping id of a set has a 0 bit for the key it is grouped by
+    positions = {
+        everything ^ (1 << (len(grouped) - 1 - i)): i for i in range(len(grouped))
+    }
+    total = next(row for row in rows if row[0] == everything)
+    count, summary = total[1 + len(grouped)], iter(total[2 + len(grouped) :])
+    facets = {}
+    for name, kind in kinds.items():
+        facets[name] = {"nulls": count - next(summary)}
+        if kind == "values":
+            facets[name]["values"] = []
+        else:
+            facets[name]["min"] = to_json_value(next(summary))
+            facets[name]["max"] = to_json_value(next(summary))
+            if types[name] in NUMERIC_TYPES:
+                facets[name]["histogram"] = [0] * bins
+    names = [name for name, key in zip(kinds, keys) if key]
+    for row in rows:
+        if row[0] == everything:
+            continue
+        i = positions[row[0]]
+        value, value_count = row[1 + i], row[1 + len(grouped)]
+        if value is None:
+            continue
+        facet = facets[names[i]]
+        if "values" in facet:
+            facet["values"].append(
+                {"value": to_json_value(value), "count": value_count}
+            )
+        else:
+            facet["histogram"][value] = value_count
+    for facet in facets.values():
+        if "values" in facet:
+            facet["values"].sort(key=lambda v: (-v["count"], str(v["value"])))
+    return {"count": count, "fields": facets}
@@ -1,11 +1,13 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
+import hashlib
+import shutil
+from collections.abc import Iterable
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Literal
 
 import duckdb
-import geopandas as gpd
 import pandas as pd
 import pyarrow as pa
 import pydantic
@@ -22,11 +24,22 @@ from dplib.models import (
 from dplib.plugins.sql.models import SqlSchema
 from pygeofilter.ast import AstType
 
-from coordo.sql.builder import build_query, compile_query
-from coordo.sql.helpers import load_conn
+from coordo.sql.helpers import load_conn, spatial_conn
 
 from ..helpers import safe
+from .dataset import (
+    CHUNK_SIZE,
+    chunks,
+    new_fragment,
+    sort_fragments,
+    upsert,
+    write_fragment,
+)
+from .db_helpers import prepare_path
 from .resource import Resource
+from .scan import ResourceScan, to_pandas
+from .stats import compute_stats
+from .validation import validate_resource
 
 field_adapter = pydantic.TypeAdapter(models.IField)
 
@@ -48,19 +61,19 @@ def check_resource_fields_match(res1: Resource, res2: Resource) -> None:
 
 
 class DataPackage(pydantic.BaseModel):
-    id: Optional[str] = None
+    id: str | None = None
     name: str = pydantic.Field(pattern=r"^[a-z0-9._-]+$")
     resources: list[Resource] = []
-    title: Optional[str] = None
-    description: Optional[str] = None
-    homepage: Optional[str] = None
-    version: Optional[str] = None
+    title: str | None = None
+    description: str | None = None
+    homepage: str | None = None
+    version: str | None = None
     licenses: list[License] = []
     sources: list[Source] = []
     contributors: list[Contributor] = []
     keywords: list[str] = []
-    image: Optional[str] = None
-    created: Optional[str] = None
+    image: str | None = None
+    created: str | None = None
 
     _basepath: Path
 
@@ -115,7 +128,7 @@ class DataPackage(pydantic.BaseModel):
             if res_schema.foreignKeys:
                 for fk in res_schema.foreignKeys:
                     if fk.reference.resource == name:
-                        # build a string containing the list of foreign key field pairs 
+                        # build a string containing the list of foreign key field pairs
                         fk_part_names_str = "\n".join(res.get_fk_names(fk))
                         raise ValueError(
                             f"Can't remove the resource {name!r} : {res.name!r} has a foreign key pointing to this resource. "
@@ -123,8 +136,11 @@ class DataPackage(pydantic.BaseModel):
                         )
         # remove the file associated with the resource
         if resource.path:
-            path = handle_path(resource.path)
-            Path(self._basepath / path).unlink()
+            path = Path(self._basepath / handle_path(resource.path))
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
         # update resources list
         self.resources = [res for res in self.resources if res.name != name]
 
@@ -140,7 +156,51 @@ class DataPackage(pydantic.BaseModel):
             self.resources.append(resource)
 
     def update_resource(self, resource: Resource) -> None:
-        pass
+        """
+        Update the metadata of a resource: fields are updated or added, foreign keys are
+        added and the primary key is replaced if given. Data is left untouched, see `merge_resource`.
+        """
+        if not self.resource_exists(resource.name):
+            return self.add_resource(resource)
+        print(f"Updating resource {resource.name!r} in package {self.name!r}")
+        schema = safe(self.get_resource(resource.name), "schema")
+        new_schema = safe(resource, "schema")
+        fields = {field.name: field for field in schema.fields}
+        added = [field.name for field in new_schema.fields if field.name not in fields]
+        if added:
+            print(f"Adding fields {', '.join(added)} to resource {resource.name!r}")
+        fields.update((field.name, field) for field in new_schema.fields)
+        schema.fields = list(fields.values())
+        if new_schema.primaryKey:
+            schema.primaryKey = new_schema.primaryKey
+        for fk in new_schema.foreignKeys:
+            if fk not in schema.foreignKeys:
+                schema.foreignKeys.append(fk)
+
+    def merge_resource(self, resource_name: str, path: Path) -> tuple[int, int]:
+        """
+        Upsert the rows of the file at `path` into a resource, matching them on its primary key.
+        Returns the number of inserted and updated rows.
+        """
+        resource = self.get_resource(name=resource_name)
+        primary_key = safe(resource, "schema").primaryKey
+        if not primary_key:
+            raise ValueError(
+                f"Resource {resource_name!r} has no primary key to merge rows on"
+            )
+        directory = self.to_dataset(resource)
+        conn = spatial_conn()
+        try:
+            inserted, updated = upsert(conn, directory, prepare_path(path), primary_key)
+        finally:
+            conn.close()
+        print(
+            f"Merged into {resource_name!r}: {inserted} rows inserted, {updated} rows updated"
+        )
+        if inserted or updated:
+            # Statistics no longer match the data, they are refreshed by `update_stats`
+            resource.stats = None
+        return inserted, updated
 
     def get_resource(self, name: str) -> Resource:
         found_resources = [res for res in self.resources if res.name == name]
@@ -148,32 +208,181 @@ class DataPackage(pydantic.BaseModel):
         assert len(found_resources) > 0, f"Resource {name!r} not found."
         return found_resources[0]
 
-    def write_resource(self, resource_name: str, it: Iterable[dict]):
-        pass
-        # resource = self.get_resource(name=resource_name)
-        # schema = resource.get_schema()
+    def write_resource(
+        self,
+        resource_name: str,
+        it: Iterable[dict | pa.RecordBatch | pa.Table],
+        chunk_size: int = CHUNK_SIZE,
+    ) -> int:
+        """
+        Append rows, given as dicts or Arrow batches, to a resource.
+        The input is consumed in chunks of `chunk_size` rows which are checked against
+        the resource schema and written as new parquet fragments, so it is never fully
+        held in memory. The statistics of the resource are reset, which is only
+        persisted once the package is saved, see `save`. Returns the number of rows written.
+        """
+        resource = self.get_resource(name=resource_name)
+        directory = self.to_dataset(resource)
+        conn = spatial_conn()
+        written = 0
+        try:
+            for table in chunks(it, resource, chunk_size):
+                write_fragment(conn, table, resource, new_fragment(directory))
+                written += table.num_rows
+        finally:
+            conn.close()
+        print(f"Appended {written} rows to {resource_name!r}")
+        if written:
+            resource.stats = None
+        return written
+
+    def sort_resource(
+        self, resource_name: str, fields: list[str] | None = None
+    ) -> list[str]:
+        """
+        Sort the data of a resource on `fields`, by default the fields of its foreign
+        keys, so that the rows referencing a given parent are read from a few row
+        groups instead of the whole resource. Returns the fields sorted on.
+        """
+        resource = self.get_resource(name=resource_name)
+        if not fields:
+            fields = list(
+                dict.fromkeys(
+                    f for fk in safe(resource, "schema").foreignKeys for f in fk.fields
+                )
+            )
+        if not fields:
+            raise ValueError(
+                f"Resource {resource_name!r} has no foreign key to sort on"
+            )
+        directory = self.to_dataset(resource)
+        conn = spatial_conn()
+        try:
+            sort_fragments(conn, directory, fields)
+        finally:
+            conn.close()
+        print(f"Sorted {resource_name!r} on {', '.join(fields)}")
+        return fields
+
+    def child_references(self, name: str) -> list[tuple[Resource, models.ForeignKey]]:
+        """Resources with a foreign key to the resource `name`, with that key"""
+        return [
+            (res, fk)
+            for res in self.resources
+            for fk in safe(res, "schema").foreignKeys
+            if fk.reference.resource == name
+        ]
+
+    def to_dataset(self, resource: Resource) -> Path:
+        """
+        Make sure the data of a resource is stored as a directory of parquet fragments
+        and return that directory
+        """
+        path = Path(self._basepath, handle_path(resource.path))
+        if path.is_dir():
+            return path
+        directory = Path(self._basepath, resource.name)
+        directory.mkdir()
+        if path.exists():
+            conn = spatial_conn()
+            try:
+                resource.load_table(conn)
+                conn.execute(
+                    f"COPY \"{resource.name}\" TO '{new_fragment(directory)}' "
+                    "(FORMAT parquet, COMPRESSION zstd)"
+                )
+            finally:
+                conn.close()
+            path.unlink()
+        resource.path = resource.name
+        # The data moved, the metadata has to follow right away
+        self.save()
+        return directory
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Changes whenever the metadata or the data files of the package change,
+        computed from file sizes and modification times only.
+        """
+        digest = hashlib.sha256(
+            self.model_dump_json(round_trip=True, warnings="none").encode()
+        )
+        for resource in self.resources:
+            if not resource.path:
+                continue
+            path = Path(self._basepath, handle_path(resource.path))
+            files = sorted(path.glob("*.parquet")) if path.is_dir() else [path]
+            for file in files:
+                if file.exists():
+                    stat = file.stat()
+                    digest.update(f"{file}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+        return digest.hexdigest()
 
     def resource_exists(self, name: str) -> bool:
         return any(res.name == name for res in self.resources)
 
-    def prepare_db(self) -> tuple[duckdb.DuckDBPyConnection, sa.MetaData]:
-        conn = load_conn()
-
+    def sql_metadata(self) -> sa.MetaData:
         metadata = sa.MetaData()
-
         for resource in self.resources:
             if resource.path and resource.schema:
                 SqlSchema.from_dp(
                     resource.schema,
                     table_name=resource.name,
                 ).table.to_metadata(metadata)
+        return metadata
 
+    def prepare_db(self) -> tuple[duckdb.DuckDBPyConnection, sa.MetaData]:
+        conn = load_conn()
+
+        for resource in self.resources:
+            if resource.path and resource.schema:
                 try:
                     resource.load_table(conn)
                 except Exception as e:
-                    print(f"[WARN] Error occurred while loading table for resource {resource.name}: {e}")
+                    print(
+                        f"[WARN] Error occurred while loading table for resource {resource.name}: {e}"
+                    )
 
-        return conn, metadata
+        return conn, self.sql_metadata()
+
+    def validate(self, names: list[str] | None = None) -> dict:
+        """
+        Check the data of the resources against the constraints, categories and
+        foreign keys of their schema. Only violated constraints are reported.
+        """
+        conn, _ = self.prepare_db()
+        report = {}
+        for resource in self.resources:
+            if names is not None and resource.name not in names:
+                continue
+            try:
+                report[resource.name] = validate_resource(conn, resource)
+            except duckdb.Error as e:
+                print(f"[WARN] Could not validate resource {resource.name}: {e}")
+        conn.close()
+        return report
+
+    def update_stats(self, names: list[str] | None = None) -> None:
+        """Compute the statistics of the given resources, or all of them, from their data"""
+        conn, _ = self.prepare_db()
+        try:
+            for resource in self.resources:
+                if names is not None and resource.name not in names:
+                    continue
+                try:
+                    resource.stats = compute_stats(conn, resource)
+                except duckdb.Error as e:
+                    print(
+                        f"[WARN] Can't compute the statistics of {resource.name!r}: {e}"
+                    )
+        finally:
+            conn.close()
+
+    def scan(self, resource_name: str) -> ResourceScan:
+        """Lazy query on a resource, see `ResourceScan`"""
+        self.get_resource(resource_name)
+        return ResourceScan(self, resource_name)
 
     def read_resource(
         self,
@@ -181,27 +390,9 @@ class DataPackage(pydantic.BaseModel):
         columns: dict[str, AstType] | None = None,
         filter: AstType | None = None,
         groupby: list[str] | None = None,
-    ) -> pd.DataFrame:
-        conn, metadata = self.prepare_db()
-        query = build_query(metadata, resource_name, columns, filter, groupby)
-        query_str = compile_query(query)
-        relation = conn.sql(query_str)
-        table: pa.Table = relation.arrow().read_all()
-        conn.close()
-
-        if any(col[1].id == "geometry" for col in relation.description):
-            df = gpd.GeoDataFrame.from_arrow(
-                table,
-                to_pandas_kwargs={"maps_as_pydicts": "strict"},
-            )
-        else:
-            df = table.to_df()
-
-        # Convert numpy arrays to python lists so the dataframe is JSON-serializable
-        list_cols = [
-            field.name for field in table.schema if pa.types.is_list(field.type)
-        ]
-        for col in list_cols:
-            df[col] = df[col].apply(lambda x: x.tolist() if x is not None else None)
-
-        return df
+        output: Literal["pandas", "arrow"] = "pandas",
+    ) -> pd.DataFrame | pa.Table:
+        table = ResourceScan(self, resource_name, columns, filter, groupby).to_arrow()
+        if output == "arrow":
+            return table
+        return to_pandas(table)
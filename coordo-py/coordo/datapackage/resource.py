@@ -1,33 +1,43 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
-from typing import TYPE_CHECKING, Any, Optional, Self
+from typing import TYPE_CHECKING, Any, Self
 
 import duckdb
 import pydantic
-from dplib.models import Contributor, Dialect, ForeignKey, ForeignKeyReference, License, Schema, Source
+from dplib.models import (
+    Contributor,
+    Dialect,
+    ForeignKey,
+    ForeignKeyReference,
+    License,
+    Schema,
+    Source,
+)
 from pydantic import model_validator
 
-from .db_helpers import prepare_path
+from .db_helpers import parse_wkt, prepare_path
+from .stats import ResourceStats
 
 
 class Resource(pydantic.BaseModel):
     name: str = pydantic.Field(pattern=r"^[a-z0-9._-]+$")
-    type: Optional[str] = None
+    type: str | None = None
     path: str
-    data: Optional[Any] = None
-    dialect: Optional[Dialect | str] = None
+    data: Any | None = None
+    dialect: Dialect | str | None = None
     schema: Schema
-    title: Optional[str] = None
-    description: Optional[str] = None
-    format: Optional[str] = None
-    mediatype: Optional[str] = None
-    encoding: Optional[str] = None
-    bytes: Optional[int] = None
-    hash: Optional[str] = None
+    title: str | None = None
+    description: str | None = None
+    format: str | None = None
+    mediatype: str | None = None
+    encoding: str | None = None
+    bytes: int | None = None
+    hash: str | None = None
     sources: list[Source] = []
     licenses: list[License] = []
     contributors: list[Contributor] = []
+    stats: ResourceStats | None = None
 
     if TYPE_CHECKING:
         from .package import DataPackage
@@ -47,24 +57,37 @@ class Resource(pydantic.BaseModel):
         #     f'"{field.name}"::{to_db_type(field)} AS "{field.name}"'
         #     for field in self.schema.fields
         # )
-        query = f'CREATE VIEW "{self.name}" AS SELECT * FROM {prepare_path(self.package._basepath / self.path)}'
+        path = self.package._basepath / self.path
+        columns = "*"
+        if path.suffix == ".csv":
+            # Geometries can only be stored as WKT in text files
+            columns = parse_wkt(
+                [f.name for f in self.schema.fields if f.type == "geojson"]
+            )
+        query = (
+            f'CREATE VIEW "{self.name}" AS SELECT {columns} FROM {prepare_path(path)}'
+        )
         conn.execute(query)
 
-    def add_foreignkey(self, fields: list[str], foreign_fields: list[str], foreign_resource: str) -> None:
+    def add_foreignkey(
+        self, fields: list[str], foreign_fields: list[str], foreign_resource: str
+    ) -> None:
         # TODO: remove this check when addition of multiple fields at once is supported
         if len(fields) > 1 or len(foreign_fields) > 1:
-            raise ValueError("Adding a foreign key with multiple fields is not supported yet.")
-        
+            raise ValueError(
+                "Adding a foreign key with multiple fields is not supported yet."
+            )
+
         fk = ForeignKey(
             fields=fields,
             reference=ForeignKeyReference(
                 fields=foreign_fields,
                 resource=None if self.name == foreign_resource else foreign_resource,
-            )
+            ),
         )
         fk_part_names_str = " & ".join(self.get_fk_names(fk))
         print(f"Adding foreign key {fk_part_names_str}")
-        
+
         if not self._package:
             raise ValueError("You can't add a foreign key to an orphan resource.")
         field_names = [f.name for f in self.schema.fields]
@@ -82,21 +105,27 @@ class Resource(pydantic.BaseModel):
                 f"Resource {parent_resource.name} has no field named {f}"
             )
         if fk in self.schema.foreignKeys:
-            raise ValueError(f"Foreign key {fk_part_names_str} already exists in resource {self.name}")
+            raise ValueError(
+                f"Foreign key {fk_part_names_str} already exists in resource {self.name}"
+            )
         self.schema.foreignKeys.append(fk)
 
-    def remove_foreignkey(self, fields: list[str], foreign_fields: list[str], foreign_resource: str) -> None:
+    def remove_foreignkey(
+        self, fields: list[str], foreign_fields: list[str], foreign_resource: str
+    ) -> None:
         fk = ForeignKey(
             fields=fields,
             reference=ForeignKeyReference(
                 fields=foreign_fields,
                 resource=None if self.name == foreign_resource else foreign_resource,
-            )
+            ),
         )
         fk_part_names_str = " & ".join(self.get_fk_names(fk))
         print(f"Removing foreign key {fk_part_names_str}")
         if fk not in self.schema.foreignKeys:
-            raise ValueError(f"Foreign key {fk_part_names_str} not found in resource {self.name}")
+            raise ValueError(
+                f"Foreign key {fk_part_names_str} not found in resource {self.name}"
+            )
         self.schema.foreignKeys.remove(fk)
 
     @model_validator(mode="after")
@@ -112,7 +141,7 @@ class Resource(pydantic.BaseModel):
             if getattr(self.schema, attr) != getattr(other.schema, attr):
                 return False
         return True
-    
+
     def get_fk_names(self, fk: ForeignKey) -> list[str]:
         return [
             f"'{self.name}.{field}' -> '{fk.reference.resource}.{reference_field}'"
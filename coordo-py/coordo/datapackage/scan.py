@@ -0,0 +1,340 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import base64
+import json
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+import duckdb
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+from pygeofilter.ast import And, AstType
+from pygeofilter.parsers.cql2_json import parse as parse_cql2_json
+from pygeofilter.parsers.cql2_text import parse as parse_cql2_text
+from sqlalchemy import Select, text
+
+from coordo.sql.builder import build_query, compile_query
+from coordo.sql.parser import parse as parse_expr
+
+from ..encoder import dumps
+from .arrow import is_geometry, to_feature_collection, to_records
+from .facets import HISTOGRAM_BINS, compute_facets
+
+if TYPE_CHECKING:
+    from .package import DataPackage
+
+# Media types of the formats the result of a scan can be written to
+FORMATS = {
+    "geojson": "application/geo+json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "fgb": "application/flatgeobuf",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ResourceScan:
+    """
+    Lazy query on a resource of a package.
+    Each method returns a new scan and nothing is executed until one of
+    `to_arrow`, `to_pandas`, `to_geopandas`, `to_geojson`, `to_records`,
+    `iter_batches`, `count` or `facets` is called.
+
+    >>> dp.scan("trees").filter("height > 10").select({"h": "avg(height)"}).groupby("plot").to_arrow()
+    """
+
+    def __init__(
+        self,
+        package: "DataPackage",
+        resource: str,
+        columns: dict[str, AstType] | None = None,
+        filter: AstType | None = None,
+        groupby: list[str] | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        after: Any = None,
+        ordered: bool = False,
+    ):
+        self.package = package
+        self.resource = resource
+        self.columns = columns
+        self.filter_ = filter
+        self.groupby_ = groupby
+        self.limit_ = limit
+        self.offset_ = offset
+        self.after_ = after
+        self.ordered = ordered
+
+    def _replace(self, **kwargs) -> "ResourceScan":
+        params = {
+            "columns": self.columns,
+            "filter": self.filter_,
+            "groupby": self.groupby_,
+            "limit": self.limit_,
+            "offset": self.offset_,
+            "after": self.after_,
+            "ordered": self.ordered,
+        }
+        params.update(kwargs)
+        return ResourceScan(self.package, self.resource, **params)
+
+    def select(self, columns: list[str] | dict[str, str | AstType]) -> "ResourceScan":
+        """Columns to compute, as field names or expressions by alias"""
+        if isinstance(columns, list):
+            columns = {name: name for name in columns}
+        return self._replace(
+            columns={
+                alias: parse_expr(expr) if isinstance(expr, str) else expr
+                for alias, expr in columns.items()
+            }
+        )
+
+    def filter(self, filter: str | dict | AstType) -> "ResourceScan":
+        """Keep rows matching a CQL2 filter, given as text, JSON or AST"""
+        if isinstance(filter, str):
+            filter = parse_cql2_text(filter)
+        elif isinstance(filter, dict):
+            filter = parse_cql2_json(filter)
+        if self.filter_ is not None:
+            filter = And(self.filter_, filter)
+        return self._replace(filter=filter)
+
+    def groupby(self, *fields: str) -> "ResourceScan":
+        return self._replace(groupby=list(fields))
+
+    def limit(self, n: int) -> "ResourceScan":
+        return self._replace(limit=n)
+
+    def keyset_column(self) -> str | None:
+        """
+        Primary key the rows can be paginated on: it has to be a single field
+        which is part of the result, and rows must not be grouped.
+        """
+        primary_key = self.package.get_resource(self.resource).schema.primaryKey
+        if not primary_key or len(primary_key) != 1 or self.groupby_:
+            return None
+        (key,) = primary_key
+        if self.columns is not None and self.columns.get(key) != parse_expr(key):
+            return None
+        return key
+
+    def page(self, size: int, cursor: str | None = None) -> tuple[pa.Table, str | None]:
+        """
+        A page of at most `size` rows, starting at `cursor`, and the cursor of the
+        next page, None for the last one. Pages are read after the last primary key
+        of the previous page when possible, and by offset otherwise.
+        """
+        position = decode_cursor(cursor)
+        key = self.keyset_column()
+        if key:
+            scan = self._replace(after=position.get("after"), ordered=True)
+        else:
+            scan = self._replace(offset=position.get("offset", 0) or None, ordered=True)
+        # One more row tells if there is a next page
+        table = scan.limit(size + 1).to_arrow()
+        if table.num_rows <= size:
+            return table, None
+        table = table.slice(0, size)
+        if key:
+            return table, encode_cursor({"after": table.column(key)[-1].as_py()})
+        return table, encode_cursor({"offset": position.get("offset", 0) + size})
+
+    def build(self, metadata) -> Select:
+        query = build_query(
+            metadata, self.resource, self.columns, self.filter_, self.groupby_
+        )
+        key = self.keyset_column() if self.ordered or self.after_ is not None else None
+        table = metadata.tables[self.resource]
+        if self.after_ is not None:
+            if key is None:
+                raise ValueError(
+                    f"Rows of {self.resource!r} can't be paginated on a primary key"
+                )
+            query = query.where(table.c[key] > self.after_)
+        if self.ordered:
+            # Without a key, rows are sorted on all their values to be read in a stable order
+            query = query.order_by(table.c[key] if key else text("ALL"))
+        if self.offset_:
+            query = query.offset(self.offset_)
+        if self.limit_ is not None:
+            query = query.limit(self.limit_)
+        return query
+
+    @contextmanager
+    def connection(self) -> Iterator[tuple[duckdb.DuckDBPyConnection, str]]:
+        """Connection to the package database along with the SQL of the scan"""
+        conn, metadata = self.package.prepare_db()
+        try:
+            yield conn, compile_query(self.build(metadata))
+        finally:
+            conn.close()
+
+    @contextmanager
+    def relation(self) -> Iterator[duckdb.DuckDBPyRelation]:
+        with self.connection() as (conn, query):
+            yield conn.sql(query)
+
+    def sql(self) -> str:
+        return compile_query(self.build(self.package.sql_metadata()))
+
+    def to_arrow(self) -> pa.Table:
+        with self.relation() as relation:
+            return relation.arrow().read_all()
+
+    def iter_batches(self, batch_size: int = 10_000) -> Iterator[pa.RecordBatch]:
+        with self.relation() as relation:
+            yield from relation.to_arrow_reader(batch_size)
+
+    def count(self) -> int:
+        with self.relation() as relation:
+            return relation.aggregate("count(*)").fetchone()[0]
+
+    def facets(
+        self, fields: list[str] | None = None, bins: int = HISTOGRAM_BINS
+    ) -> dict:
+        """
+        Value counts of the categorical columns of the result and range of the
+        others, computed in one query, see `compute_facets`. Fields with
+        `categories` in the schema are counted by value.
+        """
+        categorical = {
+            field.name
+            for field in self.package.get_resource(self.resource).schema.fields
+            if getattr(field, "categories", None)
+        }
+        with self.connection() as (conn, query):
+            return compute_facets(conn, query, fields, categorical, bins)
+
+    def write(self, path: str | Path, format: str | None = None) -> None:
+        """
+        Write the result to a file, the format being one of `FORMATS` or guessed from
+        the extension of `path`. Data is streamed from DuckDB without going through pandas.
+        """
+        path = Path(path)
+        format = format or path.suffix.removeprefix(".")
+        if format not in FORMATS:
+            raise ValueError(
+                f"Unsupported format {format!r}, expected one of {', '.join(FORMATS)}"
+            )
+        if format == "geojson":
+            path.write_bytes(dumps(self.to_geojson()))
+            return
+        with self.connection() as (conn, query):
+            if format == "arrow":
+                reader = conn.sql(query).to_arrow_reader(10_000)
+                with pa.OSFile(str(path), "wb") as sink:
+                    with pa.ipc.new_stream(sink, reader.schema) as writer:
+                        for batch in reader:
+                            writer.write_batch(batch)
+            elif format == "parquet":
+                # GeoParquet metadata is written by the spatial extension
+                conn.execute(
+                    f"COPY ({query}) TO '{path}' (FORMAT parquet, COMPRESSION zstd)"
+                )
+            elif format == "fgb":
+                conn.execute(
+                    f"COPY ({query}) TO '{path}' WITH (FORMAT GDAL, DRIVER 'FlatGeobuf', "
+                    "LAYER_CREATION_OPTIONS 'SPATIAL_INDEX=YES')"
+                )
+
+    def to_bytes(self, format: str) -> bytes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, f"{self.resource}.{format}")
+            self.write(path, format)
+            return path.read_bytes()
+
+    def iter_bytes(self, format: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """
+        The result written in `format`, read in chunks of `chunk_size` bytes so that
+        large extracts are never held in memory. The file is written before this
+        returns, so errors are raised here rather than while the chunks are read.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, f"{self.resource}.{format}")
+            self.write(path, format)
+            # The open file stays readable once its directory is removed
+            file = open(path, "rb")
+        return read_chunks(file, chunk_size)
+
+    def geometry_type(self) -> str | None:
+        """Type of the first non-null geometry of the result, e.g. POINT"""
+        with self.relation() as relation:
+            geometries = [
+                name
+                for name, type in zip(relation.columns, relation.types)
+                if str(type).startswith("GEOMETRY")
+            ]
+            if not geometries:
+                return None
+            col = f'"{geometries[0]}"'
+            row = (
+                relation.filter(f"{col} IS NOT NULL")
+                .limit(1)
+                .project(f"ST_GeometryType({col})::VARCHAR")
+                .fetchone()
+            )
+            return row[0] if row else None
+
+    def to_pandas(self) -> pd.DataFrame:
+        """A GeoDataFrame if the result has a geometry column, a DataFrame otherwise"""
+        return to_pandas(self.to_arrow())
+
+    def to_geojson(self, precision: int | None = None) -> dict:
+        """The rows as a GeoJSON FeatureCollection, serialised straight from Arrow"""
+        return to_feature_collection(self.to_arrow(), precision)
+
+    def to_records(self, precision: int | None = None) -> list[dict]:
+        return to_records(self.to_arrow(), precision)
+
+    def to_geopandas(self) -> gpd.GeoDataFrame:
+        table = self.to_arrow()
+        if not has_geometry(table):
+            raise ValueError(f"No geometry column found in {self.resource!r}")
+        return to_geodataframe(table)
+
+
+def has_geometry(table: pa.Table) -> bool:
+    return any(is_geometry(field) for field in table.schema)
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    if has_geometry(table):
+        df = to_geodataframe(table)
+    else:
+        df = table.to_pandas()
+    # Lists are converted to python lists rather than numpy arrays
+    # so the dataframe is JSON-serializable
+    for field in table.schema:
+        if pa.types.is_list(field.type):
+            df[field.name] = table.column(field.name).to_pylist()
+    return df
+
+
+def to_geodataframe(table: pa.Table) -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame.from_arrow(
+        table,
+        to_pandas_kwargs={"maps_as_pydicts": "strict"},
+    )
+
+
+def encode_cursor(position: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def read_chunks(file: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    with file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def decode_cursor(cursor: str | None) -> dict:
+    if not cursor:
+        return {}
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
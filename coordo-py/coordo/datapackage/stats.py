@@ -0,0 +1,90 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import datetime
+from typing import Any
+
+import duckdb
+import pydantic
+
+# Fields for which a minimum and a maximum are computed
+ORDERED_TYPES = ("integer", "number", "date", "datetime", "time", "year")
+
+
+class FieldStats(pydantic.BaseModel):
+    nulls: int
+    distinct: int | None = None
+    min: Any | None = None
+    max: Any | None = None
+    bbox: list[float] | None = None
+    geometryTypes: list[str] | None = None
+
+
+class ResourceStats(pydantic.BaseModel):
+    """
+    Summary of the data of a resource, computed at load time so that it can be used
+    without reading the data. `distinct` counts are approximate.
+    """
+
+    rows: int
+    fields: dict[str, FieldStats] = {}
+    bbox: list[float] | None = None
+
+
+def to_json_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def field_aggregates(field) -> dict[str, str]:
+    col = f'"{field.name}"'
+    aggregates = {"nulls": f"count(*) - count({col})"}
+    if field.type == "geojson":
+        extent = f"ST_Extent_Agg({col})"
+        aggregates["bbox"] = (
+            f"[ST_XMin({extent}), ST_YMin({extent}), ST_XMax({extent}), ST_YMax({extent})]"
+        )
+        aggregates["geometryTypes"] = (
+            f"list_sort(list(DISTINCT ST_GeometryType({col})::VARCHAR) FILTER ({col} IS NOT NULL))"
+        )
+        return aggregates
+    if field.type not in ("list", "object", "array"):
+        aggregates["distinct"] = f"approx_count_distinct({col})"
+    if field.type in ORDERED_TYPES:
+        aggregates["min"] = f"min({col})"
+        aggregates["max"] = f"max({col})"
+    return aggregates
+
+
+def compute_stats(conn: duckdb.DuckDBPyConnection, resource) -> ResourceStats:
+    """Compute the statistics of a resource loaded in `conn` in a single pass over its data"""
+    available = set(conn.sql(f'SELECT * FROM "{resource.name}" LIMIT 0').columns)
+    fields = [f for f in resource.schema.fields if f.name in available]
+    selected = ["count(*)"]
+    keys = []
+    for field in fields:
+        for stat, aggregate in field_aggregates(field).items():
+            selected.append(aggregate)
+            keys.append((field.name, stat))
+    row = conn.sql(f'SELECT {", ".join(selected)} FROM "{resource.name}"').fetchone()
+
+    values: dict[str, dict] = {field.name: {} for field in fields}
+    for (name, stat), value in zip(keys, row[1:]):
+        if stat == "bbox" and None in value:
+            value = None
+        values[name][stat] = to_json_value(value)
+    stats = ResourceStats(
+        rows=row[0],
+        fields={name: FieldStats(**field) for name, field in values.items()},
+    )
+    # Extent of all the geometries of the resource
+    boxes = [field.bbox for field in stats.fields.values() if field.bbox]
+    if boxes:
+        stats.bbox = [
+            min(box[0] for box in boxes),
+            min(box[1] for box in boxes),
+            max(box[2] for box in boxes),
+            max(box[3] for box in boxes),
+        ]
+    return stats
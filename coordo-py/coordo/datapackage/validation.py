@@ -0,0 +1,199 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import re
+
+import duckdb
+
+from ..helpers import safe
+from .resource import Resource
+
+# Number of row ids reported for each violated constraint
+SAMPLE_SIZE = 5
+
+# Operator for which a value violates the constraint
+COMPARISONS = {
+    "minimum": "<",
+    "maximum": ">",
+    "exclusiveMinimum": "<=",
+    "exclusiveMaximum": ">=",
+}
+
+VARIABLE = re.compile(r"\$\{([A-Za-z_][A-Za-z_0-9]*)\}")
+
+
+def quote(value) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def category_value(category) -> str:
+    if isinstance(category, dict):
+        return str(category["value"])
+    return str(getattr(category, "value", category))
+
+
+def field_checks(field, resource: Resource) -> dict[str, str]:
+    """
+    Compile the constraints and categories of a field into SQL conditions
+    that are true for the rows violating them.
+    """
+    col = f'"{field.name}"'
+    column_names = {f.name for f in resource.schema.fields}
+    checks = {}
+    constraints = field.constraints
+    if constraints is not None:
+        values = constraints.model_dump(exclude_none=True)
+        if values.get("required"):
+            missing = [v for v in resource.schema.missingValues if v != ""] + [""]
+            checks["required"] = (
+                f"{col} IS NULL OR {col}::VARCHAR IN ({', '.join(map(quote, missing))})"
+                if field.type == "string"
+                else f"{col} IS NULL"
+            )
+        for name, op in COMPARISONS.items():
+            if name in values:
+                checks[name] = f"{col} {op} {quote(values[name])}"
+            # Constraints relative to other fields of the form, e.g. ". < ${height}"
+            if f"custom_{name}" in values:
+                expr = values[f"custom_{name}"]
+                variables = VARIABLE.findall(expr)
+                if all(var in column_names for var in variables):
+                    other = VARIABLE.sub(r'"\1"', expr)
+                    checks[f"custom_{name}"] = f"{col} {op} ({other})"
+                else:
+                    print(
+                        f"[WARN] Can't check {expr!r} on {resource.name}.{field.name}"
+                    )
+        if "pattern" in values:
+            checks["pattern"] = (
+                f"NOT regexp_full_match({col}::VARCHAR, {quote(values['pattern'])})"
+            )
+        if "minLength" in values:
+            checks["minLength"] = f"length({col}) < {values['minLength']}"
+        if "maxLength" in values:
+            checks["maxLength"] = f"length({col}) > {values['maxLength']}"
+        if "enum" in values:
+            checks["enum"] = f"{col} NOT IN ({', '.join(map(quote, values['enum']))})"
+    categories = getattr(field, "categories", None)
+    if categories:
+        choices = ", ".join(quote(category_value(c)) for c in categories)
+        if field.type == "list":
+            checks["categories"] = f"NOT list_has_all([{choices}], {col}::VARCHAR[])"
+        else:
+            checks["categories"] = f"{col}::VARCHAR NOT IN ({choices})"
+    return checks
+
+
+def binds(conn: duckdb.DuckDBPyConnection, condition: str, table: str) -> bool:
+    """Whether `condition` is valid SQL on the columns of `table`"""
+    try:
+        conn.execute(f"SELECT {condition} FROM {table} LIMIT 0")
+    except duckdb.Error:
+        return False
+    return True
+
+
+def row_id(resource: Resource) -> str:
+    primary_key = resource.schema.primaryKey
+    if primary_key and len(primary_key) == 1:
+        return f'"{primary_key[0]}"'
+    return "__row"
+
+
+def validate_resource(
+    conn: duckdb.DuckDBPyConnection,
+    resource: Resource,
+    source: str | None = None,
+    foreign_keys: bool = True,
+) -> dict:
+    """
+    Check the data of a resource, or the rows of `source` if given, against its
+    schema in a pass over the table for the field constraints and one for the foreign keys.
+    """
+    schema = safe(resource, "schema")
+    table = f'"{source or resource.name}"'
+    id_ = row_id(resource)
+    if id_ == "__row":
+        table = f"(SELECT *, row_number() OVER () AS __row FROM {table})"
+
+    checks = [
+        (field.name, constraint, condition)
+        for field in schema.fields
+        for constraint, condition in field_checks(field, resource).items()
+    ]
+    # Custom constraints are XLSForm expressions, which aren't all valid SQL, and a
+    # single one that fails would fail the query of all the checks
+    for check in [c for c in checks if c[1].startswith("custom_")]:
+        if not binds(conn, check[2], table):
+            print(f"[WARN] Can't check {check[1]} on {resource.name}.{check[0]}")
+            checks.remove(check)
+    aggregates = ["count(*)"]
+    for _, _, condition in checks:
+        aggregates.append(f"count_if({condition})")
+        aggregates.append(f"min({id_}, {SAMPLE_SIZE}) FILTER ({condition})")
+    if schema.primaryKey:
+        key = ", ".join(f'"{name}"' for name in schema.primaryKey)
+        aggregates.append(f"count(*) - count(DISTINCT ({key}))")
+    row = conn.sql(f"SELECT {', '.join(aggregates)} FROM {table}").fetchone()
+
+    report = {"rows": row[0], "fields": {}, "foreignKeys": {}}
+    for i, (field, constraint, _) in enumerate(checks):
+        count, sample = row[1 + 2 * i], row[2 + 2 * i]
+        if count:
+            violations = report["fields"].setdefault(field, {})
+            violations[constraint] = {"count": count, "sample": sample}
+    if schema.primaryKey and row[-1]:
+        report["primaryKey"] = {"count": row[-1], "sample": []}
+
+    foreign_checks = []
+    for fk in schema.foreignKeys if foreign_keys else []:
+        parent = fk.reference.resource or resource.name
+        on = " AND ".join(
+            f'c."{field}"::VARCHAR = p."{ref}"::VARCHAR'
+            for field, ref in zip(fk.fields, fk.reference.fields)
+        )
+        not_null = " AND ".join(f'c."{field}" IS NOT NULL' for field in fk.fields)
+        name = f"{','.join(fk.fields)} -> {parent}.{','.join(fk.reference.fields)}"
+        foreign_checks.append(
+            f"SELECT {quote(name)} AS name, count(*), min(c.{id_}, {SAMPLE_SIZE}) "
+            f'FROM {table} c ANTI JOIN "{parent}" p ON {on} WHERE {not_null}'
+        )
+    if foreign_checks:
+        for name, count, sample in conn.sql(
+            " UNION ALL ".join(foreign_checks)
+        ).fetchall():
+            if count:
+                report["foreignKeys"][name] = {"count": count, "sample": sample}
+
+    return report
+
+
+def count_violations(report: dict) -> int:
+    total = 0
+    for resource in report.values():
+        for violations in resource["fields"].values():
+            total += sum(v["count"] for v in violations.values())
+        total += sum(v["count"] for v in resource["foreignKeys"].values())
+        total += resource.get("primaryKey", {}).get("count", 0)
+    return total
+
+
+def format_report(report: dict) -> str:
+    lines = []
+    for name, resource in report.items():
+        lines.append(f"{name} ({resource['rows']} rows)")
+        for field, violations in resource["fields"].items():
+            for constraint, v in violations.items():
+                lines.append(
+                    f"  {field}: {constraint} x{v['count']} e.g. {v['sample']}"
+                )
+        for fk, v in resource["foreignKeys"].items():
+            lines.append(f"  {fk}: missing reference x{v['count']} e.g. {v['sample']}")
+        if "primaryKey" in resource:
+            lines.append(
+                f"  primary key: duplicated x{resource['primaryKey']['count']}"
+            )
+    lines.append(f"{count_violations(report)} violations found")
+    return "\n".join(lines)
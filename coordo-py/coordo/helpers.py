@@ -1,6 +1,7 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
+from collections.abc import Callable, Hashable
 from typing import Any, TypeVar
 
 T = TypeVar("T")
@@ -21,4 +22,14 @@ def removeQuotes(s: str) -> str:
         # Remove single quotes if present
         elif s.startswith("'") and s.endswith("'"):
             s = s.removeprefix("'").removesuffix("'")
-    return s
\ No newline at end of file
+    return s
+
+
+def cache(store: dict, key: Hashable, compute: Callable[[], T], max_size: int) -> T:
+    """Value of `key` in `store`, computed once and kept among the last `max_size` ones"""
+    if key not in store:
+        if len(store) >= max_size:
+            # Oldest entries go first
+            store.pop(next(iter(store)), None)
+        store[key] = compute()
+    return store[key]
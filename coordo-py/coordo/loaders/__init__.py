@@ -1,9 +1,16 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
-from .loader import ResourceAction, Separator, Loader
-from .kobotoolbox_loader import KoboToolboxLoader
+from .directory_loader import DirectoryLoader
 from .file_loader import FileLoader
+from .kobotoolbox_loader import KoboToolboxLoader
+from .loader import Loader, ResourceAction, Separator
 
-
-__all__ = ["ResourceAction", "Separator", "Loader", "KoboToolboxLoader", "FileLoader"]
+__all__ = [
+    "ResourceAction",
+    "Separator",
+    "Loader",
+    "KoboToolboxLoader",
+    "FileLoader",
+    "DirectoryLoader",
+]
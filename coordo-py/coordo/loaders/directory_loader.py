@@ -0,0 +1,145 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import multiprocessing
+import shutil
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from pathlib import Path
+
+from ..datapackage import Resource
+from .file_loader import TRANSCODED_EXTENSIONS, FileLoader
+from .loader import Loader, ResourceAction, Separator
+
+SUPPORTED_EXTENSIONS = (".xlsx", ".parquet") + TRANSCODED_EXTENSIONS
+
+
+def _extract(loader: FileLoader) -> tuple[list[Resource], tuple[str, int], Path | None]:
+    loader.extract()
+    return loader.resources, loader.fingerprint, loader.staging
+
+
+def _copy(loader: FileLoader) -> None:
+    shutil.copy(loader.path, loader.dp._basepath / loader.path.name)
+
+
+def _write_parquet(loader: FileLoader, path: Path) -> None:
+    loader.write_parquet(path)
+
+
+def _fingerprint(loader: FileLoader) -> tuple[str, int]:
+    return loader.fingerprint
+
+
+class DirectoryLoader(Loader):
+    """
+    Loads every file matching a glob pattern, inferring schemas and converting files
+    in a pool of processes. The package itself is only read and saved once.
+    """
+
+    def __init__(
+        self,
+        package: Path,
+        pattern: str,
+        action: ResourceAction,
+        sep: Separator = Separator.COMMA,
+        decimal_sep: Separator = Separator.DOT,
+        transcode: bool = True,
+        max_workers: int | None = None,
+    ):
+        super().__init__(package, action)
+        self.max_workers = max_workers
+        paths = sorted(
+            Path(path)
+            for path in glob(pattern, recursive=True)
+            if Path(path).suffix.lower() in SUPPORTED_EXTENSIONS
+        )
+        if not paths:
+            raise ValueError(f"No file to load matches {pattern!r}")
+        # Workers only need the package location, not its resources
+        workspace = self.dp.model_copy(update={"resources": []})
+        self.loaders = [
+            FileLoader(workspace, path, action, sep, decimal_sep, transcode)
+            for path in paths
+        ]
+
+    def etl(self, validate: bool = False):
+        # DuckDB is not fork-safe, workers are started from a fresh interpreter
+        context = multiprocessing.get_context("spawn")
+        try:
+            with ProcessPoolExecutor(self.max_workers, mp_context=context) as self.pool:
+                super().etl(validate)
+        finally:
+            for loader in self.loaders:
+                loader.discard_staging()
+
+    @property
+    def inputs(self) -> list[Path]:
+        return [loader.path for loader in self.loaders]
+
+    def is_unchanged(self) -> bool:
+        fingerprints = self.pool.map(_fingerprint, self.loaders)
+        changed = []
+        for loader, fingerprint in zip(self.loaders, fingerprints):
+            loader.fingerprint = fingerprint
+            if not self.is_loaded(loader.inputs, fingerprint):
+                changed.append(loader)
+        print(
+            f"{len(self.loaders) - len(changed)} files did not change since they were last loaded"
+        )
+        self.loaders = changed
+        return not changed
+
+    def stamp_resources(self):
+        for loader in self.loaders:
+            self._stamp(loader.resources, loader.inputs, loader.fingerprint)
+
+    def extract(self):
+        print(f"Reading {len(self.loaders)} files...")
+        results = self.pool.map(_extract, self.loaders)
+        for loader, (resources, fingerprint, staging) in zip(self.loaders, results):
+            loader.resources = resources
+            loader.fingerprint = fingerprint
+            loader.staging = staging
+            self.resources += resources
+        # Nothing has been written to the package yet, files can still be rejected
+        names = Counter(resource.name for resource in self.resources)
+        duplicates = [name for name, count in names.items() if count > 1]
+        if duplicates:
+            raise ValueError(
+                f"Several files would be loaded as resources {', '.join(map(repr, duplicates))}"
+            )
+        if self.action == ResourceAction.ADD:
+            existing = [name for name in names if self.dp.resource_exists(name)]
+            if existing:
+                raise ValueError(
+                    f"Resources {', '.join(map(repr, existing))} already exist in package "
+                    f"{self.dp.name!r}, update them instead"
+                )
+
+    def transform(self):
+        pass
+
+    def load(self):
+        # Files are converted in the workers, merging into the package is done here
+        converted = [loader for loader in self.loaders if loader.transcode]
+        paths = [self.output_path(loader.resources[0].name) for loader in converted]
+        staged = [loader for loader in self.loaders if loader.staging is not None]
+        copied = [
+            loader
+            for loader in self.loaders
+            if not loader.transcode and loader.staging is None
+        ]
+        list(self.pool.map(_write_parquet, converted, paths))
+        list(self.pool.map(_copy, copied))
+        for loader, path in zip(converted, paths):
+            self.commit(loader.resources[0].name, path)
+        for loader in staged:
+            self.commit_staged(loader.staging, loader.resources)
+        for loader in copied:
+            for resource in loader.resources:
+                self.replace_data(
+                    self.dp.get_resource(resource.name),
+                    Path(self.dp._basepath, resource.path),
+                )
@@ -1,13 +1,21 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
+import shutil
+import tempfile
 from pathlib import Path
+
 import pandas as pd
-import shutil
 
-from coordo.loaders import Loader, ResourceAction, Separator
+from coordo.loaders.loader import Loader, ResourceAction, Separator
+
 from ..datapackage import Field, Resource, Schema
-from ..datapackage.db_helpers import prepare_path, to_dp_type
+from ..datapackage.db_helpers import SAMPLE_SIZE, infer_fields, parse_wkt, prepare_path
+from ..sql.helpers import spatial_conn
+
+# Files that are converted to GeoParquet when loaded. GeoJSON is only read by GDAL
+# with its own extension, other JSON files are tables read by DuckDB
+TRANSCODED_EXTENSIONS = (".csv", ".geojson", ".zip")
 
 
 class FileLoader(Loader):
@@ -17,12 +25,33 @@ class FileLoader(Loader):
         path: Path,
         action: ResourceAction,
         sep: Separator = Separator.COMMA,
-        decimal_sep: Separator = Separator.DOT
+        decimal_sep: Separator = Separator.DOT,
+        transcode: bool = True,
     ):
         super().__init__(package, action)
         self.path = path
         self.sep = sep
         self.decimal_sep = decimal_sep
+        # Convert text and GDAL sources to parquet once instead of parsing them on every query
+        self.transcode = transcode and path.suffix.lower() in TRANSCODED_EXTENSIONS
+        # Excel sheets are converted while reading, into a directory of their own
+        # until `load` moves them into the package
+        self.staging: Path | None = None
+
+    def etl(self, validate: bool = False):
+        try:
+            super().etl(validate)
+        finally:
+            self.discard_staging()
+
+    def discard_staging(self):
+        if self.staging is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            self.staging = None
+
+    @property
+    def inputs(self) -> list[Path]:
+        return [self.path]
 
     def extract(self):
         extension = self.path.suffix.lower()
@@ -31,40 +60,85 @@ class FileLoader(Loader):
             self.readExcelFile()
 
         else:
-            query= csv_query(self.path, sep=self.sep, decimal_sep=self.decimal_sep) if extension == ".csv" else f"""
-                SELECT * FROM {prepare_path(self.path)}
-            """
-            self.resources = [self._create_resource(self.path, query)]
+            path = self.path.with_suffix(".parquet") if self.transcode else self.path
+            self.resources = [self._create_resource(path, self.source)]
 
     def transform(self):
         pass
 
     def load(self):
-        shutil.copy(self.path, self.dp._basepath / self.path.name)
-
+        if self.staging is not None:
+            self.commit_staged(self.staging, self.resources)
+        elif self.transcode:
+            name = self.resources[0].name
+            path = self.output_path(name)
+            self.write_parquet(path)
+            self.commit(name, path)
+        else:
+            shutil.copy(self.path, self.dp._basepath / self.path.name)
+            self.replace_written_data()
+
+    def replace_written_data(self):
+        for resource in self.resources:
+            self.replace_data(
+                self.dp.get_resource(resource.name),
+                Path(self.dp._basepath, resource.path),
+            )
+
+    @property
+    def source(self) -> str:
+        if self.path.suffix.lower() == ".csv":
+            return csv_source(self.path, sep=self.sep, decimal_sep=self.decimal_sep)
+        return prepare_path(self.path)
+
+    def write_parquet(self, path: Path):
+        resource = self.resources[0]
+        columns = "*"
+        if self.path.suffix.lower() == ".csv":
+            columns = parse_wkt(
+                [f.name for f in resource.schema.fields if f.type == "geojson"]
+            )
+        print(f"Converting {self.path} to {path}")
+        conn = spatial_conn()
+        try:
+            conn.execute(
+                f"COPY (SELECT {columns} FROM {self.source}) TO '{path}' "
+                "(FORMAT parquet, COMPRESSION zstd)"
+            )
+        finally:
+            conn.close()
 
     def readExcelFile(self):
         sheets = pd.read_excel(self.path, sheet_name=None)
-        for i, (sheet_name, sheet) in enumerate(sheets.items()):
-            path = Path(self.dp._basepath, sheet_name + '.parquet')
-            sheet['_index'] = sheet.index + 1
+        Path(self.dp._basepath).mkdir(parents=True, exist_ok=True)
+        self.staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.dp._basepath))
+        for sheet_name, sheet in sheets.items():
+            path = self.staging / f"{sheet_name}.parquet"
+            sheet["_index"] = sheet.index + 1
             # to_parquet method fails if column names contain dots
-            sheet.columns = [col.replace('.', '_') for col in sheet.columns]
-            sheet.to_parquet(path, index=False)
-            query= f"SELECT * FROM {prepare_path(path)}"
-
-            self.resources.append(self._create_resource(path, query))
-
-
-    def _create_resource(self, path: Path, query: str) -> Resource:
+            sheet.columns = [col.replace(".", "_") for col in sheet.columns]
+            sheet.to_parquet(path, index=False, compression="zstd")
+
+            resource = self._create_resource(path, prepare_path(path))
+            geometries = [f.name for f in resource.schema.fields if f.type == "geojson"]
+            if geometries:
+                # Only text files are read as WKT, the geometries of sheets are parsed once here
+                parsed = path.with_suffix(".wkb.parquet")
+                conn = spatial_conn()
+                try:
+                    conn.execute(
+                        f"COPY (SELECT {parse_wkt(geometries)} FROM {prepare_path(path)}) "
+                        f"TO '{parsed}' (FORMAT parquet, COMPRESSION zstd)"
+                    )
+                finally:
+                    conn.close()
+                parsed.replace(path)
+            self.resources.append(resource)
+
+    def _create_resource(self, path: Path, from_: str) -> Resource:
         schema = Schema()
-        conn, _ = self.dp.prepare_db()
-        rel = conn.sql(query)
-
-        for name, type in zip(rel.columns, rel.types):
-            schema.add_field(Field(name=name, **to_dp_type(type)))
-
-        conn.close()
+        for field in infer_fields(from_):
+            schema.add_field(Field(**field))
 
         # creating resurce for file
         return Resource(
@@ -72,9 +146,12 @@ class FileLoader(Loader):
             path=path.name,
             schema=schema,
         )
-    
-def csv_query(path: Path, sep: Separator = Separator.COMMA, decimal_sep: Separator = Separator.DOT):
-    return f"""
-        SELECT * 
-        FROM read_csv({prepare_path(path)}, sep='{sep.value}', decimal_separator='{decimal_sep.value}', auto_detect=true)
-    """
\ No newline at end of file
+
+
+def csv_source(
+    path: Path, sep: Separator = Separator.COMMA, decimal_sep: Separator = Separator.DOT
+):
+    return (
+        f"read_csv({prepare_path(path)}, sep='{sep.value}', decimal_separator='{decimal_sep.value}', "
+        f"auto_detect=true, sample_size={SAMPLE_SIZE})"
+    )
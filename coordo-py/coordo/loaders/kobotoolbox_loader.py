@@ -5,7 +5,7 @@ import json
 from datetime import date, datetime
 from pathlib import Path
 from time import time
-from typing import Any, Dict, List, cast
+from typing import Any, cast
 
 import geopandas as gpd
 import numpy as np
@@ -21,7 +21,7 @@ from coordo.datapackage import (
     Resource,
     Schema,
 )
-from coordo.helpers import safe, removeQuotes
+from coordo.helpers import removeQuotes, safe
 from coordo.loaders.loader import Loader, ResourceAction
 
 CONSTRAINT_GRAMMAR = r"""
@@ -50,8 +50,10 @@ VAR: "${" /[A-Za-z_][A-Za-z_0-9]*/ "}"
 %ignore WS
 """
 
+
 def isCustomConstraint(constraint: str) -> bool:
-        return not (isinstance(constraint, float) or isinstance(constraint, int))
+    return not (isinstance(constraint, float) or isinstance(constraint, int))
+
 
 class RangeTransformer(Transformer):
     def arg_list(self, items):
@@ -76,12 +78,12 @@ class RangeTransformer(Transformer):
             case ">=":
                 constraintName += "minimum"
             case "<=":
-                constraintName +="maximum"
+                constraintName += "maximum"
             case ">":
                 constraintName += "exclusiveMinimum"
             case "<":
-                constraintName +="exclusiveMaximum"
-        
+                constraintName += "exclusiveMaximum"
+
         return {constraintName: expr}
 
     def func_call(self, items):
@@ -168,7 +170,11 @@ def stringify(obj):
 
 
 def coords_to_point(coords):
-    if pd.isna(coords) or coords is None or (isinstance(coords, str) and not coords.strip()):
+    if (
+        pd.isna(coords)
+        or coords is None
+        or (isinstance(coords, str) and not coords.strip())
+    ):
         return None
     try:
         lat, lon, alt, prec = map(float, str(coords).split(" "))
@@ -197,7 +203,7 @@ def create_main_resource(xlsform: Path) -> Resource:
 
 
 def _parse_questions(
-    questions: List[Dict[str, Any]], resource: Resource
+    questions: list[dict[str, Any]], resource: Resource
 ) -> list[Resource]:
     """
     Parses questions (list of dictionaries) and adds them to the resource's schema.
@@ -276,7 +282,9 @@ def _parse_questions(
                         constraints.update(constraint)  # type: ignore
                     # Fallback in case of unsupported constraint syntax
                     except Exception as e:
-                        print(f"Error parsing constraint for question {question['name']}: {e}")
+                        print(
+                            f"Error parsing constraint for question {question['name']}: {e}"
+                        )
                         constraints.update({"unknownConstraint": bind["constraint"]})
             kwargs["constraints"] = constraints
             if "choices" in question:
@@ -305,6 +313,18 @@ class KoboToolboxLoader(Loader):
         self.xlsform = xlsform
         self.xlsdata = xlsdata
 
+    @property
+    def inputs(self) -> list[Path]:
+        return [self.xlsform, self.xlsdata]
+
+    def output_path(self, name: str) -> Path:
+        """
+        Exports are always loaded whole: their `_id` is the position of the
+        submission in the export, which isn't stable enough to merge on, and
+        submissions deleted upstream have to disappear.
+        """
+        return Path(self.dp._basepath, name + ".parquet")
+
     def extract(self):
         """
         The xlsform is parsed with the pyxform.xls2json.parse_file_to_json function
@@ -376,7 +396,7 @@ class KoboToolboxLoader(Loader):
         print("Loading data...")
         for table_name, sheet in self.processed_sheets.items():
             resource = self.dp.get_resource(table_name)
-            path = Path(self.dp._basepath, table_name + ".parquet")
+            path = self.output_path(table_name)
             print(f"Saving {table_name!r} to {path}")
 
             geo_cols = [
@@ -405,3 +425,4 @@ class KoboToolboxLoader(Loader):
                 )
             else:
                 sheet.to_parquet(path, index=False)
+            self.commit(table_name, path)
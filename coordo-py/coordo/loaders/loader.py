@@ -1,12 +1,18 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
+import hashlib
+import shutil
 from abc import ABC, abstractmethod
-from pathlib import Path
 from enum import Enum
+from functools import cached_property
+from pathlib import Path
+
+from dplib.models import Source
 
 from ..datapackage import DataPackage
 from ..datapackage.resource import Resource
+from ..datapackage.validation import format_report
 
 
 class ResourceAction(str, Enum):
@@ -14,25 +20,94 @@ class ResourceAction(str, Enum):
     UPDATE = "update"
     REMOVE = "remove"
 
+
 class Separator(str, Enum):
     COMMA = ","
     SEMICOLON = ";"
     TAB = "\t"
     PIPE = "|"
     DOT = "."
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def fingerprint(paths: list[Path]) -> tuple[str, int]:
+    """
+    Streaming sha256 of the content of `paths`, returned in the datapackage
+    `hash` format along with their total size in bytes
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+    return f"sha256:{digest.hexdigest()}", size
+
+
 class Loader(ABC):
-    def __init__(self, package: Path, action: ResourceAction):
-        self.dp = DataPackage.from_path(package)
+    def __init__(self, package: Path | DataPackage, action: ResourceAction):
+        self.dp = (
+            package
+            if isinstance(package, DataPackage)
+            else DataPackage.from_path(package)
+        )
         self.action = action
         self.resources: list[Resource] = []
 
-    def etl(self):
+    def etl(self, validate: bool = False):
+        if self.action == ResourceAction.UPDATE and self.is_unchanged():
+            print("Inputs did not change since they were last loaded, skipping")
+            return
         self.extract()
         self.handle_resources()
         if self.action in [ResourceAction.ADD, ResourceAction.UPDATE]:
             self.transform()
             self.load()
+            self.stamp_resources()
+            self.dp.update_stats([resource.name for resource in self.resources])
         self.dp.save()
+        if validate and self.action != ResourceAction.REMOVE:
+            report = self.dp.validate([resource.name for resource in self.resources])
+            print(format_report(report))
+
+    @cached_property
+    def fingerprint(self) -> tuple[str, int]:
+        return fingerprint(self.inputs)
+
+    def is_loaded(self, inputs: list[Path], fingerprint: tuple[str, int]) -> bool:
+        hash, _ = fingerprint
+        names = [path.name for path in inputs]
+        loaded = [
+            res
+            for res in self.dp.resources
+            if res.hash == hash and [source.title for source in res.sources] == names
+        ]
+        return bool(loaded) and all(
+            Path(self.dp._basepath, res.path).exists() for res in loaded
+        )
+
+    def is_unchanged(self) -> bool:
+        return self.is_loaded(self.inputs, self.fingerprint)
+
+    def stamp_resources(self):
+        self._stamp(self.resources, self.inputs, self.fingerprint)
+
+    def _stamp(
+        self,
+        resources: list[Resource],
+        inputs: list[Path],
+        fingerprint: tuple[str, int],
+    ):
+        """Record which inputs, and which version of them, the resources were loaded from"""
+        hash, bytes = fingerprint
+        for resource in resources:
+            if self.dp.resource_exists(resource.name):
+                resource = self.dp.get_resource(resource.name)
+                resource.hash, resource.bytes = hash, bytes
+                resource.sources = [Source(title=path.name) for path in inputs]
 
     def handle_resources(self):
         for resource in self.resources:
@@ -43,6 +118,49 @@ class Loader(ABC):
             elif self.action == ResourceAction.REMOVE:
                 self.dp.remove_resource(resource.name)
 
+    def output_path(self, name: str) -> Path:
+        """
+        Where to write the new data of a resource. On update, resources with a primary
+        key are staged next to their data to be merged into it by `commit`.
+        """
+        if (
+            self.action == ResourceAction.UPDATE
+            and self.dp.get_resource(name).schema.primaryKey
+        ):
+            return Path(self.dp._basepath, f".{name}.staging.parquet")
+        return Path(self.dp._basepath, name + ".parquet")
+
+    def commit(self, name: str, path: Path):
+        resource = self.dp.get_resource(name)
+        if path.name.endswith(".staging.parquet"):
+            try:
+                self.dp.merge_resource(name, path)
+            finally:
+                path.unlink()
+        else:
+            self.replace_data(resource, path)
+
+    def commit_staged(self, staging: Path, resources: list[Resource]):
+        """Move the data of resources written to a staging directory into the package"""
+        for resource in resources:
+            path = self.output_path(resource.name)
+            shutil.move(staging / resource.path, path)
+            self.commit(resource.name, path)
+
+    def replace_data(self, resource: Resource, path: Path):
+        """Point a resource to its newly written data, removing the previous one"""
+        previous = Path(self.dp._basepath, resource.path)
+        if previous != path and previous.is_dir():
+            shutil.rmtree(previous)
+        elif previous != path and previous.exists():
+            previous.unlink()
+        resource.path = path.name
+
+    @property
+    @abstractmethod
+    def inputs(self) -> list[Path]:
+        raise NotImplementedError()
+
     @abstractmethod
     def extract(self):
         raise NotImplementedError()
@@ -1,7 +1,11 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
+import hashlib
 import json
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from pathlib import Path
 from typing import Annotated, Any
 
@@ -9,15 +13,36 @@ from geojson.feature import FeatureCollection
 from pydantic import BaseModel, Discriminator
 from pygeofilter.parsers.cql2_json import parse as parse_cql2
 
+from coordo.datapackage import DataPackage
+from coordo.sql.helpers import QueryScope
+
+from ..helpers import cache
+from .base import NotFoundError
 from .datapackage import DataPackageLayer
+from .density import DensityLayer
+from .grid import GridLayer
 from .maplibre_style_spec_v8 import Layer, Source, Style
 from .openmaptiles import OpenMapTilesLayer
+from .singleflight import SingleFlight
 from .xyzservices import XYZServicesLayer
 
 LayerModel = Annotated[
-    DataPackageLayer | OpenMapTilesLayer | XYZServicesLayer, Discriminator("type")
+    DataPackageLayer | DensityLayer | GridLayer | OpenMapTilesLayer | XYZServicesLayer,
+    Discriminator("type"),
 ]
 
+# Number of layers evaluated at the same time when building the style
+MAX_WORKERS = 8
+# Seconds a layer can run before it is left out of the style and its queries interrupted
+LAYER_TIMEOUT = 60
+
+# Concurrent requests for the same layer data are computed once
+FLIGHTS = SingleFlight()
+
+# Facets by layer, data and filter, so the filter panel can refresh its counts cheaply
+FACETS: dict[str, dict] = {}
+MAX_CACHED_FACETS = 1024
+
 
 class Map(BaseModel):
     title: str | None = None
@@ -30,13 +55,66 @@ class Map(BaseModel):
     def from_dict(cls, data: dict):
         return cls.model_validate(data)
 
-    def handle_request(self, method: str, path: str, filters: dict | str | bytes):
+    def handle_request(
+        self,
+        method: str,
+        path: str,
+        filters: dict | str | bytes,
+        data_url: str | None = None,
+        format: str = "geojson",
+        limit: int | None = None,
+        cursor: str | None = None,
+        fields: list[str] | None = None,
+        zoom: float | None = None,
+        time: str | None = None,
+        bbox: list[float] | None = None,
+    ):
+        """
+        GET returns the style, the data of a layer when `path` is its id, or a
+        feature with all its properties for `<layer id>/features/<feature id>`
+        and the rows of a resource referencing it for
+        `<layer id>/features/<feature id>/<resource>`, a PNG tile of a density
+        layer for `<layer id>/tiles/<z>/<x>/<y>.png`, and POST returns the data
+        of a layer filtered by the CQL2 JSON body. `<layer id>/facets` returns
+        the value counts and ranges of `fields` of a layer, filtered by the body
+        for POST, see `get_facets`.
+        `data_url` is the URL layers are served at, see `get_maplibre_style`.
+        Layer data is returned in `format`, see `ResourceScan.write`, other
+        formats than GeoJSON being streamed whole. POST requests for GeoJSON
+        and GET requests with a `limit` or a `cursor` are paginated, see
+        `DataPackageLayer.get_page`, while GET requests without them return the
+        whole layer, as MapLibre doesn't follow pages when loading sources.
+        Grid layers are aggregated for the map `zoom` within its viewport `bbox`,
+        see `GridLayer`, and
+        layers with a time dimension are sliced on `time`, see
+        `DataPackageLayer.get_time_range`.
+        """
         if isinstance(filters, (str, bytes)):
             filters = json.loads(filters) if filters else {}
+        layer_id, _, facets = path.partition("/")
+        if facets == "facets" and method.lower() in ("get", "post"):
+            return self.get_facets(layer_id, filters or None, fields)
         if method.lower() == "get":
-            return self.get_maplibre_style()
+            layer_id, _, tile = path.partition("/tiles/")
+            if tile:
+                z, x, y = tile.removesuffix(".png").split("/")
+                return self.get_tile(layer_id, int(z), int(x), int(y), filters or None)
+            layer_id, _, feature_path = path.partition("/features/")
+            feature_id, _, child = feature_path.partition("/")
+            if child:
+                return self.get_children(layer_id, feature_id, child)
+            if feature_id:
+                return self.get_feature(layer_id, feature_id)
+            if any(layer.id == path for layer in self.layers):
+                paginate = limit is not None or cursor is not None
+                return self.get_layer_data(
+                    path, None, format, limit, cursor, zoom, time, paginate, bbox
+                )
+            return self.get_maplibre_style(data_url)
         elif method.lower() == "post":
-            return self.get_layer_data(path, filters)
+            return self.get_layer_data(
+                path, filters, format, limit, cursor, zoom, time, bbox=bbox
+            )
         else:
             raise ValueError(f"Method {method.lower()} not supported.")
 
@@ -47,26 +125,184 @@ class Map(BaseModel):
         self._base_path = path.parent
         return self
 
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever the data of one of the layers changes"""
+        digest = hashlib.sha256()
+        for layer in self.layers:
+            if isinstance(layer, (DataPackageLayer, DensityLayer, GridLayer)):
+                package = DataPackage.from_path(self._base_path / layer.path)
+                digest.update(package.fingerprint.encode())
+        return digest.hexdigest()
+
     def _get_layer(self, layer_id: str):
         layer = next((la for la in self.layers if la.id == layer_id), None)
         if layer is None:
-            raise ValueError(f"Layer with id {layer_id} not found")
+            raise NotFoundError(f"Layer with id {layer_id} not found")
         return layer
 
     def get_layer_data(
-        self, layer_id: str, json_filters: dict | None = None
-    ) -> FeatureCollection:
+        self,
+        layer_id: str,
+        json_filters: dict | None = None,
+        format: str = "geojson",
+        limit: int | None = None,
+        cursor: str | None = None,
+        zoom: float | None = None,
+        time: str | None = None,
+        paginate: bool = True,
+        bbox: list[float] | None = None,
+    ) -> FeatureCollection | Iterator[bytes]:
         layer = self._get_layer(layer_id)
         filters = parse_cql2(json_filters) if json_filters else None
-        return layer.get_data(base_path=self._base_path, filter=filters)
 
-    def get_maplibre_style(self) -> Style:
+        def get_data():
+            return layer.get_data(
+                base_path=self._base_path,
+                filter=filters,
+                format=format,
+                limit=limit,
+                cursor=cursor,
+                zoom=zoom,
+                time=time,
+                paginate=paginate,
+                bbox=bbox,
+            )
+
+        if format != "geojson":
+            # Extracts are streamed to each caller, they can't be shared
+            return get_data()
+        key = json.dumps(
+            [
+                str(self._base_path),
+                layer.model_dump(mode="json"),
+                json_filters or None,
+                format,
+                limit,
+                cursor,
+                zoom,
+                time,
+                paginate,
+                bbox,
+            ],
+            sort_keys=True,
+        )
+        return FLIGHTS.do(key, get_data)
+
+    def get_feature(self, layer_id: str, feature_id: str) -> dict | None:
+        layer = self._get_layer(layer_id)
+        if not isinstance(layer, DataPackageLayer):
+            raise ValueError(f"Layer {layer_id!r} has no features")
+        return layer.get_feature(base_path=self._base_path, feature_id=feature_id)
+
+    def get_facets(
+        self,
+        layer_id: str,
+        json_filters: dict | None = None,
+        fields: list[str] | None = None,
+    ) -> dict:
+        layer = self._get_layer(layer_id)
+        if not isinstance(layer, DataPackageLayer):
+            raise ValueError(f"Layer {layer_id!r} has no facets")
+        package = DataPackage.from_path(self._base_path / layer.path)
+        key = json.dumps(
+            [
+                str(self._base_path),
+                layer.model_dump(mode="json"),
+                package.fingerprint,
+                json_filters,
+                fields,
+            ],
+            sort_keys=True,
+        )
+        filters = parse_cql2(json_filters) if json_filters else None
+        return cache(
+            FACETS,
+            key,
+            lambda: FLIGHTS.do(
+                f"facets:{key}",
+                lambda: layer.get_facets(
+                    base_path=self._base_path, filter=filters, fields=fields
+                ),
+            ),
+            MAX_CACHED_FACETS,
+        )
+
+    def get_tile(
+        self, layer_id: str, z: int, x: int, y: int, json_filters: dict | None = None
+    ) -> bytes:
+        layer = self._get_layer(layer_id)
+        if not isinstance(layer, DensityLayer):
+            raise ValueError(f"Layer {layer_id!r} has no tiles")
+        filters = parse_cql2(json_filters) if json_filters else None
+        return layer.get_tile(base_path=self._base_path, z=z, x=x, y=y, filter=filters)
+
+    def get_children(
+        self, layer_id: str, feature_id: str, resource: str
+    ) -> list[dict] | None:
+        layer = self._get_layer(layer_id)
+        if not isinstance(layer, DataPackageLayer):
+            raise ValueError(f"Layer {layer_id!r} has no features")
+        return layer.get_children(
+            base_path=self._base_path, feature_id=feature_id, resource=resource
+        )
+
+    def get_maplibre_style(self, data_url: str | None = None) -> Style:
+        """
+        Build the MapLibre style of the map. By default the data of the layers is
+        embedded in their sources; with `data_url` the sources only reference
+        `{data_url}{layer id}` so the style stays small and the data is fetched in parallel.
+        """
         map_sources: dict[str, Source] = {}
         map_layers: list[Layer] = []
-        for layer in self.layers:
-            sources, layer = layer.to_maplibre(self._base_path)
-            map_sources.update(sources)
-            map_layers.append(layer)
+        # Each layer opens its own DuckDB connection, which releases the GIL while
+        # queries run, so layers are evaluated concurrently
+        pool = ThreadPoolExecutor(min(MAX_WORKERS, len(self.layers) or 1))
+        scopes = [QueryScope() for _ in self.layers]
+        build_start = time.monotonic()
+
+        def to_maplibre(layer, scope: QueryScope):
+            with scope:
+                return layer.to_maplibre(self._base_path, data_url)
+
+        futures = [
+            pool.submit(to_maplibre, layer, scope)
+            for layer, scope in zip(self.layers, scopes)
+        ]
+        try:
+            for layer, scope, future in zip(self.layers, scopes, futures):
+                # Layers are timed from when they start running, not while they wait for
+                # a worker, but workers stuck in Python code can't be interrupted
+                if not scope.started.wait(
+                    max(0, build_start + LAYER_TIMEOUT - time.monotonic())
+                ):
+                    print(
+                        f"[WARN] Layer {layer.id!r} didn't start within {LAYER_TIMEOUT}s, skipping it"
+                    )
+                    future.cancel()
+                    scope.interrupt()
+                    continue
+                remaining = scope.started_at + LAYER_TIMEOUT - time.monotonic()
+                # A failing or slow layer doesn't prevent the map from being displayed
+                try:
+                    sources, style_layer = future.result(timeout=max(0, remaining))
+                except TimeoutError:
+                    print(
+                        f"[WARN] Layer {layer.id!r} took more than {LAYER_TIMEOUT}s, skipping it"
+                    )
+                    # Free the worker for the layers waiting for one
+                    scope.interrupt()
+                    continue
+                except Exception as e:  # noqa: BLE001
+                    print(
+                        f"[WARN] Error occurred while building layer {layer.id!r}: {e}"
+                    )
+                    continue
+                map_sources.update(sources)
+                map_layers.append(style_layer)
+        finally:
+            # Don't wait for the layers that timed out
+            pool.shutdown(wait=False, cancel_futures=True)
         metadata = {}
         if self.controls:
             metadata["controls"] = self.controls
@@ -1,8 +1,8 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
+from collections.abc import Mapping
 from pathlib import Path
-from typing import Mapping
 
 from pydantic import BaseModel
 from pygeofilter.ast import AstType as Filter
@@ -10,6 +10,10 @@ from pygeofilter.ast import AstType as Filter
 from .maplibre_style_spec_v8 import Layer, Source
 
 
+class NotFoundError(ValueError):
+    """A layer, or a feature of a layer, that doesn't exist"""
+
+
 class BaseLayerModel(BaseModel):
     id: str
     type: str
@@ -18,8 +22,33 @@ class BaseLayerModel(BaseModel):
     def from_dict(cls, dic):
         return cls.model_validate(dic)
 
-    def to_maplibre(self, base_path: Path) -> tuple[Mapping[str, Source], Layer]:
+    def to_maplibre(
+        self, base_path: Path, data_url: str | None = None
+    ) -> tuple[Mapping[str, Source], Layer]:
+        """
+        Sources and style layer of the map layer. If `data_url` is given,
+        sources reference the data at `{data_url}{layer id}` instead of embedding it.
+        """
         raise NotImplementedError
 
-    def get_data(self, *, base_path: Path, filter: Filter | None = None):
+    def get_data(
+        self,
+        *,
+        base_path: Path,
+        filter: Filter | None = None,
+        format: str = "geojson",
+        limit: int | None = None,
+        cursor: str | None = None,
+        zoom: float | None = None,
+        time: str | None = None,
+        paginate: bool = True,
+        bbox: list[float] | None = None,
+    ):
+        """
+        GeoJSON data of the layer, or its encoding in another format as chunks of bytes.
+        GeoJSON is paginated, `cursor` being the `next` member of the previous page,
+        unless `paginate` is False.
+        `zoom` is the zoom level of the map and `bbox` its viewport, for layers whose
+        data depends on them, and `time` a range of dates for layers with a time dimension.
+        """
         raise NotImplementedError
@@ -0,0 +1,244 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import dataclasses
+import datetime
+from typing import Literal
+
+import duckdb
+import pyarrow as pa
+import sqlalchemy as sa
+from pydantic import BaseModel
+from pygeofilter.ast import And, AstType, Attribute, GreaterEqual, LessEqual
+
+from coordo.datapackage import DataPackage
+from coordo.sql.builder import build_query, compile_query, extend_table
+from coordo.sql.helpers import AGGREGATES, spatial_conn
+from coordo.sql.parser import Func
+
+# Aggregates of time buckets that can be combined into the aggregate of a time range
+COMBINE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+BUCKET = "__bucket"
+
+
+class TimeDimension(BaseModel):
+    """Date or datetime field the data of a layer is sliced on, in buckets of a day, week or month"""
+
+    field: str
+    bucket: Literal["day", "week", "month"] = "day"
+
+
+def parse_time_range(value: str) -> tuple[datetime.date | None, datetime.date | None]:
+    """
+    Bounds of a range of buckets such as `2024-01-01/2024-03-01`, both included.
+    An empty or `..` bound leaves the range open and a single date is a single bucket.
+    """
+    start, separator, end = value.partition("/")
+    if not separator:
+        end = start
+    try:
+        return tuple(
+            None if bound in ("", "..") else datetime.date.fromisoformat(bound[:10])
+            for bound in (start, end)
+        )
+    except ValueError:
+        raise ValueError(
+            f"Invalid time range {value!r}, expected <start>/<end> dates"
+        ) from None
+
+
+def calls(node, names) -> bool:
+    """Whether an expression calls one of the functions `names`"""
+    if isinstance(node, Func) and node.name.lower() in names:
+        return True
+    if dataclasses.is_dataclass(node):
+        return any(
+            calls(getattr(node, f.name), names) for f in dataclasses.fields(node)
+        )
+    if isinstance(node, list):
+        return any(calls(item, names) for item in node)
+    return False
+
+
+def is_aggregate(node) -> bool:
+    return calls(node, AGGREGATES)
+
+
+def can_combine(columns: dict[str, AstType] | None, groupby: list[str] | None) -> bool:
+    """
+    Whether the result of a time range can be computed from the buckets: the rows
+    are grouped and every aggregated column is a sum, count, min or max of values
+    which are not distinct ones. The buckets of ungrouped rows would be a copy of
+    the rows, these are read for each range instead.
+    """
+    if not groupby:
+        return False
+    return all(
+        isinstance(expr, Func)
+        and expr.name.lower() in COMBINE
+        and not is_aggregate(expr.args)
+        # Distinct values of several buckets may overlap
+        and not calls(expr.args, ("unique",))
+        or not is_aggregate(expr)
+        for expr in (columns or {}).values()
+    )
+
+
+def bucket_view(
+    conn: duckdb.DuckDBPyConnection,
+    metadata: sa.MetaData,
+    resource: str,
+    time: TimeDimension,
+) -> str:
+    """View of a resource with the time bucket of its rows, queryable by `build_query`"""
+    view = f"{resource}__time"
+    conn.execute(
+        f'CREATE VIEW "{view}" AS SELECT *, '
+        f'date_trunc(\'{time.bucket}\', "{time.field}")::DATE AS "{BUCKET}" FROM "{resource}"'
+    )
+    extend_table(metadata, resource, view, {BUCKET: sa.Date})
+    return view
+
+
+def range_filter(start: datetime.date | None, end: datetime.date | None):
+    filters = []
+    if start is not None:
+        filters.append(GreaterEqual(Attribute(BUCKET), start.isoformat()))
+    if end is not None:
+        filters.append(LessEqual(Attribute(BUCKET), end.isoformat()))
+    return filters
+
+
+def without_keys(columns: dict[str, AstType], groupby: list[str]) -> dict[str, AstType]:
+    """Columns named after a group key would be selected twice, along with the key"""
+    return {alias: expr for alias, expr in columns.items() if alias not in groupby}
+
+
+def geometry_columns(relation: duckdb.DuckDBPyRelation) -> list[str]:
+    return [
+        name
+        for name, type in zip(relation.columns, relation.types)
+        if str(type).startswith("GEOMETRY")
+    ]
+
+
+def build_cube(
+    package: DataPackage,
+    resource: str,
+    columns: dict[str, AstType] | None,
+    filter: AstType | None,
+    groupby: list[str],
+    time: TimeDimension,
+) -> pa.Table:
+    """
+    Result of the query of a grouped layer per time bucket, in the `__bucket` column.
+    Geometries are kept as WKB so that the cube can be queried without the spatial
+    extension, their names being listed in the `geometries` schema metadata.
+    """
+    conn, metadata = package.prepare_db()
+    try:
+        view = bucket_view(conn, metadata, resource, time)
+        query = build_query(
+            metadata, view, without_keys(columns, groupby), filter, [*groupby, BUCKET]
+        )
+        sql = compile_query(query)
+        geometries = geometry_columns(conn.sql(sql))
+        if geometries:
+            replaced = ", ".join(
+                f'ST_AsWKB("{name}") AS "{name}"' for name in geometries
+            )
+            sql = f"SELECT * REPLACE ({replaced}) FROM ({sql})"
+        table = conn.sql(sql).arrow().read_all()
+    finally:
+        conn.close()
+    return table.replace_schema_metadata({"geometries": ",".join(geometries)})
+
+
+def slice_cube(
+    cube: pa.Table,
+    columns: dict[str, AstType] | None,
+    groupby: list[str],
+    start: datetime.date | None,
+    end: datetime.date | None,
+    limit: int | None = None,
+    offset: int = 0,
+) -> pa.Table:
+    """
+    At most `limit` groups of a range of buckets after the first `offset` ones,
+    combined from the cube
+    """
+    geometries = [
+        g for g in cube.schema.metadata[b"geometries"].decode().split(",") if g
+    ]
+    conditions = []
+    if start is not None:
+        conditions.append(f"\"{BUCKET}\" >= '{start.isoformat()}'::DATE")
+    if end is not None:
+        conditions.append(f"\"{BUCKET}\" <= '{end.isoformat()}'::DATE")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = spatial_conn()
+    try:
+        conn.register("cube", cube)
+        types = dict(zip(conn.table("cube").columns, conn.table("cube").types))
+        keys = ", ".join(f'"{key}"' for key in groupby)
+        selected = [keys]
+        for alias, expr in (columns or {}).items():
+            if alias in groupby:
+                continue
+            if is_aggregate(expr):
+                combined = f'{COMBINE[expr.name.lower()]}("{alias}")'
+                # Sums of integers are wider than integers, keep the type of the buckets
+                selected.append(f'CAST({combined} AS {types[alias]}) AS "{alias}"')
+            else:
+                selected.append(f'any_value("{alias}") AS "{alias}"')
+        sql = (
+            f"SELECT {', '.join(selected)} FROM cube {where} GROUP BY {keys} "
+            f"ORDER BY {keys} {'' if limit is None else f'LIMIT {limit}'} OFFSET {offset}"
+        )
+        if geometries:
+            replaced = ", ".join(
+                f'ST_GeomFromWKB("{name}") AS "{name}"' for name in geometries
+            )
+            sql = f"SELECT * REPLACE ({replaced}) FROM ({sql})"
+        return conn.sql(sql).arrow().read_all()
+    finally:
+        conn.close()
+
+
+def query_time_range(
+    package: DataPackage,
+    resource: str,
+    columns: dict[str, AstType] | None,
+    filter: AstType | None,
+    groupby: list[str] | None,
+    time: TimeDimension,
+    start: datetime.date | None,
+    end: datetime.date | None,
+    limit: int | None = None,
+    offset: int = 0,
+) -> pa.Table:
+    """
+    At most `limit` rows of the query of a layer over a range of buckets after the
+    first `offset` ones, computed from the rows
+    """
+    filters = range_filter(start, end) + ([filter] if filter is not None else [])
+    conn, metadata = package.prepare_db()
+    try:
+        view = bucket_view(conn, metadata, resource, time)
+        combined = None
+        for item in filters:
+            combined = item if combined is None else And(combined, item)
+        if groupby:
+            columns = without_keys(columns, groupby)
+        query = build_query(metadata, view, columns, combined, groupby)
+        if not columns:
+            # The bucket is not part of the rows of the layer
+            query = query.with_only_columns(
+                *(col for col in metadata.tables[view].columns if col.name != BUCKET)
+            )
+        # Rows are sorted on all their values to be paginated in a stable order
+        query = query.order_by(sa.text("ALL")).offset(offset or None).limit(limit)
+        return conn.sql(compile_query(query)).arrow().read_all()
+    finally:
+        conn.close()
@@ -1,23 +1,65 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
+from collections.abc import Iterator
+from functools import reduce
 from typing import Literal
 
 from geojson import FeatureCollection
-from geopandas.geodataframe import GeoDataFrame
 from pydantic import BaseModel, ConfigDict, model_validator
-from pygeofilter.ast import And
+from pygeofilter.ast import And, Attribute, Equal
 from pygeofilter.parsers.cql2_text import parse as parse_filter
 
 from coordo.datapackage import DataPackage
+from coordo.datapackage.arrow import to_feature_collection
+from coordo.datapackage.scan import ResourceScan, decode_cursor, encode_cursor
+from coordo.sql.parser import Column
 from coordo.sql.parser import parse as parse_expr
 
-from ..helpers import safe
+from ..helpers import cache, safe
 from .base import BaseLayerModel
+from .cube import (
+    TimeDimension,
+    build_cube,
+    can_combine,
+    parse_time_range,
+    query_time_range,
+    slice_cube,
+)
 from .maplibre_style_spec_v8 import GeoJSONSource, Layer
 
 # https://birkskyum.github.io/maplibre-style/layers/#layer-properties
-ALLOWED_LAYER_KEYS = ["id", "source", "metadata", "paint", "layout", "minzoom", "maxzoom", "source-layer"]
+ALLOWED_LAYER_KEYS = [
+    "id",
+    "source",
+    "metadata",
+    "paint",
+    "layout",
+    "minzoom",
+    "maxzoom",
+    "source-layer",
+]
+
+# Maximum number of features returned at once, the next ones are fetched with a cursor
+MAX_PAGE_SIZE = 100_000
+
+# Inferred layer types, by layer config and package fingerprint
+LAYER_TYPES: dict[tuple[str, str], str] = {}
+MAX_CACHED_LAYER_TYPES = 1024
+
+# Layer data per time bucket, by layer config, package fingerprint and filter
+CUBES: dict[str, object] = {}
+MAX_CACHED_CUBES = 64
+
+
+def geometry_layer_type(geom_type: str | None) -> str:
+    geom_type = (geom_type or "POINT").upper()
+    if "POLYGON" in geom_type:
+        return "fill"
+    elif "LINESTRING" in geom_type:
+        return "line"
+    return "circle"
+
 
 class Popup(BaseModel):
     trigger: str
@@ -58,7 +100,7 @@ class ClusterConfig(BaseModel):
 
 
 class DataPackageLayer(BaseLayerModel):
-    model_config = ConfigDict(extra='allow')  # Allows arbitrary extra fields
+    model_config = ConfigDict(extra="allow")  # Allows arbitrary extra fields
 
     type: Literal["datapackage"]
     path: str
@@ -69,6 +111,13 @@ class DataPackageLayer(BaseLayerModel):
     layerType: str | None = None
     popup: Popup | None = None
     cluster: ClusterConfig | None = None
+    # Number of decimals of the coordinates and numbers sent to the map
+    precision: int | None = None
+    maxPageSize: int = MAX_PAGE_SIZE
+    # Only send the properties used by the style, the others are fetched per feature
+    slim: bool = False
+    # Data can be requested for a range of dates, see `get_time_range`
+    time: TimeDimension | None = None
 
     def _build_source(self, data) -> GeoJSONSource:
         source = GeoJSONSource(type="geojson", data=data)
@@ -96,22 +145,38 @@ class DataPackageLayer(BaseLayerModel):
         }
         return style or None
 
-    def to_maplibre(self, base_path):
+    def to_maplibre(self, base_path, data_url=None):
         package = DataPackage.from_path(base_path / self.path)
         resource = package.get_resource(name=self.resource)
-        data = self.get_data(base_path=base_path)
-
-        layer_type = self.layerType or self.infer_layer_type(data["features"])
-
-        source = self._build_source(data)
+        layer_type = self.layerType or self.infer_layer_type(package)
+        if data_url is not None:
+            # The data is fetched by MapLibre from the layer URL
+            source = self._build_source(f"{data_url}{self.id}")
+        else:
+            source = self._build_source(self.get_page(package, paginate=False))
         metadata = {
             "resource": {
                 "schema": safe(resource, "schema").model_dump(
                     exclude_none=True, warnings="none"
                 ),
             },
-            "references": self.findAllResourceReferences(resource, package)
+            "references": self.findAllResourceReferences(resource, package, data_url),
         }
+        if resource.stats and resource.stats.bbox:
+            metadata["bbox"] = resource.stats.bbox
+        if self.slim and data_url is not None:
+            metadata["featuresUrl"] = f"{data_url}{self.id}/features/"
+            key = self.feature_key(package)
+            if key:
+                # MapLibre drops string ids that aren't numbers, the key is
+                # read from the properties instead
+                source["promoteId"] = key
+        if self.time:
+            metadata["time"] = self.time.model_dump()
+            field_stats = resource.stats and resource.stats.fields.get(self.time.field)
+            if field_stats:
+                # Bounds of the time slider
+                metadata["time"].update(min=field_stats.min, max=field_stats.max)
         if self.popup:
             metadata.update(popup=self.popup.model_dump())
         cluster_metadata = self._cluster_metadata()
@@ -131,8 +196,11 @@ class DataPackageLayer(BaseLayerModel):
 
         return {self.id: source}, layer
 
-    def get_data(self, *, base_path, filter=None) -> FeatureCollection:
-        package = DataPackage.from_path(base_path / self.path)
+    def scan(self, package: DataPackage, filter=None, slim=False) -> ResourceScan:
+        """
+        Query of the layer data. With `slim`, only the geometries, the feature key
+        and the properties used by the style are selected.
+        """
         final_filter = None
         if self.filter:
             final_filter = parse_filter(self.filter)
@@ -145,43 +213,280 @@ class DataPackageLayer(BaseLayerModel):
         columns = None
         if self.columns:
             columns = {alias: parse_expr(expr) for alias, expr in self.columns.items()}
-        df = package.read_resource(
-            self.resource,
-            columns,
-            final_filter,
-            self.groupby,
+        if slim:
+            columns = self.slim_columns(package, columns)
+        return ResourceScan(package, self.resource, columns, final_filter, self.groupby)
+
+    def feature_key(self, package: DataPackage) -> str | None:
+        """Field identifying the features: the group key, or the primary key of the resource"""
+        if self.groupby:
+            return self.groupby[0] if len(self.groupby) == 1 else None
+        primary_key = package.get_resource(self.resource).schema.primaryKey
+        return primary_key[0] if primary_key and len(primary_key) == 1 else None
+
+    def style_properties(self) -> set[str]:
+        """Properties read by the `get` expressions of the style of the layer"""
+        properties = set()
+
+        def walk(value):
+            if isinstance(value, list):
+                if len(value) >= 2 and value[0] == "get" and isinstance(value[1], str):
+                    properties.add(value[1])
+                for item in value:
+                    walk(item)
+            elif isinstance(value, dict):
+                for item in value.values():
+                    walk(item)
+
+        for key in ("paint", "layout", "filter"):
+            walk(self.__pydantic_extra__.get(key))
+        return properties
+
+    def slim_columns(self, package: DataPackage, columns):
+        resource = package.get_resource(self.resource)
+        geometries = {f.name for f in resource.schema.fields if f.type == "geojson"}
+        key = self.feature_key(package)
+        kept = self.style_properties() | {key}
+        if columns is None:
+            names = [f.name for f in resource.schema.fields]
+            return {
+                name: parse_expr(name)
+                for name in names
+                if name in kept or name in geometries
+            }
+        slim = {
+            alias: expr
+            for alias, expr in columns.items()
+            if alias in kept
+            or (isinstance(expr, Column) and expr.parts[-1] in geometries)
+        }
+        # Group keys are always selected
+        if key and key not in slim and not self.groupby:
+            slim[key] = parse_expr(key)
+        return slim
+
+    def get_feature(self, *, base_path, feature_id: str) -> dict | None:
+        """
+        Feature of the given key with all its properties. The key is filtered on
+        before any aggregation so only the rows of the feature are read.
+        """
+        package = DataPackage.from_path(base_path / self.path)
+        return self._get_feature(package, feature_id)
+
+    def _get_feature(self, package: DataPackage, feature_id: str) -> dict | None:
+        key = self.feature_key(package)
+        if key is None:
+            raise ValueError(f"Features of layer {self.id!r} have no key")
+        value = field_value(package.get_resource(self.resource), key, feature_id)
+        scan = self.scan(package, Equal(Attribute(key), value))
+        # Group keys are always selected, the primary key only if listed in the columns
+        if scan.columns is not None and key not in scan.columns and not self.groupby:
+            scan = scan.select({**scan.columns, key: key})
+        features = to_feature_collection(scan.to_arrow(), self.precision, key)[
+            "features"
+        ]
+        return features[0] if features else None
+
+    def get_children(
+        self, *, base_path, feature_id: str, resource: str
+    ) -> list[dict] | None:
+        """
+        Rows of `resource` referencing the feature of the given key through a foreign
+        key, or None if there is no such feature. The lookup only reads the row groups
+        holding the key when `resource` is sorted on it, see `DataPackage.sort_resource`.
+        """
+        package = DataPackage.from_path(base_path / self.path)
+        fk = next(
+            (
+                fk
+                for res, fk in package.child_references(self.resource)
+                if res.name == resource
+            ),
+            None,
         )
-        assert isinstance(df, GeoDataFrame), "No geometry column found."
-        return df.to_geo_dict(show_bbox=True)  # type: ignore
-    
-    def infer_layer_type(self, features):
-        # We check the type of the first non-null geometry, it doesn't support yet mixed geometries
-        geom_type = (
-            next(f["geometry"] for f in features if f["geometry"])["type"]
-            if features
-                else "Point"
+        if fk is None:
+            raise ValueError(
+                f"Resource {resource!r} has no foreign key to {self.resource!r}"
+            )
+        if fk.reference.fields == [self.feature_key(package)]:
+            # The key is the referenced field, the parent doesn't have to be read
+            parent = package.get_resource(self.resource)
+            values = [field_value(parent, fk.reference.fields[0], feature_id)]
+        else:
+            feature = self._get_feature(package, feature_id)
+            if feature is None:
+                return None
+            values = [feature["properties"][name] for name in fk.reference.fields]
+        filters = [
+            Equal(Attribute(name), value) for name, value in zip(fk.fields, values)
+        ]
+        return (
+            package.scan(resource)
+            .filter(reduce(And, filters))
+            .to_records(self.precision)
         )
-        if "Polygon" in geom_type:
-            layer_type = "fill"
-        elif "LineString" in geom_type:
-            layer_type = "line"
+
+    def get_data(
+        self,
+        *,
+        base_path,
+        filter=None,
+        format="geojson",
+        limit=None,
+        cursor=None,
+        zoom=None,
+        time=None,
+        paginate=True,
+        bbox=None,
+    ) -> FeatureCollection | Iterator[bytes]:
+        package = DataPackage.from_path(base_path / self.path)
+        if time is not None:
+            if format != "geojson":
+                raise ValueError("Time ranges are only available as GeoJSON")
+            return self.get_time_range(package, filter, time, limit, cursor, paginate)
+        if format == "geojson":
+            return self.get_page(package, filter, limit, cursor, paginate)  # type: ignore
+        scan = self.scan(package, filter)
+        # Binary formats are meant for extracts, they are written by DuckDB in one
+        # go and streamed whole rather than paginated
+        if limit is not None:
+            scan = scan.limit(limit)
+        return scan.iter_bytes(format)
+
+    def get_facets(self, *, base_path, filter=None, fields=None) -> dict:
+        """Value counts and ranges of the fields of the layer, see `ResourceScan.facets`"""
+        package = DataPackage.from_path(base_path / self.path)
+        return self.scan(package, filter).facets(fields)
+
+    def get_page(
+        self, package: DataPackage, filter=None, limit=None, cursor=None, paginate=True
+    ) -> dict:
+        """
+        Features of a page of at most `maxPageSize` rows, with the cursor of the next
+        one. Without `paginate`, all the features are returned at once.
+        """
+        scan = self.scan(package, filter, slim=self.slim)
+        if paginate:
+            size = min(limit or self.maxPageSize, self.maxPageSize)
+            table, next_cursor = scan.page(size, cursor)
         else:
-            layer_type = "circle"
+            table, next_cursor = scan.to_arrow(), None
+        # Slim features are identified by their key so their details can be requested.
+        # Pages read after a key are identified by it, the others by their position
+        # in the whole layer, as the pages are joined in a single source
+        id_column = self.feature_key(package) if self.slim else scan.keyset_column()
+        start = decode_cursor(cursor).get("offset", 0) if paginate else 0
+        data = to_feature_collection(table, self.precision, id_column, start)
+        if next_cursor:
+            data["next"] = next_cursor
+        return data
 
-        return layer_type
-    
-    def findAllResourceReferences(self, resource, package):
+    def get_time_range(
+        self,
+        package: DataPackage,
+        filter,
+        time: str,
+        limit=None,
+        cursor=None,
+        paginate=True,
+    ) -> dict:
+        """
+        Features over a range of time buckets, e.g. `2024-01-01/2024-03-01`, in pages
+        of at most `maxPageSize` features. Grouped data is aggregated per bucket once
+        per filter and ranges are combined from these buckets when the columns are
+        sums, counts, minimums or maximums. Otherwise the rows of the range are read.
+        """
+        if self.time is None:
+            raise ValueError(f"Layer {self.id!r} has no time dimension")
+        start, end = parse_time_range(time)
+        size = min(limit or self.maxPageSize, self.maxPageSize) if paginate else None
+        offset = decode_cursor(cursor).get("offset", 0)
+        scan = self.scan(package, filter, slim=self.slim)
+        if can_combine(scan.columns, scan.groupby_):
+            key = f"{self.model_dump_json()}:{package.fingerprint}:{filter!r}"
+            cube = cache(
+                CUBES,
+                key,
+                lambda: build_cube(
+                    package,
+                    self.resource,
+                    scan.columns,
+                    scan.filter_,
+                    scan.groupby_,
+                    self.time,
+                ),
+                MAX_CACHED_CUBES,
+            )
+            table = slice_cube(
+                cube, scan.columns, scan.groupby_, start, end, size and size + 1, offset
+            )
+        else:
+            table = query_time_range(
+                package,
+                self.resource,
+                scan.columns,
+                scan.filter_,
+                scan.groupby_,
+                self.time,
+                start,
+                end,
+                size and size + 1,
+                offset,
+            )
+        id_column = self.feature_key(package) if self.slim else None
+        # One more row tells if there is a next page
+        data = to_feature_collection(
+            table.slice(0, size), self.precision, id_column, offset
+        )
+        if size is not None and table.num_rows > size:
+            data["next"] = encode_cursor({"offset": offset + size})
+        return data
+
+    def infer_layer_type(self, package: DataPackage) -> str:
+        key = (self.model_dump_json(), package.fingerprint)
+        return cache(
+            LAYER_TYPES,
+            key,
+            lambda: geometry_layer_type(self.geometry_type(package)),
+            MAX_CACHED_LAYER_TYPES,
+        )
+
+    def geometry_type(self, package: DataPackage) -> str | None:
+        # Without computed columns, the geometries are the ones of the resource
+        # and their types are known from its statistics
+        stats = package.get_resource(self.resource).stats
+        if stats and not self.columns and not self.groupby:
+            types = [
+                field.geometryTypes
+                for field in stats.fields.values()
+                if field.geometryTypes
+            ]
+            if types:
+                return types[0][0]
+        # Otherwise the first row of the query is enough.
+        # Mixed geometries are not supported yet
+        return self.scan(package).geometry_type()
+
+    def findAllResourceReferences(self, resource, package, data_url=None):
         references = []
         added_references = []
-        for res in package.resources:
-            for fk in res.schema.foreignKeys:
-                if fk.reference.resource == resource.name and res.name not in added_references:
-                    references.append({
-                        "name": res.name,
-                        "schema": safe(res, "schema").model_dump(
-                            exclude_none=True, warnings="none"
-                        )
-                    })
-                    added_references.append(res.name)
+        for res, fk in package.child_references(resource.name):
+            if res.name not in added_references:
+                reference = {
+                    "name": res.name,
+                    "schema": safe(res, "schema").model_dump(
+                        exclude_none=True, warnings="none"
+                    ),
+                }
+                if data_url is not None:
+                    # The rows of a feature are fetched by replacing {id} with its key
+                    reference["url"] = f"{data_url}{self.id}/features/{{id}}/{res.name}"
+                references.append(reference)
+                added_references.append(res.name)
         return references
 
+
+def field_value(resource, name: str, value: str):
+    """Cast a key given in a URL to the type of the field `name` of `resource`"""
+    field = next(f for f in resource.schema.fields if f.name == name)
+    return {"integer": int, "number": float}.get(field.type, str)(value)
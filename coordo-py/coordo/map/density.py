@@ -0,0 +1,298 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import math
+import struct
+import zlib
+from typing import Literal
+
+import numpy as np
+import shapely
+from pydantic import ConfigDict, model_validator
+from pygeofilter.ast import And
+from pygeofilter.parsers.cql2_text import parse as parse_filter
+
+from coordo.datapackage import DataPackage
+from coordo.datapackage.arrow import to_geometries
+from coordo.datapackage.scan import ResourceScan
+from coordo.sql.parser import parse as parse_expr
+
+from ..helpers import cache
+from .base import BaseLayerModel
+from .datapackage import ALLOWED_LAYER_KEYS
+from .grid import MAX_LATITUDE, TILE_SIZE
+from .maplibre_style_spec_v8 import Layer, RasterSource
+
+# Largest grid, in pixels per side, the density of a whole layer is computed on
+MAX_GRID_SIZE = 2048
+
+# Points, reference densities and tiles by layer, data and filter
+POINTS: dict[str, tuple] = {}
+REFERENCES: dict[str, float] = {}
+TILES: dict[str, bytes] = {}
+MAX_CACHED_POINTS = 16
+MAX_CACHED_TILES = 4096
+
+# Colors of MapLibre heatmaps, from the lowest density to the highest
+DEFAULT_COLORS = ["#4169e1", "#00ffff", "#00ff00", "#ffff00", "#ff0000"]
+
+
+def world_pixels(lon: np.ndarray, lat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Web Mercator pixel coordinates at zoom 0, the world being 256 pixels wide"""
+    lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (lon + 180) / 360 * TILE_SIZE
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2 * TILE_SIZE
+    return x, y
+
+
+def gaussian_kernel(radius: int) -> np.ndarray:
+    if radius < 1:
+        raise ValueError(f"Invalid radius {radius}, expected at least 1 pixel")
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (offsets / (radius / 2)) ** 2)
+    return kernel / kernel.sum()
+
+
+def blur(grid: np.ndarray, radius: int) -> np.ndarray:
+    """Gaussian blur of `grid` as two 1D convolutions, trimming `radius` pixels on each side"""
+    kernel = gaussian_kernel(radius)
+    windows = np.lib.stride_tricks.sliding_window_view(grid, kernel.size, axis=1)
+    grid = windows @ kernel
+    windows = np.lib.stride_tricks.sliding_window_view(grid, kernel.size, axis=0)
+    return windows @ kernel
+
+
+def density(
+    x: np.ndarray,
+    y: np.ndarray,
+    weights: np.ndarray,
+    width: int,
+    height: int,
+    radius: int,
+) -> np.ndarray:
+    """
+    Kernel density of weighted points on a `width` x `height` grid, points being
+    given in pixels of the grid. Points up to `radius` pixels outside of the grid
+    contribute to its borders.
+    """
+    ix = np.floor(x).astype(np.int64) + radius
+    iy = np.floor(y).astype(np.int64) + radius
+    padded_width, padded_height = width + 2 * radius, height + 2 * radius
+    inside = (ix >= 0) & (ix < padded_width) & (iy >= 0) & (iy < padded_height)
+    counts = np.bincount(
+        iy[inside] * padded_width + ix[inside],
+        weights=weights[inside],
+        minlength=padded_width * padded_height,
+    ).reshape(padded_height, padded_width)
+    return blur(counts, radius)
+
+
+def parse_color(color: str) -> tuple[int, int, int]:
+    if len(color) != 7 or not color.startswith("#"):
+        raise ValueError(f"Invalid color {color!r}, expected #rrggbb")
+    return tuple(int(color[i : i + 2], 16) for i in (1, 3, 5))
+
+
+def color_ramp(colors: list[str]) -> np.ndarray:
+    """256 RGBA colors interpolated between `colors`, fading in from transparent"""
+    stops = np.array([parse_color(color) for color in colors], dtype=np.float64)
+    t = np.linspace(0, 1, 256)
+    positions = np.linspace(0, 1, len(stops))
+    rgb = np.stack([np.interp(t, positions, stops[:, i]) for i in range(3)], axis=1)
+    alpha = np.clip(t * len(stops), 0, 1) * 255
+    return np.column_stack([rgb, alpha]).round().astype(np.uint8)
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an RGBA image of shape (height, width, 4) as a PNG, without filtering"""
+    height, width, _ = rgba.shape
+    rows = np.hstack([np.zeros((height, 1), np.uint8), rgba.reshape(height, width * 4)])
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + tag
+            + data
+            + struct.pack(">I", zlib.crc32(tag + data))
+        )
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+EMPTY_TILE = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), np.uint8))
+
+
+class DensityLayer(BaseLayerModel):
+    """
+    Kernel density of the points of a resource rendered server-side as raster
+    tiles, so that the browser never holds the points. Each point counts for
+    `weight` if given, an expression of the columns language, and is spread
+    over `radius` pixels. Colors are relative to the densest area of the layer
+    at the zoom level of the tile.
+    """
+
+    model_config = ConfigDict(extra="allow")
+
+    type: Literal["density"]
+    path: str
+    resource: str
+    filter: str | None = None
+    weight: str | None = None
+    radius: int = 20
+    colors: list[str] = DEFAULT_COLORS
+    minZoom: int = 0
+    # Tiles are upscaled by MapLibre beyond this zoom level
+    maxZoom: int = 16
+
+    @model_validator(mode="after")
+    def _check_radius(self):
+        if self.radius < 1:
+            raise ValueError(f"Density layer {self.id!r} needs a radius of at least 1")
+        return self
+
+    def to_maplibre(self, base_path, data_url=None):
+        if data_url is None:
+            raise ValueError(
+                f"Density layer {self.id!r} can only be displayed when served"
+            )
+        source: RasterSource = {
+            "type": "raster",
+            "tiles": [f"{data_url}{self.id}/tiles/{{z}}/{{x}}/{{y}}.png"],
+            "tileSize": TILE_SIZE,
+            "minzoom": self.minZoom,
+            "maxzoom": self.maxZoom,
+        }
+        stats = (
+            DataPackage.from_path(base_path / self.path)
+            .get_resource(self.resource)
+            .stats
+        )
+        metadata = {"density": True}
+        if stats and stats.bbox:
+            # No tile is requested outside of the data
+            source["bounds"] = stats.bbox
+            metadata["bbox"] = stats.bbox
+        layer: Layer = {
+            "id": self.id,
+            "type": "raster",
+            "source": self.id,
+            "metadata": metadata,
+        }
+        for k, v in self.__pydantic_extra__.items():
+            if k in ALLOWED_LAYER_KEYS:
+                layer[k] = v
+        return {self.id: source}, layer
+
+    def get_data(self, *, base_path, filter=None, format="geojson", **kwargs):
+        raise ValueError(f"Density layer {self.id!r} is only available as tiles")
+
+    def get_tile(self, *, base_path, z: int, x: int, y: int, filter=None) -> bytes:
+        """PNG tile `z/x/y` of the density of the points matching `filter`"""
+        package = DataPackage.from_path(base_path / self.path)
+        key = f"{self.model_dump_json()}:{package.fingerprint}:{filter!r}"
+        return cache(
+            TILES,
+            f"{key}:{z}/{x}/{y}",
+            lambda: self.render_tile(package, key, filter, z, x, y),
+            MAX_CACHED_TILES,
+        )
+
+    def get_points(self, package: DataPackage, filter) -> tuple[np.ndarray, ...]:
+        """World pixel coordinates and weights of the points, sorted by x"""
+        resource = package.get_resource(self.resource)
+        geometry = next(
+            (f.name for f in resource.schema.fields if f.type == "geojson"), None
+        )
+        if geometry is None:
+            raise ValueError(f"Resource {self.resource!r} has no geometry")
+        if self.filter:
+            filter = (
+                And(parse_filter(self.filter), filter)
+                if filter
+                else parse_filter(self.filter)
+            )
+        columns = {"geometry": parse_expr(geometry)}
+        if self.weight:
+            columns["weight"] = parse_expr(self.weight)
+        table = ResourceScan(package, self.resource, columns, filter).to_arrow()
+        centroids = shapely.centroid(to_geometries(table.column("geometry")))
+        coords = shapely.get_coordinates(centroids)
+        # Empty and null geometries have no coordinates
+        valid = ~(shapely.is_empty(centroids) | shapely.is_missing(centroids))
+        if self.weight:
+            weights = table.column("weight").to_numpy(zero_copy_only=False)[valid]
+            weights = np.nan_to_num(weights.astype(np.float64))
+        else:
+            weights = np.ones(len(coords))
+        x, y = world_pixels(coords[:, 0], coords[:, 1])
+        order = np.argsort(x)
+        return x[order], y[order], weights[order]
+
+    def reference(self, points: tuple, zoom: int) -> float:
+        """
+        Highest density of the layer at `zoom`, computed on a grid covering all
+        the points. Past the zoom levels where that grid is too large, the one
+        of the last zoom level where it fits is spread over the 4 times more
+        pixels of each zoom level above it.
+        """
+        x, y, weights = points
+        if not len(x):
+            return 0.0
+        for level in range(zoom, -1, -1):
+            scale = 2**level
+            left, top = math.floor(x[0] * scale), math.floor(y.min() * scale)
+            width = math.ceil(x[-1] * scale) - left + 1
+            height = math.ceil(y.max() * scale) - top + 1
+            if max(width, height) <= MAX_GRID_SIZE:
+                grid = density(
+                    x * scale - left,
+                    y * scale - top,
+                    weights,
+                    width,
+                    height,
+                    self.radius,
+                )
+                return float(grid.max()) / 4 ** (zoom - level)
+        return 0.0
+
+    def render_tile(
+        self, package: DataPackage, key: str, filter, z: int, x: int, y: int
+    ) -> bytes:
+        points = cache(
+            POINTS, key, lambda: self.get_points(package, filter), MAX_CACHED_POINTS
+        )
+        reference = cache(
+            REFERENCES,
+            f"{key}:{z}",
+            lambda: self.reference(points, z),
+            MAX_CACHED_TILES,
+        )
+        xs, ys, weights = points
+        scale = 2**z
+        # Points are sorted by x, the ones near the tile are found by bisection
+        margin = self.radius / scale
+        start, stop = np.searchsorted(
+            xs,
+            [(x * TILE_SIZE) / scale - margin, ((x + 1) * TILE_SIZE) / scale + margin],
+        )
+        if start == stop or reference <= 0:
+            return EMPTY_TILE
+        grid = density(
+            xs[start:stop] * scale - x * TILE_SIZE,
+            ys[start:stop] * scale - y * TILE_SIZE,
+            weights[start:stop],
+            TILE_SIZE,
+            TILE_SIZE,
+            self.radius,
+        )
+        if not grid.any():
+            return EMPTY_TILE
+        levels = np.clip(grid / reference * 255, 0, 255).astype(np.uint8)
+        rgba = color_ramp(self.colors)[levels]
+        rgba[grid <= 0] = 0
+        return encode_png(rgba)
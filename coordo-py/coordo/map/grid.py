@@ -0,0 +1,300 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import math
+from typing import Literal
+
+import sqlalchemy as sa
+from pydantic import ConfigDict
+from pygeofilter.ast import And
+from pygeofilter.parsers.cql2_text import parse as parse_filter
+from sqlalchemy import func
+
+from coordo.datapackage import DataPackage
+from coordo.datapackage.arrow import to_feature_collection
+from coordo.sql.builder import build_query, compile_query, extend_table
+from coordo.sql.parser import parse as parse_expr
+
+from ..helpers import cache
+from .base import BaseLayerModel
+from .datapackage import ALLOWED_LAYER_KEYS
+from .maplibre_style_spec_v8 import GeoJSONSource, Layer
+
+# Web Mercator, in which cells have the same size on screen everywhere and
+# density tiles are rendered
+EARTH_RADIUS = 6378137
+MAX_LATITUDE = 85.05112878
+TILE_SIZE = 256
+
+# Cells by layer, data, filter and zoom
+GRID_CELLS: dict[str, dict] = {}
+MAX_CACHED_GRIDS = 256
+
+
+def cell_size(cell_pixels: int, zoom: int) -> float:
+    """Size in meters of a cell of `cell_pixels` pixels at `zoom`"""
+    return cell_pixels * 2 * math.pi * EARTH_RADIUS / (TILE_SIZE * 2**zoom)
+
+
+def mercator(geometry: str) -> tuple[str, str]:
+    """Web Mercator coordinates of the centroid of a geometry column"""
+    lon = f"ST_X(ST_Centroid({geometry}))"
+    lat = f"greatest(least(ST_Y(ST_Centroid({geometry})), {MAX_LATITUDE}), -{MAX_LATITUDE})"
+    return (
+        f"radians({lon}) * {EARTH_RADIUS}",
+        f"ln(tan(pi() / 4 + radians({lat}) / 2)) * {EARTH_RADIUS}",
+    )
+
+
+def square_cells(source: str, x: str, y: str, size: float) -> str:
+    return (
+        f'SELECT *, floor({x} / {size})::BIGINT AS "__cell_x", '
+        f'floor({y} / {size})::BIGINT AS "__cell_y" FROM {source}'
+    )
+
+
+def hexagon_cells(source: str, x: str, y: str, size: float) -> str:
+    """
+    Axial coordinates of the pointy-top hexagons of width `size` holding the points,
+    rounded through cube coordinates.
+    See https://www.redblobgames.com/grids/hexagons/#pixel-to-hex
+    """
+    radius = size / math.sqrt(3)
+    axial = (
+        f"SELECT *, (sqrt(3) / 3 * {x} - {y} / 3) / {radius} AS __qf, "
+        f"2 / 3 * {y} / {radius} AS __rf FROM {source}"
+    )
+    rounded = (
+        "SELECT *, round(__qf) AS __q, round(__rf) AS __r, round(-__qf - __rf) AS __s "
+        f"FROM ({axial})"
+    )
+    # The coordinate furthest from its rounded value is recomputed from the others
+    q_furthest = (
+        "abs(__q - __qf) > abs(__r - __rf) AND abs(__q - __qf) > abs(__s + __qf + __rf)"
+    )
+    r_furthest = f"NOT ({q_furthest}) AND abs(__r - __rf) > abs(__s + __qf + __rf)"
+    return (
+        "SELECT * EXCLUDE (__qf, __rf, __q, __r, __s), "
+        f'CASE WHEN {q_furthest} THEN -__r - __s ELSE __q END::BIGINT AS "__cell_x", '
+        f'CASE WHEN {r_furthest} THEN -__q - __s ELSE __r END::BIGINT AS "__cell_y" '
+        f"FROM ({rounded})"
+    )
+
+
+def viewport(bbox: list[float], size: float) -> tuple[float, float, float, float]:
+    """
+    Web Mercator bounds of a bounding box in longitude and latitude, snapped to
+    multiples of `size` so that close viewports share their cells
+    """
+    west, south, east, north = bbox
+    xs = [math.radians(min(max(lon, -180), 180)) * EARTH_RADIUS for lon in (west, east)]
+    ys = [
+        math.log(
+            math.tan(
+                math.pi / 4
+                + math.radians(min(max(lat, -MAX_LATITUDE), MAX_LATITUDE)) / 2
+            )
+        )
+        * EARTH_RADIUS
+        for lat in (south, north)
+    ]
+    return (
+        math.floor(min(xs) / size) * size,
+        math.floor(min(ys) / size) * size,
+        math.ceil(max(xs) / size) * size,
+        math.ceil(max(ys) / size) * size,
+    )
+
+
+def cell_center(shape: str, size: float) -> tuple[str, str]:
+    """Web Mercator coordinates of the center of a cell"""
+    if shape == "square":
+        return f'("__cell_x" + 0.5) * {size}', f'("__cell_y" + 0.5) * {size}'
+    radius = size / math.sqrt(3)
+    return f'{size} * ("__cell_x" + "__cell_y" / 2)', f'{radius * 1.5} * "__cell_y"'
+
+
+def cell_polygon(shape: str, size: float) -> str:
+    """Cell geometry in longitude and latitude, from its center in Web Mercator"""
+    cx, cy = cell_center(shape, size)
+    if shape == "square":
+        offsets = [(-0.5, -0.5), (0.5, -0.5), (0.5, 0.5), (-0.5, 0.5)]
+        offsets = [(dx * size, dy * size) for dx, dy in offsets]
+    else:
+        radius = size / math.sqrt(3)
+        offsets = [
+            (
+                radius * math.cos(math.radians(60 * k - 30)),
+                radius * math.sin(math.radians(60 * k - 30)),
+            )
+            for k in range(6)
+        ]
+    points = [
+        f"ST_Point(degrees(({cx} + {dx}) / {EARTH_RADIUS}), "
+        f"degrees(2 * atan(exp(({cy} + {dy}) / {EARTH_RADIUS})) - pi() / 2))"
+        for dx, dy in offsets + offsets[:1]
+    ]
+    return f"ST_MakePolygon(ST_MakeLine([{', '.join(points)}]))"
+
+
+class GridLayer(BaseLayerModel):
+    """
+    Aggregation of the rows of a resource in square or hexagonal cells of
+    `cellSize` pixels, the cells getting smaller as the map is zoomed in.
+    `columns` are evaluated per cell and the number of rows of each cell
+    is given by `count`. Requests with a `bbox` only get the cells of that
+    viewport, which coordo-ts sends as the map moves.
+    """
+
+    model_config = ConfigDict(extra="allow")
+
+    type: Literal["grid"]
+    path: str
+    resource: str
+    filter: str | None = None
+    columns: dict[str, str] | None = None
+    shape: Literal["square", "hexagon"] = "hexagon"
+    cellSize: int = 64
+    # Cells are computed for the integer zoom levels of this range
+    minZoom: int = 0
+    maxZoom: int = 16
+    precision: int | None = None
+
+    def zoom_level(self, zoom: float | None) -> int:
+        if zoom is None:
+            return self.minZoom
+        return min(max(math.floor(zoom), self.minZoom), self.maxZoom)
+
+    def to_maplibre(self, base_path, data_url=None):
+        if data_url is not None:
+            # coordo-ts requests the cells of the current zoom level
+            data = f"{data_url}{self.id}?zoom={self.minZoom}"
+        else:
+            data = self.get_data(base_path=base_path)
+        source = GeoJSONSource(type="geojson", data=data)
+        metadata = {"grid": {"minZoom": self.minZoom, "maxZoom": self.maxZoom}}
+        stats = (
+            DataPackage.from_path(base_path / self.path)
+            .get_resource(self.resource)
+            .stats
+        )
+        if stats and stats.bbox:
+            metadata["bbox"] = stats.bbox
+        layer: Layer = {
+            "id": self.id,
+            "type": "fill",
+            "source": self.id,
+            "metadata": metadata,
+        }
+        for k, v in self.__pydantic_extra__.items():
+            if k in ALLOWED_LAYER_KEYS:
+                layer[k] = v
+        return {self.id: source}, layer
+
+    def get_data(
+        self,
+        *,
+        base_path,
+        filter=None,
+        format="geojson",
+        limit=None,
+        cursor=None,
+        zoom=None,
+        time=None,
+        paginate=True,
+        bbox=None,
+    ) -> dict:
+        # Cells are bounded by the size of the viewport, they are not paginated
+        if time is not None:
+            raise ValueError(f"Grid layer {self.id!r} has no time dimension")
+        if format != "geojson":
+            raise ValueError(f"Grid layer {self.id!r} is only available as GeoJSON")
+        package = DataPackage.from_path(base_path / self.path)
+        zoom = self.zoom_level(zoom)
+        bounds = viewport(bbox, cell_size(self.cellSize, zoom)) if bbox else None
+        key = (
+            f"{self.model_dump_json()}:{package.fingerprint}:{filter!r}:{zoom}:{bounds}"
+        )
+        return cache(
+            GRID_CELLS,
+            key,
+            lambda: self.get_cells(package, filter, zoom, bounds),
+            MAX_CACHED_GRIDS,
+        )
+
+    def get_cells(
+        self,
+        package: DataPackage,
+        filter,
+        zoom: int,
+        bounds: tuple[float, float, float, float] | None = None,
+    ) -> dict:
+        """Cells of `zoom` whose center is within the Web Mercator `bounds`, if given"""
+        resource = package.get_resource(self.resource)
+        geometry = next(
+            (f.name for f in resource.schema.fields if f.type == "geojson"), None
+        )
+        if geometry is None:
+            raise ValueError(f"Resource {self.resource!r} has no geometry to grid")
+        if self.filter:
+            filter = (
+                And(parse_filter(self.filter), filter)
+                if filter
+                else parse_filter(self.filter)
+            )
+        size = cell_size(self.cellSize, zoom)
+        x, y = mercator(f'"{geometry}"')
+
+        # The rows with the cell they fall in are exposed as a table, so that
+        # `columns` are aggregated per cell by the usual query builder
+        view = f"{self.resource}__grid"
+        source = f'"{self.resource}"'
+        where = "true"
+        if bounds is not None:
+            xmin, ymin, xmax, ymax = bounds
+            # Rows of the cells centered in the viewport are less than a cell away from it
+            source = (
+                f"(SELECT * FROM {source} WHERE {x} BETWEEN {xmin - size} AND {xmax + size} "
+                f"AND {y} BETWEEN {ymin - size} AND {ymax + size})"
+            )
+            cx, cy = cell_center(self.shape, size)
+            where = f"{cx} BETWEEN {xmin} AND {xmax} AND {cy} BETWEEN {ymin} AND {ymax}"
+        cells = (square_cells if self.shape == "square" else hexagon_cells)(
+            source, x, y, size
+        )
+        conn, metadata = package.prepare_db()
+        try:
+            conn.execute(f'CREATE VIEW "{view}" AS {cells}')
+            table = extend_table(
+                metadata,
+                self.resource,
+                view,
+                {"__cell_x": sa.BigInteger, "__cell_y": sa.BigInteger},
+            )
+            columns = {
+                alias: parse_expr(expr) for alias, expr in (self.columns or {}).items()
+            }
+            query = build_query(
+                metadata,
+                view,
+                columns or None,
+                filter,
+                ["__cell_x", "__cell_y"] if columns else None,
+            )
+            if not columns:
+                query = query.with_only_columns(
+                    table.c["__cell_x"], table.c["__cell_y"]
+                ).group_by(table.c["__cell_x"], table.c["__cell_y"])
+            query = query.where(table.c["__cell_x"].is_not(None))
+            query = query.add_columns(func.count().label("count"))
+            result = (
+                conn.sql(
+                    f'SELECT * EXCLUDE ("__cell_x", "__cell_y"), {cell_polygon(self.shape, size)} AS geometry '
+                    f"FROM ({compile_query(query)}) WHERE {where}"
+                )
+                .arrow()
+                .read_all()
+            )
+        finally:
+            conn.close()
+        return to_feature_collection(result, self.precision)
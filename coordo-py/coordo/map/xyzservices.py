@@ -13,7 +13,7 @@ class XYZServicesLayer(BaseLayerModel):
     type: Literal["xyzservices"]
     provider: str
 
-    def to_maplibre(self, base_path=None):
+    def to_maplibre(self, base_path=None, data_url=None):
         provider = providers
         for part in self.provider.split("."):
             provider = getattr(provider, part)
@@ -0,0 +1,305 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from flask import Flask, Response, abort, request, send_from_directory
+
+from .datapackage.scan import FORMATS
+from .encoder import dumps
+from .map import Map
+from .map.base import NotFoundError
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+static_dir = Path(__file__).parent / "static"
+
+
+def compressors(levels: dict[str, int]) -> dict[str, Callable[[bytes], bytes]]:
+    """Compression of the available content codings at `levels`, by order of preference"""
+    codecs: dict[str, Callable[[bytes, int], bytes]] = {}
+    if zstandard is not None:
+        codecs["zstd"] = lambda body, level: zstandard.ZstdCompressor(
+            level=level
+        ).compress(body)
+    if brotli is not None:
+        codecs["br"] = lambda body, level: brotli.compress(body, quality=level)
+    codecs["gzip"] = lambda body, level: gzip.compress(body, compresslevel=level)
+    return {
+        coding: (lambda body, codec=codec, level=levels[coding]: codec(body, level))
+        for coding, codec in codecs.items()
+    }
+
+
+# Content codings supported, by order of preference
+ENCODINGS = compressors({"zstd": 6, "br": 5, "gzip": 6})
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+# Total size of the bodies kept in memory
+CACHE_SIZE = 256 * 1024 * 1024
+
+# Static files are referenced with a version parameter, they can be cached forever
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+
+class BodyCache:
+    """Least recently used response bodies, bounded by their total size"""
+
+    def __init__(self, max_size: int = CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self._bodies: OrderedDict[tuple, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(self, key: tuple, body: bytes) -> None:
+        if len(body) > self.max_size:
+            return
+        with self._lock:
+            if key in self._bodies:
+                self.size -= len(self._bodies.pop(key))
+            self._bodies[key] = body
+            self.size += len(body)
+            while self.size > self.max_size:
+                _, evicted = self._bodies.popitem(last=False)
+                self.size -= len(evicted)
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Preferred content coding among the ones accepted by the client"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    for coding in ENCODINGS:
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        # Compressed representations have their coding appended to the tag
+        if tag == etag or tag.rsplit("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def negotiate_format() -> str:
+    """Format of the layer data, from the `f` parameter or the Accept header"""
+    if "f" in request.args:
+        format = request.args["f"]
+        if format not in FORMATS:
+            abort(
+                400,
+                f"Unsupported format {format!r}, expected one of {', '.join(FORMATS)}",
+            )
+        return format
+    if not request.accept_mimetypes:
+        return "geojson"
+    media_types = {"application/json": "geojson"} | {
+        media_type: format for format, media_type in FORMATS.items()
+    }
+    # JSON comes first so that it is picked for */*
+    best = request.accept_mimetypes.best_match(list(media_types))
+    if best is None:
+        abort(406)
+    return media_types[best]
+
+
+def static_version(filename: str) -> str:
+    path = static_dir / filename
+    if not path.exists():
+        return "0"
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+
+
+def index_html(css_url: str, js_url: str, style_url: str) -> str:
+    """Page displaying the map of `style_url` full screen"""
+    return f"""
+        <!DOCTYPE html>
+        <html>
+          <head>
+            <title>Coordo</title>
+            <link href="{css_url}" rel="stylesheet" />
+            <script src="{js_url}"></script>
+          </head>
+          <body style="margin: 0">
+            <div id="map" style="height: 100dvh"></div>
+          </body>
+          <script>
+            map = coordo.createMap("#map", "{style_url}");
+          </script>
+        </html>
+        """
+
+
+def create_app(config_file: str | Path) -> Flask:
+    app = Flask(__name__)
+    cache = BodyCache()
+
+    def respond(
+        etag: str,
+        compute: Callable[[], bytes | Iterator[bytes]],
+        mimetype: str = "application/json",
+        compress: bool = True,
+    ) -> Response:
+        headers = {"Vary": "Accept, Accept-Encoding", "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return Response(status=304, headers={**headers, "ETag": f'"{etag}"'})
+        body = cache.get((etag, None))
+        if body is None:
+            body = compute()
+            if not isinstance(body, bytes):
+                # Extracts are streamed as they are read, they are neither kept nor compressed
+                headers["ETag"] = f'"{etag}"'
+                return Response(body, mimetype=mimetype, headers=headers)
+            cache.put((etag, None), body)
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        if compress and encoding and len(body) >= MIN_COMPRESS_SIZE:
+            compressed = cache.get((etag, encoding))
+            if compressed is None:
+                compressed = ENCODINGS[encoding](body)
+                cache.put((etag, encoding), compressed)
+            body = compressed
+            headers["Content-Encoding"] = encoding
+            etag = f"{etag}-{encoding}"
+        headers["ETag"] = f'"{etag}"'
+        return Response(body, mimetype=mimetype, headers=headers)
+
+    @app.errorhandler(ValueError)
+    def invalid_request(error: ValueError):
+        # Requests for a layer or a feature that doesn't exist, or that don't apply
+        # to a layer, e.g. a time range on a layer without a time dimension
+        status = 404 if isinstance(error, NotFoundError) else 400
+        return {"error": str(error)}, status
+
+    @app.route("/")
+    def home():
+        return index_html(
+            f"/static/coordo.css?v={static_version('coordo.css')}",
+            f"/static/coordo.iife.js?v={static_version('coordo.iife.js')}",
+            "/map/style.json",
+        )
+
+    @app.route("/map/<path:subpath>", methods=["GET", "POST"])
+    def maps(subpath: str):
+        map = Map.from_file(config_file)
+        filters = request.get_json(silent=True)
+        if filters is None and "filter" in request.args:
+            # Tiles are requested by MapLibre, their filter is a parameter of their URL
+            try:
+                filters = json.loads(request.args["filter"])
+            except ValueError:
+                abort(400, "The filter parameter must be CQL2 JSON")
+        # The style is always JSON
+        is_layer = any(layer.id == subpath for layer in map.layers)
+        format = negotiate_format() if is_layer else "geojson"
+        limit = request.args.get("limit", type=int)
+        cursor = request.args.get("cursor")
+        fields = request.args.get("fields")
+        fields = fields.split(",") if fields else None
+        zoom = request.args.get("zoom", type=float)
+        time = request.args.get("time")
+        bbox = request.args.get("bbox")
+        if bbox is not None:
+            try:
+                bbox = [float(value) for value in bbox.split(",")]
+            except ValueError:
+                bbox = []
+            if len(bbox) != 4:
+                abort(400, "The bbox parameter must be west,south,east,north")
+        # Filter requests are idempotent, the response only depends on the
+        # config, the data and the filter
+        etag = hashlib.sha256(
+            json.dumps(
+                [
+                    Path(config_file).read_text(),
+                    map.fingerprint,
+                    request.method,
+                    subpath,
+                    filters,
+                    format,
+                    limit,
+                    cursor,
+                    fields,
+                    zoom,
+                    time,
+                    bbox,
+                ],
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+
+        def compute() -> bytes | Iterator[bytes]:
+            result = map.handle_request(
+                request.method,
+                subpath,
+                filters,
+                data_url="/map/",
+                format=format,
+                limit=limit,
+                cursor=cursor,
+                fields=fields,
+                zoom=zoom,
+                time=time,
+                bbox=bbox,
+            )
+            if result is None:
+                abort(404)
+            return dumps(result) if isinstance(result, (dict, list)) else result
+
+        if subpath.endswith(".png"):
+            # PNG tiles are already compressed
+            return respond(etag, compute, mimetype="image/png", compress=False)
+        return respond(
+            etag,
+            compute,
+            mimetype="application/json" if format == "geojson" else FORMATS[format],
+            # Parquet files are already compressed
+            compress=format != "parquet",
+        )
+
+    @app.route("/static/<path:filename>")
+    def static_files(filename):
+        response = send_from_directory(static_dir, filename, max_age=STATIC_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    return app
@@ -3,7 +3,7 @@
 
 from pygeofilter.ast import AstType
 from pygeofilter.backends.sqlalchemy import to_filter
-from sqlalchemy import MetaData, Select, func, select
+from sqlalchemy import Column, MetaData, Select, Table, func, select
 
 from .evaluator import to_sql
 from .mapper import FieldMapper
@@ -17,6 +17,19 @@ def compile_query(query: Select) -> str:
     return str(query.compile(compile_kwargs={"literal_binds": True}))
 
 
+def extend_table(
+    metadata: MetaData, table_name: str, name: str, columns: dict
+) -> Table:
+    """
+    Copy of a table with additional columns, given with their SQLAlchemy type,
+    to build queries on a view computing them from the table
+    """
+    table = metadata.tables[table_name].to_metadata(metadata, name=name)
+    for column, type_ in columns.items():
+        table.append_column(Column(column, type_))
+    return table
+
+
 def build_query(
     metadata: MetaData,
     table_name: str,
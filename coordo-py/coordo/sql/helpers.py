@@ -2,17 +2,75 @@
 # SPDX-License-Identifier: MPL-2.0
 
 import re
+import threading
+import time
 from pathlib import Path
 
 import duckdb
 
 AGGREGATES_SQL = (Path(__file__).parent / "aggregates.sql").read_text()
 
+# Scope the connections opened by each thread are registered in, see `QueryScope`
+_scopes = threading.local()
 
-def load_conn() -> duckdb.DuckDBPyConnection:
+
+class QueryScope:
+    """
+    Connections opened by a thread while the scope is entered, so that their
+    queries can be interrupted from another thread when the result isn't
+    awaited anymore. No connection can be opened once interrupted.
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.started_at: float | None = None
+        self.interrupted = False
+        self.connections: list[duckdb.DuckDBPyConnection] = []
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> "QueryScope":
+        _scopes.current = self
+        self.started_at = time.monotonic()
+        self.started.set()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _scopes.current = None
+        with self.lock:
+            self.connections.clear()
+
+    def register(self, conn: duckdb.DuckDBPyConnection) -> None:
+        with self.lock:
+            if self.interrupted:
+                conn.close()
+                raise duckdb.InterruptException(
+                    "Queries of this scope were interrupted"
+                )
+            self.connections.append(conn)
+
+    def interrupt(self) -> None:
+        with self.lock:
+            self.interrupted = True
+            for conn in self.connections:
+                try:
+                    conn.interrupt()
+                except duckdb.ConnectionException:
+                    # Already closed
+                    pass
+
+
+def spatial_conn() -> duckdb.DuckDBPyConnection:
     conn = duckdb.connect()
+    scope = getattr(_scopes, "current", None)
+    if scope is not None:
+        scope.register(conn)
     conn.install_extension("SPATIAL")
     conn.load_extension("SPATIAL")
+    return conn
+
+
+def load_conn() -> duckdb.DuckDBPyConnection:
+    conn = spatial_conn()
     conn.execute(AGGREGATES_SQL)
     return conn
 
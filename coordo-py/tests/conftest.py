@@ -1,24 +1,83 @@
 # Copyright COORDONNÉES 2025, 2026
 # SPDX-License-Identifier: MPL-2.0
 
-import pytest 
+import json
 from pathlib import Path
 
+import pytest
+
+from coordo.loaders import FileLoader, ResourceAction
+from coordo.server import create_app
+
 DATA_DIR = Path("tests/test_data")
 INVENTORY_DIR = DATA_DIR / "inventory"
 
+# 100 points along the diagonal, the data of the `client` fixture by default
+POINTS_CSV = "id,geom\n" + "".join(f"{i},POINT({i} {i})\n" for i in range(100))
+POINTS_LAYER = {
+    "id": "points",
+    "type": "datapackage",
+    "path": "package",
+    "resource": "points",
+}
+
+
 @pytest.fixture
 def inventory_package():
     return "catalog/inventory"
 
+
 @pytest.fixture
 def inventory_inquiry():
     return INVENTORY_DIR / "inquiry.xlsx"
 
+
 @pytest.fixture
 def inventory_data():
     return INVENTORY_DIR / "data.xlsx"
 
+
 @pytest.fixture
 def inventory_file():
-    return INVENTORY_DIR / "file.csv"
\ No newline at end of file
+    return INVENTORY_DIR / "file.csv"
+
+
+@pytest.fixture
+def load_csv(tmp_path):
+    """
+    Load CSV text as a resource of the package `tmp_path / "package"`, returning
+    `tmp_path`, which map layers are relative to.
+    """
+
+    def load_csv(resource: str, text: str) -> Path:
+        path = tmp_path / f"{resource}.csv"
+        path.write_text(text)
+        FileLoader(tmp_path / "package", path, ResourceAction.ADD).etl()
+        return tmp_path
+
+    return load_csv
+
+
+@pytest.fixture
+def map_config(tmp_path):
+    """Write the config of a map made of `layers`, returning its path"""
+
+    def map_config(*layers: dict) -> Path:
+        config = tmp_path / "config.json"
+        config.write_text(json.dumps({"layers": list(layers), "controls": []}))
+        return config
+
+    return map_config
+
+
+@pytest.fixture
+def client(request, load_csv, map_config):
+    """
+    Test client of a map of the `points` resource. Its CSV text and the layers
+    of the map can be given by indirect parametrization:
+
+    >>> @pytest.mark.parametrize("client", [(csv, [layer])], indirect=True)
+    """
+    csv, layers = getattr(request, "param", (POINTS_CSV, [POINTS_LAYER]))
+    load_csv("points", csv)
+    return create_app(map_config(*layers)).test_client()
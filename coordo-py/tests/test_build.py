@@ -0,0 +1,49 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import gzip
+import json
+
+from coordo.build import build
+
+from .conftest import POINTS_CSV
+
+
+def test_map_is_exported_as_static_files(tmp_path, load_csv, map_config):
+    load_csv("points", POINTS_CSV)
+    layer = {"path": "package", "resource": "points"}
+    config = map_config(
+        {
+            "id": "points",
+            "type": "datapackage",
+            "slim": True,
+            "maxPageSize": 30,
+            **layer,
+        },
+        {"id": "grid", "type": "grid", "minZoom": 2, "maxZoom": 3, **layer},
+        {"id": "density", "type": "density", "maxZoom": 1, **layer},
+    )
+    outdir = tmp_path / "site"
+    written = build(config, outdir)
+
+    style = json.loads((outdir / "style.json").read_text())
+    assert style["sources"]["points"]["data"] == "data/points.geojson"
+    assert style["sources"]["grid"]["data"] == "data/grid/2.geojson"
+    metadata = {layer["id"]: layer["metadata"] for layer in style["layers"]}
+    assert metadata["grid"]["grid"]["url"] == "data/grid/{z}.geojson"
+    assert "featuresUrl" not in metadata["points"]
+
+    # All the pages of the layer, with all their properties
+    assert "data/points.geojson.gz" in written
+    data = json.loads(gzip.decompress((outdir / "data/points.geojson.gz").read_bytes()))
+    assert len(data["features"]) == 100 and "next" not in data
+    assert data["features"][0]["properties"] == {"id": 0}
+    assert {"data/grid/2.geojson", "data/grid/3.geojson"} <= set(written)
+    # The points span a single tile at zoom 0, and the two eastern ones at zoom 1
+    tiles = sorted(path for path in written if path.endswith(".png"))
+    assert tiles == [
+        "data/density/tiles/0/0/0.png",
+        "data/density/tiles/1/1/0.png",
+        "data/density/tiles/1/1/1.png",
+    ]
+    assert (outdir / "index.html").read_text().count('"style.json"') == 1
@@ -0,0 +1,86 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import json
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from coordo.map.density import (
+    EMPTY_TILE,
+    DensityLayer,
+    density,
+    encode_png,
+    world_pixels,
+)
+
+POINTS_CSV = "id,weight,geom\n" + "".join(
+    f"{i},{i % 2},POINT(2.{i:02d} 48.8)\n" for i in range(50)
+)
+DENSITY_LAYER = {
+    "id": "density",
+    "type": "density",
+    "path": "package",
+    "resource": "points",
+    "weight": "weight",
+}
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    width, height = struct.unpack(">II", data[16:24])
+    (length,) = struct.unpack(">I", data[33:37])
+    assert data[37:41] == b"IDAT"
+    rows = np.frombuffer(zlib.decompress(data[41 : 41 + length]), np.uint8)
+    return rows.reshape(height, width * 4 + 1)[:, 1:].reshape(height, width, 4)
+
+
+def test_png_round_trip():
+    image = np.random.default_rng(0).integers(0, 256, (3, 5, 4), dtype=np.uint8)
+    assert (decode_png(encode_png(image)) == image).all()
+
+
+def test_density_spreads_weights():
+    grid = density(
+        np.array([10.5, 40.0]), np.array([10.5, 60.0]), np.array([1.0, 2.0]), 64, 32, 5
+    )
+    assert grid.shape == (32, 64)
+    # The second point is outside of the grid
+    assert grid.sum() == pytest.approx(1.0)
+    assert np.unravel_index(grid.argmax(), grid.shape) == (10, 10)
+
+
+def test_reference_is_spread_past_the_largest_grid(monkeypatch):
+    monkeypatch.setattr("coordo.map.density.MAX_GRID_SIZE", 300)
+    layer = DensityLayer(**DENSITY_LAYER)
+    x, y = world_pixels(np.array([-100.0, 100.0]), np.array([0.0, 10.0]))
+    points = (x, y, np.ones(2))
+    # The points are 285 pixels apart at zoom 1, the last one whose grid fits
+    assert layer.reference(points, 3) == pytest.approx(layer.reference(points, 1) / 16)
+
+
+def test_radius_must_be_a_pixel_at_least():
+    with pytest.raises(ValueError, match="radius"):
+        DensityLayer(**DENSITY_LAYER, radius=0)
+
+
+@pytest.mark.parametrize("client", [(POINTS_CSV, [DENSITY_LAYER])], indirect=True)
+def test_density_layer_is_served_as_png_tiles(client):
+    style = client.get("/map/style.json").get_json()
+    assert style["sources"]["density"]["tiles"] == [
+        "/map/density/tiles/{z}/{x}/{y}.png"
+    ]
+    assert style["layers"][0]["type"] == "raster"
+
+    response = client.get("/map/density/tiles/8/129/88.png")
+    assert response.mimetype == "image/png"
+    tile = decode_png(response.data)
+    assert tile[..., 3].max() == 255
+
+    # Points weighing nothing leave the tiles empty
+    filter = json.dumps({"op": "=", "args": [{"property": "weight"}, 0]})
+    response = client.get(f"/map/density/tiles/8/129/88.png?filter={filter}")
+    assert response.data == EMPTY_TILE
+    assert client.get("/map/density/tiles/8/0/0.png").data == EMPTY_TILE
@@ -0,0 +1,34 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import datetime
+import json
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+import coordo.encoder
+from coordo.encoder import dumps
+
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_numpy_and_arrow_values_are_encoded(backend, monkeypatch):
+    if backend == "json":
+        monkeypatch.setattr(coordo.encoder, "orjson", None)
+    elif coordo.encoder.orjson is None:
+        pytest.skip("orjson is not installed")
+    value = {
+        "count": np.int64(3),
+        "values": np.array([0.5, 1.5]),
+        "tags": pa.array(["a", None]),
+        "max": pa.scalar(7),
+        "day": datetime.date(2024, 1, 31),
+    }
+    assert json.loads(dumps(value)) == {
+        "count": 3,
+        "values": [0.5, 1.5],
+        "tags": ["a", None],
+        "max": 7,
+        "day": "2024-01-31",
+    }
@@ -0,0 +1,266 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import pandas as pd
+import pytest
+
+from coordo.datapackage import DataPackage
+from coordo.datapackage.db_helpers import infer_fields, parse_wkt, prepare_path
+from coordo.loaders import DirectoryLoader, KoboToolboxLoader, ResourceAction, Separator
+from coordo.loaders.file_loader import FileLoader, csv_source
+from coordo.sql.helpers import spatial_conn
+
+
+def test_infer_fields_detects_types_and_wkt_geometries(tmp_path):
+    path = tmp_path / "points.csv"
+    path.write_text("id;geom;value;label\n1;POINT(1 2);1,5;a\n2;POINT(3 4);2,5;b\n")
+    fields = infer_fields(csv_source(path, Separator.SEMICOLON, Separator.COMMA))
+    assert fields == [
+        {"name": "id", "type": "integer"},
+        {"name": "geom", "type": "geojson"},
+        {"name": "value", "type": "number"},
+        {"name": "label", "type": "string"},
+    ]
+
+
+def test_values_outside_of_the_sample_are_read(tmp_path):
+    path = tmp_path / "mixed.csv"
+    # The second row isn't WKT but is outside of the sample
+    path.write_text("geom\nPOINT(1 2)\nnot a geometry\n")
+    assert infer_fields(prepare_path(path), sample_size=1) == [
+        {"name": "geom", "type": "geojson"}
+    ]
+    conn = spatial_conn()
+    rows = conn.sql(
+        f"SELECT ST_AsText(geom) FROM (SELECT {parse_wkt(['geom'])} "
+        f"FROM {prepare_path(path)})"
+    ).fetchall()
+    assert rows == [("POINT (1 2)",), (None,)]
+    assert infer_fields(prepare_path(path)) == [{"name": "geom", "type": "string"}]
+
+
+def test_csv_is_transcoded_to_geoparquet(tmp_path):
+    path = tmp_path / "points.csv"
+    path.write_text("id;geom;value\n1;POINT(1 2);1,5\n2;POINT(3 4);2,5\n")
+    package = tmp_path / "package"
+    FileLoader(
+        package, path, ResourceAction.ADD, Separator.SEMICOLON, Separator.COMMA
+    ).etl()
+    assert not (package / "points.csv").exists()
+
+    dp = DataPackage.from_path(package)
+    assert dp.get_resource("points").path == "points.parquet"
+    df = dp.read_resource("points")
+    assert df["value"].tolist() == [1.5, 2.5]
+    assert df.geometry.x.tolist() == [1, 3]
+
+
+def test_directory_is_loaded_in_a_single_save(tmp_path):
+    for name in ("a", "b", "c"):
+        (tmp_path / "campaign" / name).mkdir(parents=True)
+        (tmp_path / "campaign" / name / f"{name}.csv").write_text("id,value\n1,0.5\n")
+    package = tmp_path / "package"
+    DirectoryLoader(
+        package, str(tmp_path / "campaign/**/*.csv"), ResourceAction.ADD, max_workers=2
+    ).etl()
+
+    dp = DataPackage.from_path(package)
+    assert [res.name for res in dp.resources] == ["a", "b", "c"]
+    assert all((package / f"{name}.parquet").exists() for name in ("a", "b", "c"))
+
+
+def test_duplicate_sheets_are_rejected_before_writing(tmp_path):
+    package = tmp_path / "package"
+    (tmp_path / "data.csv").write_text("keep\n1\n")
+    FileLoader(package, tmp_path / "data.csv", ResourceAction.ADD).etl()
+    (tmp_path / "workbooks").mkdir()
+    for name in ("first", "second"):
+        pd.DataFrame({"b": [1]}).to_excel(
+            tmp_path / "workbooks" / f"{name}.xlsx", sheet_name="data", index=False
+        )
+    with pytest.raises(ValueError, match="'data'"):
+        DirectoryLoader(
+            package,
+            str(tmp_path / "workbooks/*.xlsx"),
+            ResourceAction.ADD,
+            max_workers=2,
+        ).etl()
+
+    dp = DataPackage.from_path(package)
+    assert dp.read_resource("data").columns.tolist() == ["keep"]
+    assert sorted(path.name for path in package.iterdir()) == [
+        "data.parquet",
+        "datapackage.json",
+    ]
+
+
+def test_excel_sheets_are_loaded_as_resources(tmp_path):
+    path = tmp_path / "survey.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"a": [1, 2], "geom": ["POINT(1 2)", "POINT(3 4)"]}).to_excel(
+            writer, sheet_name="plots", index=False
+        )
+        pd.DataFrame({"b": ["x"]}).to_excel(writer, sheet_name="trees", index=False)
+    package = tmp_path / "package"
+    FileLoader(package, path, ResourceAction.ADD).etl()
+
+    dp = DataPackage.from_path(package)
+    assert [res.path for res in dp.resources] == ["plots.parquet", "trees.parquet"]
+    plots = dp.read_resource("plots")
+    assert plots["a"].tolist() == [1, 2]
+    # WKT is converted to geometries when the sheet is written
+    assert dp.get_resource("plots").stats.fields["geom"].bbox == [1, 2, 3, 4]
+    assert plots.geometry.x.tolist() == [1, 3]
+    assert not list(package.glob(".staging-*"))
+
+
+def test_unchanged_input_is_not_reloaded(tmp_path, capsys):
+    path = tmp_path / "values.csv"
+    path.write_text("id,value\n1,0.5\n")
+    package = tmp_path / "package"
+    FileLoader(package, path, ResourceAction.ADD).etl()
+    resource = DataPackage.from_path(package).get_resource("values")
+    assert resource.hash.startswith("sha256:")
+    assert resource.bytes == path.stat().st_size
+
+    capsys.readouterr()
+    FileLoader(package, path, ResourceAction.UPDATE).etl()
+    assert "skipping" in capsys.readouterr().out
+
+    path.write_text("id,value\n1,0.5\n2,0.7\n")
+    FileLoader(package, path, ResourceAction.UPDATE).etl()
+    assert "skipping" not in capsys.readouterr().out
+    assert DataPackage.from_path(package).get_resource("values").hash != resource.hash
+
+
+def test_rows_are_appended_in_fragments(tmp_path):
+    path = tmp_path / "points.csv"
+    path.write_text("id,geom,value\n1,POINT(1 2),0.5\n")
+    package = tmp_path / "package"
+    FileLoader(package, path, ResourceAction.ADD).etl()
+    dp = DataPackage.from_path(package)
+
+    rows = (
+        {"id": i, "geom": {"type": "Point", "coordinates": [i, i]}, "value": i / 2}
+        for i in range(2, 7)
+    )
+    assert dp.write_resource("points", rows, chunk_size=2) == 5
+    assert len(list((package / "points").iterdir())) == 4
+    assert dp.get_resource("points").path == "points"
+    assert dp.get_resource("points").stats is None
+    assert DataPackage.from_path(package).get_resource("points").stats is not None
+    dp.save()
+    assert DataPackage.from_path(package).get_resource("points").stats is None
+
+    df = DataPackage.from_path(package).read_resource("points")
+    assert df["id"].tolist() == [1, 2, 3, 4, 5, 6]
+    assert df.geometry.x.tolist() == [1, 2, 3, 4, 5, 6]
+
+
+def test_rows_not_matching_the_schema_are_rejected(tmp_path):
+    path = tmp_path / "values.csv"
+    path.write_text("id,value\n1,0.5\n")
+    package = tmp_path / "package"
+    FileLoader(package, path, ResourceAction.ADD).etl()
+    dp = DataPackage.from_path(package)
+
+    with pytest.raises(ValueError, match="no field named other"):
+        dp.write_resource("values", [{"id": 2, "other": 1}])
+    with pytest.raises(ValueError, match="values.value"):
+        dp.write_resource("values", [{"id": 2, "value": "not a number"}])
+
+
+def test_update_merges_rows_on_primary_key(tmp_path, capsys):
+    path = tmp_path / "values.csv"
+    path.write_text("id,value\n1,0.1\n2,0.2\n3,0.3\n")
+    package = tmp_path / "package"
+    FileLoader(package, path, ResourceAction.ADD).etl()
+    dp = DataPackage.from_path(package)
+    dp.get_resource("values").schema.primaryKey = ["id"]
+    dp.save()
+
+    path.write_text("id,value,comment\n1,0.1,\n2,0.25,fixed\n4,0.4,\n")
+    FileLoader(package, path, ResourceAction.UPDATE).etl()
+    assert "1 rows inserted, 1 rows updated" in capsys.readouterr().out
+
+    dp = DataPackage.from_path(package)
+    resource = dp.get_resource("values")
+    assert [f.name for f in resource.schema.fields] == ["id", "value", "comment"]
+    assert not list(package.glob(".*staging*"))
+    conn, _ = dp.prepare_db()
+    assert conn.sql('SELECT * FROM "values" ORDER BY id').fetchall() == [
+        (1, 0.1, None),
+        (2, 0.25, "fixed"),
+        (3, 0.3, None),
+        (4, 0.4, None),
+    ]
+
+
+def test_update_keeps_the_columns_it_doesnt_give(tmp_path):
+    path = tmp_path / "values.csv"
+    path.write_text("id,name,value\n1,a,0.1\n2,b,0.2\n")
+    package = tmp_path / "package"
+    FileLoader(package, path, ResourceAction.ADD).etl()
+    dp = DataPackage.from_path(package)
+    dp.get_resource("values").schema.primaryKey = ["id"]
+    dp.save()
+
+    path.write_text("id,value\n1,100\n1,200\n")
+    with pytest.raises(ValueError, match="duplicate keys"):
+        FileLoader(package, path, ResourceAction.UPDATE).etl()
+    path.write_text("id,value\n1,100\n3,0.3\n")
+    FileLoader(package, path, ResourceAction.UPDATE).etl()
+    conn, _ = DataPackage.from_path(package).prepare_db()
+    assert conn.sql('SELECT id, name, value FROM "values" ORDER BY id').fetchall() == [
+        (1, "a", 100),
+        (2, "b", 0.2),
+        (3, None, 0.3),
+    ]
+
+
+def test_kobotoolbox_exports_are_replaced_on_update(
+    tmp_path, inventory_inquiry, inventory_data
+):
+    package = tmp_path / "package"
+    KoboToolboxLoader(
+        package, inventory_inquiry, inventory_data, ResourceAction.ADD
+    ).etl()
+    # Submissions deleted upstream are missing from the next export
+    sheets = pd.read_excel(inventory_data, sheet_name=None)
+    data = tmp_path / "data.xlsx"
+    with pd.ExcelWriter(data) as writer:
+        for i, (name, sheet) in enumerate(sheets.items()):
+            (sheet.iloc[:5] if i == 0 else sheet).to_excel(
+                writer, sheet_name=name, index=False
+            )
+    KoboToolboxLoader(package, inventory_inquiry, data, ResourceAction.UPDATE).etl()
+
+    dp = DataPackage.from_path(package)
+    assert dp.get_resource("inventaire_id").path == "inventaire_id.parquet"
+    assert not list(package.glob(".*staging*"))
+    assert len(dp.read_resource("inventaire_id")) == 5
+
+
+def test_stats_are_stored_at_load_time(tmp_path):
+    path = tmp_path / "points.csv"
+    path.write_text(
+        "id,geom,day\n1,POINT(1 2),2024-01-01\n2,POINT(3 4),\n3,,2024-03-01\n"
+    )
+    package = tmp_path / "package"
+    FileLoader(package, path, ResourceAction.ADD).etl()
+
+    stats = DataPackage.from_path(package).get_resource("points").stats
+    assert stats.rows == 3
+    assert stats.bbox == [1, 2, 3, 4]
+    assert stats.fields["geom"].geometryTypes == ["POINT"]
+    assert stats.fields["geom"].nulls == 1
+    assert stats.fields["id"].model_dump(exclude_none=True) == {
+        "nulls": 0,
+        "distinct": 3,
+        "min": 1,
+        "max": 3,
+    }
+    assert (stats.fields["day"].min, stats.fields["day"].max) == (
+        "2024-01-01",
+        "2024-03-01",
+    )
@@ -0,0 +1,76 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import pytest
+import shapely
+from shapely.geometry import shape
+
+from coordo.map import Map
+
+
+@pytest.fixture
+def base_path(load_csv):
+    return load_csv(
+        "trees",
+        "id,biomass,geom\n"
+        "1,2.0,POINT(2.35 48.85)\n"
+        "2,3.0,POINT(2.36 48.86)\n"
+        "3,5.0,POINT(-1.5 43.5)\n"
+        "4,,POINT(5 45)\n",
+    )
+
+
+def make_map(base_path, **extra):
+    layer = {
+        "id": "grid",
+        "type": "grid",
+        "path": "package",
+        "resource": "trees",
+        **extra,
+    }
+    map = Map.from_dict({"layers": [layer], "controls": []})
+    map._base_path = base_path
+    return map
+
+
+@pytest.mark.parametrize("shape_", ["square", "hexagon"])
+def test_cells_aggregate_columns_by_zoom(base_path, shape_):
+    map = make_map(base_path, shape=shape_, columns={"biomass": "sum(biomass)"})
+    cells = map.handle_request("GET", "grid", None, zoom=8.6)["features"]
+    assert sorted(
+        (cell["properties"]["count"], cell["properties"]["biomass"] or 0)
+        for cell in cells
+    ) == [(1, 0), (1, 5.0), (2, 5.0)]
+    paris = next(cell for cell in cells if cell["properties"]["count"] == 2)
+    assert shape(paris["geometry"]).contains(shapely.Point(2.35, 48.85))
+
+    # Cells get larger as the map zooms out
+    cells = map.handle_request("GET", "grid", None, zoom=0)["features"]
+    assert sum(cell["properties"]["count"] for cell in cells) == 4
+    assert len(cells) < 3
+
+    filter = {"op": ">", "args": [{"property": "biomass"}, 2.5]}
+    cells = map.handle_request("POST", "grid", filter, zoom=8)["features"]
+    assert sorted(cell["properties"]["biomass"] for cell in cells) == [3.0, 5.0]
+
+
+def test_grid_style_requests_cells_by_zoom(base_path):
+    style = make_map(
+        base_path, minZoom=2, paint={"fill-color": "red"}
+    ).get_maplibre_style("/map/")
+    assert style["sources"]["grid"]["data"] == "/map/grid?zoom=2"
+    layer = style["layers"][0]
+    assert layer["type"] == "fill" and layer["paint"] == {"fill-color": "red"}
+    assert layer["metadata"]["grid"] == {"minZoom": 2, "maxZoom": 16}
+
+
+@pytest.mark.parametrize("shape_", ["square", "hexagon"])
+def test_cells_are_restricted_to_the_viewport(base_path, shape_):
+    map = make_map(base_path, shape=shape_)
+    paris = [2.0, 48.5, 3.0, 49.0]
+    cells = map.handle_request("GET", "grid", None, zoom=8, bbox=paris)["features"]
+    assert [cell["properties"]["count"] for cell in cells] == [2]
+    assert map.handle_request("GET", "grid", None, zoom=8, bbox=[10, 10, 11, 11]) == {
+        "type": "FeatureCollection",
+        "features": [],
+    }
@@ -0,0 +1,302 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import threading
+import time
+
+import duckdb
+import pyarrow as pa
+import pytest
+
+from coordo.datapackage import DataPackage
+from coordo.datapackage.scan import ResourceScan
+from coordo.map import Map
+from coordo.map.datapackage import DataPackageLayer
+from coordo.sql.helpers import spatial_conn
+
+
+@pytest.fixture
+def base_path(load_csv):
+    return load_csv(
+        "plots",
+        'id,geom\n1,"POLYGON((0 0, 1 0, 1 1, 0 0))"\n2,"POLYGON((1 1, 2 1, 2 2, 1 1))"\n',
+    )
+
+
+def make_layer(**extra):
+    return DataPackageLayer(
+        **{
+            "id": "plots",
+            "type": "datapackage",
+            "path": "package",
+            "resource": "plots",
+            **extra,
+        }
+    )
+
+
+def test_layer_type_is_read_from_statistics(base_path, monkeypatch):
+    def no_query(self):
+        raise AssertionError("The data should not be queried")
+
+    monkeypatch.setattr(ResourceScan, "geometry_type", no_query)
+    package = DataPackage.from_path(base_path / "package")
+    assert make_layer().infer_layer_type(package) == "fill"
+
+
+def test_layer_type_is_probed_on_computed_columns(base_path):
+    package = DataPackage.from_path(base_path / "package")
+    layer = make_layer(columns={"geom": "geom"}, filter="id = 2")
+    assert layer.geometry_type(package) == "POLYGON"
+    assert layer.infer_layer_type(package) == "fill"
+
+
+def test_style_references_layer_data_by_url(base_path):
+    map = Map.from_dict({"layers": [make_layer().model_dump()], "controls": []})
+    map._base_path = base_path
+    style = map.handle_request("GET", "style.json", None, data_url="/map/")
+    assert style["sources"]["plots"]["data"] == "/map/plots"
+    assert style["layers"][0]["metadata"]["bbox"] == [0, 0, 2, 2]
+
+    data = map.handle_request("GET", "plots", None, data_url="/map/")
+    assert len(data["features"]) == 2
+    embedded = map.get_maplibre_style()
+    assert embedded["sources"]["plots"]["data"] == data
+
+
+def test_failing_and_slow_layers_are_left_out(base_path, monkeypatch):
+    layers = [
+        make_layer().model_dump(),
+        make_layer(id="missing", resource="missing").model_dump(),
+        make_layer(id="slow").model_dump(),
+        make_layer(id="stuck").model_dump(),
+    ]
+    map = Map.from_dict({"layers": layers, "controls": []})
+    map._base_path = base_path
+    to_maplibre = DataPackageLayer.to_maplibre
+    interrupted = threading.Event()
+
+    def slow_to_maplibre(self, *args):
+        if self.id == "slow":
+            time.sleep(0.6)
+        if self.id == "stuck":
+            try:
+                spatial_conn().execute("SELECT count(*) FROM range(1_000_000_000_000)")
+            except duckdb.InterruptException:
+                interrupted.set()
+                raise
+        return to_maplibre(self, *args)
+
+    monkeypatch.setattr(DataPackageLayer, "to_maplibre", slow_to_maplibre)
+    monkeypatch.setattr("coordo.map.LAYER_TIMEOUT", 1)
+    # Layers are timed separately, even when they wait for each other
+    monkeypatch.setattr("coordo.map.MAX_WORKERS", 1)
+    style = map.get_maplibre_style(data_url="/map/")
+    assert [layer["id"] for layer in style["layers"]] == ["plots", "slow"]
+    # The query of the layer left out doesn't keep running
+    assert interrupted.wait(5)
+
+
+def test_layers_waiting_for_a_stuck_worker_are_left_out(base_path, monkeypatch):
+    layers = [make_layer(id="stuck").model_dump(), make_layer().model_dump()]
+    map = Map.from_dict({"layers": layers, "controls": []})
+    map._base_path = base_path
+    to_maplibre = DataPackageLayer.to_maplibre
+    release = threading.Event()
+
+    def stuck_to_maplibre(self, *args):
+        if self.id == "stuck":
+            # Python code isn't interrupted with the queries of the layer
+            release.wait(10)
+        return to_maplibre(self, *args)
+
+    monkeypatch.setattr(DataPackageLayer, "to_maplibre", stuck_to_maplibre)
+    monkeypatch.setattr("coordo.map.LAYER_TIMEOUT", 1)
+    monkeypatch.setattr("coordo.map.MAX_WORKERS", 1)
+    start = time.monotonic()
+    try:
+        style = map.get_maplibre_style(data_url="/map/")
+    finally:
+        release.set()
+    assert style["layers"] == []
+    assert time.monotonic() - start < 2
+
+
+def test_sources_are_loaded_whole_and_filters_by_pages(base_path):
+    map = Map.from_dict(
+        {"layers": [make_layer(maxPageSize=1).model_dump()], "controls": []}
+    )
+    map._base_path = base_path
+    # MapLibre doesn't follow pages
+    data = map.handle_request("GET", "plots", None)
+    assert len(data["features"]) == 2 and "next" not in data
+    page = map.handle_request(
+        "POST", "plots", {"op": ">", "args": [{"property": "id"}, 0]}
+    )
+    assert len(page["features"]) == 1 and page["next"]
+    # Binary extracts aren't paginated, they are streamed whole
+    chunks = map.handle_request("GET", "plots", None, format="arrow")
+    assert pa.ipc.open_stream(b"".join(chunks)).read_all().num_rows == 2
+
+
+@pytest.mark.parametrize("primary_key", [[], ["id"]])
+def test_feature_ids_are_unique_across_pages(load_csv, primary_key):
+    base_path = load_csv(
+        "points", "id,geom\n" + "".join(f"{i},POINT({i} {i})\n" for i in range(10))
+    )
+    package = DataPackage.from_path(base_path / "package")
+    package.get_resource("points").schema.primaryKey = primary_key
+    package.save()
+    layer = make_layer(id="points", resource="points", maxPageSize=4)
+    map = Map.from_dict({"layers": [layer.model_dump()], "controls": []})
+    map._base_path = base_path
+    ids, cursor = [], None
+    while True:
+        page = map.handle_request("POST", "points", None, cursor=cursor)
+        ids += [feature["id"] for feature in page["features"]]
+        if not (cursor := page.get("next")):
+            break
+    assert len(ids) == 10 and len(set(ids)) == 10
+
+
+def test_slim_layers_fetch_feature_details(base_path):
+    package = DataPackage.from_path(base_path / "package")
+    package.get_resource("plots").schema.primaryKey = ["id"]
+    package.save()
+    layer = make_layer(
+        slim=True,
+        columns={
+            "geom": "geom",
+            "id": "id",
+            "area": "id * 10",
+            "label": "'plot' if id > 1 else 'first'",
+        },
+        paint={"fill-color": ["case", [">", ["get", "area"], 10], "red", "blue"]},
+    )
+    map = Map.from_dict({"layers": [layer.model_dump()], "controls": []})
+    map._base_path = base_path
+
+    data = map.handle_request("GET", "plots", None)
+    assert [f["id"] for f in data["features"]] == [1, 2]
+    assert data["features"][0]["properties"] == {"id": 1, "area": 10}
+
+    feature = map.handle_request("GET", "plots/features/2", None)
+    assert feature["properties"] == {"id": 2, "area": 20, "label": "plot"}
+    assert map.handle_request("GET", "plots/features/3", None) is None
+    style = map.get_maplibre_style(data_url="/map/")
+    assert style["layers"][0]["metadata"]["featuresUrl"] == "/map/plots/features/"
+    assert style["sources"]["plots"]["promoteId"] == "id"
+
+
+def test_feature_details_select_the_key(base_path):
+    package = DataPackage.from_path(base_path / "package")
+    package.get_resource("plots").schema.primaryKey = ["id"]
+    package.save()
+    layer = make_layer(slim=True, columns={"geom": "geom", "area": "id * 10"})
+    map = Map.from_dict({"layers": [layer.model_dump()], "controls": []})
+    map._base_path = base_path
+
+    feature = map.handle_request("GET", "plots/features/2", None)
+    assert feature["id"] == 2
+    assert feature["properties"] == {"area": 20, "id": 2}
+
+
+def test_child_rows_are_fetched_by_parent_key(base_path, load_csv):
+    load_csv("trees", "id,plot,height\n1,2,5.5\n2,1,3.0\n3,2,8.0\n")
+    package = DataPackage.from_path(base_path / "package")
+    package.get_resource("plots").schema.primaryKey = ["id"]
+    package.get_resource("trees").add_foreignkey(["plot"], ["id"], "plots")
+    assert package.sort_resource("trees") == ["plot"]
+    package.save()
+    assert len(list((base_path / "package" / "trees").glob("*.parquet"))) == 1
+
+    map = Map.from_dict({"layers": [make_layer().model_dump()], "controls": []})
+    map._base_path = base_path
+    rows = map.handle_request("GET", "plots/features/2/trees", None)
+    assert rows == [
+        {"id": 1, "plot": 2, "height": 5.5},
+        {"id": 3, "plot": 2, "height": 8.0},
+    ]
+    assert map.handle_request("GET", "plots/features/3/trees", None) == []
+    references = map.get_maplibre_style(data_url="/map/")["layers"][0]["metadata"][
+        "references"
+    ]
+    assert references[0]["url"] == "/map/plots/features/{id}/trees"
+
+
+def test_facets_are_cached_by_filter(base_path, monkeypatch):
+    map = Map.from_dict({"layers": [make_layer().model_dump()], "controls": []})
+    map._base_path = base_path
+    filter = {"op": ">", "args": [{"property": "id"}, 1]}
+    facets = map.handle_request("POST", "plots/facets", filter, fields=["id"])
+    assert facets == {
+        "count": 1,
+        "fields": {"id": {"nulls": 0, "min": 2, "max": 2, "histogram": [1] + [0] * 19}},
+    }
+
+    monkeypatch.setattr(ResourceScan, "facets", None)
+    assert map.handle_request("POST", "plots/facets", filter, fields=["id"]) == facets
+
+
+def test_time_ranges_are_combined_from_buckets(base_path, load_csv, monkeypatch):
+    load_csv(
+        "visits",
+        "plot,day,trees,species,geom\n1,2024-01-05,2,oak,POINT(0 0)\n"
+        "1,2024-02-10,3,oak,POINT(0 0)\n2,2024-02-20,4,pine,POINT(1 1)\n"
+        "1,2024-03-01,5,oak,POINT(0 0)\n",
+    )
+    layer = make_layer(
+        id="visits",
+        resource="visits",
+        columns={"geom": "geom", "trees": "sum(trees)", "visits": "count(day)"},
+        groupby=["plot"],
+        time={"field": "day", "bucket": "month"},
+    )
+    map = Map.from_dict({"layers": [layer.model_dump()], "controls": []})
+    map._base_path = base_path
+
+    def properties(time):
+        data = map.handle_request("GET", "visits", None, time=time)
+        return sorted(
+            (f["properties"] for f in data["features"]), key=lambda p: p["plot"]
+        )
+
+    assert properties("2024-01-01/2024-02-01") == [
+        {"plot": 1, "trees": 5, "visits": 2},
+        {"plot": 2, "trees": 4, "visits": 1},
+    ]
+    assert properties("2024-03-01/..") == [{"plot": 1, "trees": 5, "visits": 1}]
+    page = map.handle_request("GET", "visits", None, time="../2024-02-01", limit=1)
+    assert len(page["features"]) == 1
+    rest = map.handle_request(
+        "GET", "visits", None, time="../2024-02-01", cursor=page["next"]
+    )
+    assert [f["properties"]["plot"] for f in page["features"] + rest["features"]] == [
+        1,
+        2,
+    ]
+    assert "next" not in rest
+
+    # Distinct values can't be summed over buckets
+    layer.columns["trees"] = "count(unique(species))"
+    map = Map.from_dict({"layers": [layer.model_dump()], "controls": []})
+    map._base_path = base_path
+    monkeypatch.setattr("coordo.map.datapackage.build_cube", None)
+    assert properties("2024-01-01/2024-02-01")[0] == {
+        "plot": 1,
+        "trees": 1,
+        "visits": 2,
+    }
+
+    # Neither can averages, they are computed from the rows of the range
+    layer.columns["trees"] = "avg(trees)"
+    map = Map.from_dict({"layers": [layer.model_dump()], "controls": []})
+    map._base_path = base_path
+    assert properties("2024-01-01/2024-02-01")[0] == {
+        "plot": 1,
+        "trees": 2.5,
+        "visits": 2,
+    }
+
+    metadata = map.get_maplibre_style()["layers"][0]["metadata"]["time"]
+    assert metadata["bucket"] == "month"
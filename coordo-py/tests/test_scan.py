@@ -0,0 +1,108 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import pytest
+
+from coordo.datapackage import DataPackage
+
+
+@pytest.fixture
+def package(load_csv):
+    base_path = load_csv(
+        "trees",
+        "id,plot,height,geom\n"
+        "1,a,5,POINT(0 0)\n"
+        "2,a,12,POINT(1 1)\n"
+        "3,b,20,POINT(2 2)\n"
+        "4,b,8,POINT(3 3)\n",
+    )
+    return DataPackage.from_path(base_path / "package")
+
+
+def test_scan_is_lazy_and_chainable(package):
+    scan = package.scan("trees").filter("height > 6")
+    tall = scan.filter("plot = 'b'")
+    assert scan.count() == 3
+    assert tall.count() == 2
+    assert "LIMIT" in tall.limit(1).sql()
+
+    table = (
+        scan.select({"height": "max(height)"})
+        .groupby("plot")
+        .to_arrow()
+        .sort_by("plot")
+    )
+    assert table.to_pydict() == {"plot": ["a", "b"], "height": [12, 20]}
+
+
+def test_scan_converts_geometries(package):
+    gdf = package.scan("trees").filter("id < 3").to_geopandas()
+    assert gdf.geometry.x.tolist() == [0, 1]
+    assert sum(batch.num_rows for batch in package.scan("trees").iter_batches(2)) == 4
+    with pytest.raises(ValueError, match="No geometry"):
+        package.scan("trees").select(["id"]).to_geopandas()
+
+
+def test_geojson_is_serialised_from_arrow(package):
+    table = package.read_resource("trees", output="arrow")
+    assert table.num_rows == 4
+    collection = package.scan("trees").filter("plot = 'b'").to_geojson()
+    assert collection["bbox"] == [2, 2, 3, 3]
+    assert collection["features"][0] == {
+        "id": "0",
+        "type": "Feature",
+        "properties": {"id": 3, "plot": "b", "height": 20},
+        "geometry": {"type": "Point", "coordinates": [2.0, 2.0]},
+        "bbox": [2.0, 2.0, 2.0, 2.0],
+    }
+
+
+def test_geojson_precision(load_csv):
+    base_path = load_csv(
+        "points", "id,value,geom\n1,0.123456,POINT(1.123456 2.987654)\n"
+    )
+    scan = DataPackage.from_path(base_path / "package").scan("points")
+    (feature,) = scan.to_geojson(precision=2)["features"]
+    assert feature["geometry"]["coordinates"] == [1.12, 2.99]
+    assert feature["properties"]["value"] == 0.12
+
+
+def read_pages(scan, size):
+    pages, cursor = [], None
+    while True:
+        table, cursor = scan.page(size, cursor)
+        pages.append(table.column("id").to_pylist())
+        if cursor is None:
+            return pages
+
+
+def test_pages_are_read_after_the_primary_key(package):
+    package.get_resource("trees").schema.primaryKey = ["id"]
+    scan = package.scan("trees")
+    assert scan.keyset_column() == "id"
+    assert read_pages(scan, 3) == [[1, 2, 3], [4]]
+    assert read_pages(scan.filter("height > 6"), 2) == [[2, 3], [4]]
+
+
+def test_pages_are_read_by_offset_without_primary_key(package):
+    scan = package.scan("trees").select(["id", "height"])
+    assert scan.keyset_column() is None
+    assert read_pages(scan, 2) == [[1, 2], [3, 4]]
+
+
+def test_facets_count_values_and_bin_numbers(package):
+    facets = (
+        package.scan("trees").filter("height > 6").facets(["plot", "height"], bins=2)
+    )
+    assert facets == {
+        "count": 3,
+        "fields": {
+            "plot": {
+                "nulls": 0,
+                "values": [{"value": "b", "count": 2}, {"value": "a", "count": 1}],
+            },
+            "height": {"nulls": 0, "min": 8, "max": 20, "histogram": [2, 1]},
+        },
+    }
+    # Geometries have no facets
+    assert list(package.scan("trees").facets()["fields"]) == ["id", "plot", "height"]
@@ -0,0 +1,101 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import gzip
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from coordo.server import negotiate_encoding
+
+from .conftest import POINTS_CSV, POINTS_LAYER
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("") is None
+
+
+def test_data_is_compressed_and_revalidated(client):
+    response = client.get("/map/points", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    data = json.loads(gzip.decompress(response.data))
+    assert len(data["features"]) == 100
+
+    etag = response.headers["ETag"]
+    response = client.get("/map/points", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_filter_requests_have_their_own_etag(client):
+    filters = {"op": "<", "args": [{"property": "id"}, 10]}
+    first = client.post("/map/points", json=filters)
+    assert len(first.json["features"]) == 10
+    other = client.post(
+        "/map/points", json={"op": "<", "args": [{"property": "id"}, 5]}
+    )
+    assert first.headers["ETag"] != other.headers["ETag"]
+    again = client.post(
+        "/map/points", json=filters, headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert again.status_code == 304
+
+
+def test_binary_formats_are_negotiated(client, tmp_path):
+    response = client.get("/map/points?f=arrow")
+    assert response.mimetype == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table.num_rows == 100
+    assert (
+        table.schema.field("geom").metadata[b"ARROW:extension:name"] == b"geoarrow.wkb"
+    )
+
+    response = client.post(
+        "/map/points",
+        json={"op": "<", "args": [{"property": "id"}, 10]},
+        headers={"Accept": "application/vnd.apache.parquet"},
+    )
+    assert "Content-Encoding" not in response.headers
+    path = tmp_path / "points.parquet"
+    path.write_bytes(response.data)
+    assert pq.read_table(path).num_rows == 10
+    assert b"geo" in pq.read_schema(path).metadata
+
+    response = client.get("/map/points", headers={"Accept": "application/flatgeobuf"})
+    assert response.data[:3] == b"fgb"
+    assert client.get("/map/points?f=shp").status_code == 400
+
+
+def test_features_are_paginated(client):
+    first = client.get("/map/points?limit=60").json
+    assert len(first["features"]) == 60
+    second = client.get(f"/map/points?limit=60&cursor={first['next']}").json
+    assert len(second["features"]) == 40
+    assert "next" not in second
+
+
+@pytest.mark.parametrize(
+    "client",
+    [(POINTS_CSV, [{**POINTS_LAYER, "maxPageSize": 10}])],
+    indirect=True,
+)
+def test_extracts_are_streamed_past_the_page_size(client):
+    response = client.get("/map/points?f=arrow")
+    assert response.is_streamed
+    assert pa.ipc.open_stream(response.data).read_all().num_rows == 100
+
+
+def test_invalid_requests_are_client_errors(client):
+    assert client.get("/map/points?cursor=nope").status_code == 400
+    response = client.get("/map/points?time=2024-01-01/2024-02-01")
+    assert response.status_code == 400
+    assert "no time dimension" in response.json["error"]
+    assert client.get("/map/missing/facets").status_code == 404
+    assert client.post("/map/missing", json={}).status_code == 404
+    assert client.get("/map/points/features/1").status_code == 400
+    assert client.get("/map/points?bbox=1,2,3").status_code == 400
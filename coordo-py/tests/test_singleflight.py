@@ -0,0 +1,51 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from coordo.map.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_the_result():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.5)
+        return {"features": []}
+
+    with ThreadPoolExecutor(4) as pool:
+        first = pool.submit(flights.do, "key", compute)
+        started.wait()
+        others = [pool.submit(flights.do, "key", compute) for _ in range(3)]
+        results = [first.result()] + [f.result() for f in others]
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    # Once done, the next call computes again
+    flights.do("key", compute)
+    assert len(calls) == 2
+
+
+def test_errors_are_raised_to_all_waiters():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.5)
+        raise ValueError("broken layer")
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(flights.do, "key", fail)
+        started.wait()
+        second = pool.submit(flights.do, "key", fail)
+        for future in (first, second):
+            with pytest.raises(ValueError, match="broken layer"):
+                future.result()
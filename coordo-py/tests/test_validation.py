@@ -0,0 +1,67 @@
+# Copyright COORDONNÉES 2025, 2026
+# SPDX-License-Identifier: MPL-2.0
+
+from coordo.datapackage import DataPackage, Field
+from coordo.datapackage.validation import count_violations
+
+
+def make_package(load_csv):
+    load_csv("plots", "id,code\n1,a\n2,b\n")
+    base_path = load_csv(
+        "trees",
+        "_id,plot,height,max_height,species\n1,1,10,20,x\n2,1,-1,20,y\n3,3,30,20,\n",
+    )
+    dp = DataPackage.from_path(base_path / "package")
+    trees = dp.get_resource("trees")
+    trees.schema.primaryKey = ["_id"]
+    trees.schema.fields = [
+        Field(name="_id", type="integer"),
+        Field(name="plot", type="integer"),
+        Field(
+            name="height",
+            type="integer",
+            constraints={"minimum": 0, "custom_maximum": "${max_height}"},
+        ),
+        Field(name="max_height", type="integer"),
+        Field(
+            name="species",
+            type="string",
+            constraints={"required": True},
+            categories=[{"value": "x", "label": "X"}],
+        ),
+    ]
+    trees.add_foreignkey(
+        fields=["plot"], foreign_fields=["id"], foreign_resource="plots"
+    )
+    dp.save()
+    return dp
+
+
+def test_violations_are_counted_per_field_with_sample_ids(load_csv):
+    report = make_package(load_csv).validate(["trees"])
+    assert report["trees"]["rows"] == 3
+    assert report["trees"]["fields"] == {
+        "height": {
+            "minimum": {"count": 1, "sample": [2]},
+            "custom_maximum": {"count": 1, "sample": [3]},
+        },
+        "species": {
+            "required": {"count": 1, "sample": [3]},
+            "categories": {"count": 1, "sample": [2]},
+        },
+    }
+    assert report["trees"]["foreignKeys"] == {
+        "plot -> plots.id": {"count": 1, "sample": [3]}
+    }
+    assert count_violations(report) == 5
+
+
+def test_custom_constraints_that_arent_sql_are_skipped(load_csv, capsys):
+    dp = make_package(load_csv)
+    dp.get_resource("trees").schema.fields[
+        2
+    ].constraints.custom_minimum = "${max_height} div 2"
+    report = dp.validate(["trees"])
+    assert "custom_minimum" not in report["trees"]["fields"]["height"]
+    assert report["trees"]["fields"]["height"]["custom_maximum"]["count"] == 1
+    assert "Can't check custom_minimum on trees.height" in capsys.readouterr().out
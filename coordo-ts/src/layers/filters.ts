@@ -3,11 +3,20 @@
  * SPDX-License-Identifier: MPL-2.0
  */
 
-import type { GeoJSONSource, Map as MapLibreMap } from "maplibre-gl";
+import type {
+  GeoJSONSource,
+  Map as MapLibreMap,
+  RasterTileSource,
+} from "maplibre-gl";
+
+import type { LayerMetadata } from "../types";
+import { isGridLayer, setGridFilters } from "./grid";
 
 export type SetLayerFiltersParams<T> = {
   layerId: string;
   filters: T;
+  // Range of dates for layers with a time dimension, e.g. "2024-01-01/2024-03-31"
+  time?: string;
 };
 
 export function makeSetLayerFilters({
@@ -23,6 +32,7 @@ export function makeSetLayerFilters({
    * @template T - The type of the filters object.
    * @param layerId Name of the layer to set filtered data.
    * @param filter Serializable configuration to provide to the endpoint
+   * @param time Range of dates "start/end" to aggregate, ".." leaving a bound open
    *
    * @example
    * function filterByForest(selection: string){
@@ -38,6 +48,7 @@ export function makeSetLayerFilters({
   async function setLayerFilters<T>({
     layerId,
     filters,
+    time,
   }: SetLayerFiltersParams<T>) {
     // Retrieve layer configuration
     const layer = map.getLayer(layerId);
@@ -45,15 +56,54 @@ export function makeSetLayerFilters({
       throw new Error(`[FILTERS] Layer ${layerId} doesn't exist.`);
     }
 
-    const dataUrl = new URL(layerId, baseUrl).toString();
+    // Grid cells depend on the zoom level, they are reloaded as the map zooms
+    if (isGridLayer(map, layerId)) {
+      await setGridFilters(map, layerId, filters);
+      return;
+    }
+
+    // Density tiles are rendered with the filter given in their URL
+    if ((layer.metadata as LayerMetadata)?.density) {
+      const tilesUrl = new URL(`${layerId}/tiles/`, baseUrl);
+      tilesUrl.searchParams.set("filter", JSON.stringify(filters));
+      // MapLibre fills in the tile coordinates, they must not be escaped
+      const template = tilesUrl
+        .toString()
+        .replace("/tiles/?", "/tiles/{z}/{x}/{y}.png?");
+      const source = map.getSource(layer.source) as RasterTileSource;
+      source?.setTiles([template]);
+      return;
+    }
+
+    const url = new URL(layerId, baseUrl);
+    if (time !== undefined) {
+      url.searchParams.set("time", time);
+    }
+    const dataUrl = url.toString();
 
-    // Fetch data based on filters
-    const res = await fetch(dataUrl, {
+    // Fetch data based on filters, following the pages of large layers
+    let res = await fetch(dataUrl, {
       body: JSON.stringify(filters),
       headers: { "Content-Type": "application/json" },
       method: "POST",
     });
     const data = await res.json();
+    let page = data;
+    while (page.next) {
+      const pageUrl = new URL(dataUrl);
+      pageUrl.searchParams.set("cursor", page.next);
+      res = await fetch(pageUrl, {
+        body: JSON.stringify(filters),
+        headers: { "Content-Type": "application/json" },
+        method: "POST",
+      });
+      page = await res.json();
+      // Spreading large pages would exceed the maximum number of arguments
+      for (const feature of page.features) {
+        data.features.push(feature);
+      }
+    }
+    delete data.next;
 
     // Update map internal state data
     const source = map.getSource(layer?.source) as GeoJSONSource;
@@ -62,3 +112,55 @@ export function makeSetLayerFilters({
 
   return setLayerFilters;
 }
+
+export type GetLayerFacetsParams<T> = {
+  layerId: string;
+  filters?: T;
+  fields?: string[];
+};
+
+export function makeGetLayerFacets({ baseUrl }: { baseUrl: URL }) {
+  /**
+   * Count the values of the categorical fields of a layer and get the range and
+   * histogram of its numeric fields, under the given filters.
+   *
+   * @param layerId Name of the layer.
+   * @param filters CQL2 JSON filter, the same as the one given to setLayerFilters.
+   * @param fields Fields to summarise, all of them by default.
+   *
+   * @example
+   * const { count, fields } = await mapApiRef.current.getLayerFacets({
+   *   layerId: "my-layer-id",
+   *   filters: { op: "=", args: [{ property: "for" }, selection] },
+   *   fields: ["species", "height"],
+   * });
+   * // fields.species.values: [{ value: "oak", count: 12 }, ...]
+   * // fields.height: { min, max, nulls, histogram: [3, 5, ...] }
+   */
+  async function getLayerFacets<T>({
+    layerId,
+    filters,
+    fields,
+  }: GetLayerFacetsParams<T>) {
+    const facetsUrl = new URL(`${layerId}/facets`, baseUrl);
+    if (fields) {
+      facetsUrl.searchParams.set("fields", fields.join(","));
+    }
+    const res = await fetch(
+      facetsUrl,
+      filters === undefined
+        ? undefined
+        : {
+            body: JSON.stringify(filters),
+            headers: { "Content-Type": "application/json" },
+            method: "POST",
+          },
+    );
+    if (!res.ok) {
+      throw new Error(`[FACETS] ${res.status} ${await res.text()}`);
+    }
+    return await res.json();
+  }
+
+  return getLayerFacets;
+}
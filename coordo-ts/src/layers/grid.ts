@@ -0,0 +1,128 @@
+/**
+ * Copyright COORDONNÉES 2025, 2026
+ * SPDX-License-Identifier: MPL-2.0
+ */
+
+import type {
+  GeoJSONSource,
+  LngLatBounds,
+  Map as MapLibreMap,
+} from "maplibre-gl";
+
+import type { LayerMetadata } from "../types";
+
+// Cells of grid layers are computed by coordo-py for integer zoom levels,
+// within the viewport they are requested for
+type GridState = {
+  url: URL;
+  zoom?: number;
+  // [west, south, east, north] of the loaded cells, unset for whole maps
+  bbox?: number[];
+  filters?: unknown;
+};
+
+const grids = new WeakMap<MapLibreMap, Record<string, GridState>>();
+
+function gridZoom(map: MapLibreMap, metadata: LayerMetadata) {
+  const { minZoom, maxZoom } = metadata.grid!;
+  return Math.min(Math.max(Math.floor(map.getZoom()), minZoom), maxZoom);
+}
+
+// The viewport padded by half its size on each side, so that small moves
+// don't reload the cells
+function paddedBounds(bounds: LngLatBounds) {
+  const [west, south, east, north] = bounds.toArray().flat();
+  const [dx, dy] = [(east - west) / 2, (north - south) / 2];
+  return [west - dx, south - dy, east + dx, north + dy].map((value) =>
+    Number(value.toFixed(4)),
+  );
+}
+
+function coversView(map: MapLibreMap, bbox: number[] | undefined) {
+  if (!bbox) {
+    return true;
+  }
+  const [west, south, east, north] = map.getBounds().toArray().flat();
+  return (
+    west >= bbox[0] && south >= bbox[1] && east <= bbox[2] && north <= bbox[3]
+  );
+}
+
+async function loadCells(map: MapLibreMap, layerId: string) {
+  const state = grids.get(map)?.[layerId];
+  const layer = map.getLayer(layerId);
+  if (!state || !layer) {
+    return;
+  }
+  const metadata = layer.metadata as LayerMetadata;
+  const zoom = gridZoom(map, metadata);
+  let url = new URL(state.url);
+  let bbox: number[] | undefined;
+  if (metadata.grid?.url) {
+    // Exported maps have a file per zoom level
+    url = new URL(metadata.grid.url.replace("{z}", String(zoom)), state.url);
+  } else {
+    bbox = paddedBounds(map.getBounds());
+    url.searchParams.set("zoom", String(zoom));
+    url.searchParams.set("bbox", bbox.join(","));
+  }
+  const res = await fetch(
+    url,
+    state.filters === undefined
+      ? undefined
+      : {
+          body: JSON.stringify(state.filters),
+          headers: { "Content-Type": "application/json" },
+          method: "POST",
+        },
+  );
+  state.zoom = zoom;
+  state.bbox = bbox;
+  const source = map.getSource(layer.source) as GeoJSONSource;
+  source?.setData(await res.json());
+}
+
+/**
+ * Reload the cells of grid layers when the map crosses a zoom level or moves
+ * out of the loaded cells, keeping the filters set with setLayerFilters.
+ */
+export function setupGrids({ map, baseUrl }: { map: MapLibreMap; baseUrl: URL }) {
+  const state: Record<string, GridState> = {};
+  map.getStyle().layers.forEach((layer) => {
+    if ((layer.metadata as LayerMetadata)?.grid) {
+      state[layer.id] = { url: new URL(layer.id, baseUrl) };
+    }
+  });
+  grids.set(map, state);
+
+  const onMove = () => {
+    Object.entries(state).forEach(([layerId, grid]) => {
+      const metadata = map.getLayer(layerId)?.metadata as LayerMetadata;
+      if (
+        grid.zoom !== gridZoom(map, metadata) ||
+        !coversView(map, grid.bbox)
+      ) {
+        loadCells(map, layerId);
+      }
+    });
+  };
+  // moveend also follows zooms
+  map.on("moveend", onMove);
+  onMove();
+}
+
+export function isGridLayer(map: MapLibreMap, layerId: string) {
+  return Boolean(grids.get(map)?.[layerId]);
+}
+
+export async function setGridFilters(
+  map: MapLibreMap,
+  layerId: string,
+  filters: unknown,
+) {
+  const state = grids.get(map)?.[layerId];
+  if (state) {
+    state.filters = filters;
+    await loadCells(map, layerId);
+  }
+}
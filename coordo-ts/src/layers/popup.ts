@@ -98,25 +98,40 @@ export function makeSetLayerPopup({ map }: { map: MapLibreMap }) {
     const onTrigger = async (ev: MapLayerMouseEvent | MapLayerTouchEvent) => {
       const lngLat = ev.lngLat;
       const eventProps = ev.features?.[0]?.properties;
+      // Slim sources promote their feature key, which can be a string
       const id = ev.features?.[0]?.id;
-      if (lngLat && Number(id) >= 0 && eventProps) {
+      if (lngLat && id !== undefined && eventProps) {
         /** @todo Remove "any" casting  */
         const popup = new Popup(popupConfig).setLngLat(ev.lngLat);
 
-        const source = map.getSource(layerId) as GeoJSONSource;
-        const data = await source.getData();
+        const layerMetadata = map.getLayer(layerId)?.metadata as LayerMetadata;
+        let featureProps;
+        if (layerMetadata?.featuresUrl) {
+          // Slim layers only ship the properties used by their style,
+          // the others are fetched for the clicked feature
+          const res = await fetch(
+            new URL(
+              encodeURIComponent(String(id)),
+              new URL(layerMetadata.featuresUrl, window.location.href),
+            ),
+          );
+          featureProps = res.ok ? (await res.json()).properties : undefined;
+        } else {
+          const source = map.getSource(layerId) as GeoJSONSource;
+          const data = await source.getData();
+          // @ts-expect-error - MapLibre types are not accurate regarding feature properties
+          featureProps = data.features?.find((f) => String(f.id) === String(id))
+            ?.properties;
+        }
         const properties = Object.assign(eventProps, {
           /**
            * MapLibre Events will remove any non-string and non-numeric properties from object definition
            * see https://maplibre.org/maplibre-gl-js/docs/API/classes/Map/#querysourcefeatures
            * We want to add them back because we use complex object and potential null values
            */
-          // @ts-expect-error - MapLibre types are not accurate regarding feature properties
-          ...data.features?.find((f) => Number(f.id) === Number(id))
-            ?.properties,
+          ...featureProps,
         }) as T;
 
-        const layerMetadata = map.getLayer(layerId)?.metadata as LayerMetadata;
         const content = renderCallback(properties as T, layerMetadata);
         if (typeof content === "string") {
           popup.setHTML(content);
@@ -128,8 +143,8 @@ export function makeSetLayerPopup({ map }: { map: MapLibreMap }) {
         console.warn("Missing property lngLat on event : ", ev);
       } else if (!ev.features) {
         console.warn("Event features not found");
-      } else if (!(Number(id) >= 0)) {
-        console.warn("event feature id is invalid: ", id);
+      } else if (id === undefined) {
+        console.warn("Event feature id not found");
       } else if (!eventProps) {
         console.warn("Event feature properties not found", eventProps);
       }
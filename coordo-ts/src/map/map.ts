@@ -10,7 +10,7 @@ import "../index.css";
 
 import { EVENTS } from "../events";
 import type { LayerControlConstructorProps } from "../layers/controls";
-import { makeSetLayerFilters } from "../layers/filters";
+import { makeGetLayerFacets, makeSetLayerFilters } from "../layers/filters";
 import { makeSetLayerPopup } from "../layers/popup";
 import { makeSetLayerSymbol } from "../layers/symbol";
 import { addStyleDataListener } from "./style-data";
@@ -72,6 +72,8 @@ export function createMap(
 
   const setLayerFilters = makeSetLayerFilters({ baseUrl, map });
 
+  const getLayerFacets = makeGetLayerFacets({ baseUrl });
+
   const setLayerPopup = makeSetLayerPopup({ map });
 
   const setLayerSymbol = makeSetLayerSymbol({ map });
@@ -92,6 +94,7 @@ export function createMap(
   }
 
   const { hideLayer, showLayer } = addStyleDataListener({
+    baseUrl,
     controlLayerProps: {
       dispatchEventToConsumer,
       ...(controlLayerProps ?? {}),
@@ -105,6 +108,7 @@ export function createMap(
     addEventListener,
     addSprite,
     getCenter,
+    getLayerFacets,
     getLayerMetadata,
     getZoom,
     hideLayer,
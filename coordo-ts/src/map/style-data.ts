@@ -13,6 +13,7 @@ import type {
 import { LngLatBounds, NavigationControl, ScaleControl } from "maplibre-gl";
 
 import { setupClustering } from "../layers/cluster";
+import { setupGrids } from "../layers/grid";
 import {
   CONTROLS,
   LAYER_VISIBILITY,
@@ -35,11 +36,13 @@ function renderTemplate(html: string, vars: Record<string, string>) {
 
 export function addStyleDataListener({
   map,
+  baseUrl,
   setLayerPopup,
   onSuccess,
   controlLayerProps,
 }: {
   map: MapLibreMap;
+  baseUrl: URL;
   setLayerPopup: (params: SetLayerPopupParams<Record<string, string>>) => void;
   onSuccess?: () => void;
   controlLayerProps: LayerControlConstructorProps;
@@ -113,6 +116,9 @@ export function addStyleDataListener({
     // Render cluster layers for any source declared with cluster: true
     setupClustering({ map, style });
 
+    // Load the cells of grid layers for the current zoom level
+    setupGrids({ map, baseUrl });
+
     const totalBounds = new LngLatBounds();
     Object.values(style.sources).forEach((source) => {
       if (source.type === "geojson") {
@@ -122,6 +128,14 @@ export function addStyleDataListener({
         }
       }
     });
+    // Sources referencing their data by URL are not loaded yet,
+    // their extent is given by the layer metadata
+    layers.forEach((layer: LayerSpecification) => {
+      const metadata = layer.metadata as LayerMetadata;
+      if (metadata?.bbox) {
+        totalBounds.extend(metadata.bbox);
+      }
+    });
     map.fitBounds(totalBounds, { padding: 50 });
 
     onSuccess?.();
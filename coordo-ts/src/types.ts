@@ -30,6 +30,23 @@ export type FrictionlessSchema = {
 };
 
 export type LayerMetadata = {
+  bbox?: [number, number, number, number];
+  featuresUrl?: string;
+  // Raster tiles rendered by coordo-py
+  density?: boolean;
+  grid?: {
+    minZoom: number;
+    maxZoom: number;
+    // Prerendered cells of exported maps, {z} being the zoom level
+    url?: string;
+  };
+  // Field the data can be sliced on with the `time` of setLayerFilters
+  time?: {
+    field: string;
+    bucket: "day" | "week" | "month";
+    min?: string;
+    max?: string;
+  };
   popup?: {
     trigger: string;
     html?: string;
@@ -41,6 +58,8 @@ export type LayerMetadata = {
     {
       name: string;
       schema: FrictionlessSchema;
+      // Rows referencing a feature, once {id} is replaced with its key
+      url?: string;
     },
   ];
 };